@@ -1,12 +1,23 @@
 import streamlit as st
-import psycopg2
-# PHASE 2: Enabled for Combined Phase Development
-from sentence_transformers import SentenceTransformer
 import requests
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+import time
 from datetime import datetime, timedelta
 import os
+import sys
+from pathlib import Path
+
+# Shared modules (embedding cache) live in producer/ - mounted at /producer in Docker
+sys.path.append(os.getenv("PRODUCER_DIR", str(Path(__file__).resolve().parent.parent / "producer")))
+from embedders import EMBEDDING_BACKEND, EMBEDDING_MODEL, LazyEmbedder
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from llm import OllamaClient, OllamaError, ResponseCache, response_key
+from retrieval import extract_symbols, hybrid_search, load_ticker_aliases
+from db import (
+    DatabasePool, bucket_for_range, fetch_price_history, fetch_price_moves, fetch_price_symbols,
+    fetch_news_impact, fetch_pipeline_latency, fetch_symbol_moods, mood_label
+)
 
 # Page Configuration
 st.set_page_config(
@@ -20,30 +31,54 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # PHASE 2: Enabled for Combined Phase Development
-# Load embedding model (cached)
+# Embedding model (cached), wrapped in an embedding cache shared by all sessions so repeated
+# questions skip model.encode(). The backend (EMBEDDING_BACKEND) is only imported and loaded
+# by the first question that misses the cache, so the Live Dashboard never pays for it
 @st.cache_resource
 def load_model():
-    return SentenceTransformer('all-MiniLM-L6-v2')
+    cache = EmbeddingCache(
+        max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+        sqlite_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+    )
+    return CachedEmbedder(LazyEmbedder(EMBEDDING_BACKEND), EMBEDDING_MODEL, cache)
 
-# Database connection (cached)
+# Database connection pool (cached, shared by all sessions; each query borrows its own connection)
 @st.cache_resource
-def get_db_connection():
+def get_db_pool():
     try:
-        conn = psycopg2.connect(
-            dbname="market_mood",
-            user="market_user",
-            password="market_password",
-            host="postgres",
-            port=5432
-        )
-        return conn
+        return DatabasePool()
     except Exception as e:
         st.error(f"Database connection error: {e}")
         return None
 
+# Ticker symbols and company-name aliases for pulling tickers out of questions
+@st.cache_resource
+def get_ticker_aliases():
+    return load_ticker_aliases()
+
+# Ollama client (pooled keep-alive session) and answer cache, shared by all sessions
+@st.cache_resource
+def get_llm():
+    return OllamaClient(), ResponseCache()
+
 # PHASE 2: Enabled for Combined Phase Development
 model = load_model()
-conn = get_db_connection()
+db = get_db_pool()
+llm, response_cache = get_llm()
+
+# Price queries (cached across reruns and sessions; the leading underscore keeps
+# the pool out of Streamlit's cache key)
+PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL_SECONDS", "30"))
+CHART_RANGES = {"6 Hours": 6, "24 Hours": 24, "72 Hours": 72, "7 Days": 168}
+
+@st.cache_data(ttl=PRICE_CACHE_TTL, show_spinner=False)
+def load_price_symbols(_db, hours):
+    return fetch_price_symbols(_db, hours)
+
+@st.cache_data(ttl=PRICE_CACHE_TTL, show_spinner=False)
+def load_price_history(_db, symbol, hours):
+    rows = fetch_price_history(_db, symbol, hours)
+    return pd.DataFrame(rows, columns=['bucket', 'open', 'high', 'low', 'close', 'samples', 'last_ts'])
 
 # Sidebar Navigation
 st.sidebar.title("🦍 Market Mood Ring - Combined Phase")
@@ -53,88 +88,97 @@ page = st.sidebar.selectbox(
     ["📊 Live Dashboard", "💬 AI Analyst"]
 )
 
+cache_stats = model.cache.stats()
+st.sidebar.caption(
+    f"🧠 Embedding cache: {cache_stats['hit_rate']:.0%} hit rate "
+    f"({cache_stats['lookups']} lookups, {cache_stats['entries']} cached)"
+)
+llm_stats = llm.stats.summary()
+if llm_stats['count']:
+    st.sidebar.caption(
+        f"💬 LLM: TTFT p50 {llm_stats['ttft_p50']:.2f}s / p95 {llm_stats['ttft_p95']:.2f}s, "
+        f"answer p50 {llm_stats['total_p50']:.1f}s ({llm_stats['count']} calls, {response_cache.hits} cache hits)"
+    )
+
 # ===== PAGE 1: LIVE DASHBOARD =====
 if page == "📊 Live Dashboard":
     st.title("📊 Real-Time Market Dashboard")
     
-    if conn is None:
+    if db is None:
         st.error("⚠️ Cannot connect to database. Please ensure PostgreSQL is running.")
         st.stop()
     
-    # Fetch recent prices
+    # Fetch recent prices (per selected symbol, downsampled in Postgres)
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT symbol, price, timestamp 
-            FROM price_log 
-            WHERE timestamp > NOW() - INTERVAL '72 hours'
-            ORDER BY timestamp DESC
-            LIMIT 1000
-        """)
-        price_data = cursor.fetchall()
+        range_label = st.radio("Range", list(CHART_RANGES.keys()), index=2, horizontal=True)
+        hours = CHART_RANGES[range_label]
+        render_start = time.perf_counter()
+        symbols = load_price_symbols(db, hours)
         
-        if price_data:
-            df_prices = pd.DataFrame(price_data, columns=['symbol', 'price', 'timestamp'])
-            
+        if symbols:
             # Symbol selector
-            symbols = sorted(df_prices['symbol'].unique())
             selected_symbol = st.selectbox("Select Stock Symbol", symbols)
             
-            # Filter data for selected symbol
-            df_filtered = df_prices[df_prices['symbol'] == selected_symbol].copy()
-            df_filtered = df_filtered.sort_values('timestamp')
+            df_filtered = load_price_history(db, selected_symbol, hours)
             
             if not df_filtered.empty:
-                # Price Chart
-                fig = px.line(
-                    df_filtered, 
-                    x='timestamp', 
-                    y='price',
-                    title=f"{selected_symbol} Price Trend (Last 72 Hours)",
-                    labels={'price': 'Price ($)', 'timestamp': 'Time'}
+                # Price Chart (OHLC bars per bucket)
+                fig = go.Figure(go.Candlestick(
+                    x=df_filtered['bucket'],
+                    open=df_filtered['open'],
+                    high=df_filtered['high'],
+                    low=df_filtered['low'],
+                    close=df_filtered['close'],
+                    name=selected_symbol
+                ))
+                fig.update_layout(
+                    title=f"{selected_symbol} Price Trend (Last {range_label}, {bucket_for_range(hours)} bars)",
+                    xaxis_title="Time",
+                    yaxis_title="Price ($)",
+                    xaxis_rangeslider_visible=False,
+                    height=500
                 )
-                fig.update_layout(height=500)
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Latest price
                 latest_price = df_filtered.iloc[-1]
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Current Price", f"${latest_price['price']:.2f}")
+                    st.metric("Current Price", f"${latest_price['close']:.2f}")
                 with col2:
-                    st.metric("Symbol", latest_price['symbol'])
+                    st.metric("Symbol", selected_symbol)
                 with col3:
-                    st.metric("Last Update", latest_price['timestamp'].strftime("%H:%M:%S UTC"))
+                    st.metric("Last Update", latest_price['last_ts'].strftime("%H:%M:%S UTC"))
+                st.caption(
+                    f"⏱️ Rendered in {(time.perf_counter() - render_start) * 1000:.0f} ms "
+                    f"({len(df_filtered)} bars from {int(df_filtered['samples'].sum())} ticks, cached {PRICE_CACHE_TTL}s)"
+                )
             else:
-                st.info(f"No price data available for {selected_symbol} in the last 72 hours.")
+                st.info(f"No price data available for {selected_symbol} in the last {range_label.lower()}.")
         else:
             st.info("No price data available. Start the price producer to see live data.")
             
     except Exception as e:
         st.error(f"Error fetching price data: {e}")
     
-    # Recent Sentiment Scores
-    st.subheader("📈 Recent Sentiment Scores")
+    # Symbol moods (latest sentiment window per symbol)
+    st.subheader("📈 Sentiment by Symbol")
     try:
-        cursor.execute("""
-            SELECT symbol, headline, sentiment_score, 
-                   CASE 
-                       WHEN sentiment_score > 0.1 THEN '🟢 Positive'
-                       WHEN sentiment_score < -0.1 THEN '🔴 Negative'
-                       ELSE '🟡 Neutral'
-                   END as sentiment_label
-            FROM sentiment_log 
-            ORDER BY symbol, sentiment_score DESC
-            LIMIT 20
-        """)
-        sentiment_data = cursor.fetchall()
+        moods = fetch_symbol_moods(db)
         
-        if sentiment_data:
+        if moods:
             df_sentiment = pd.DataFrame(
-                sentiment_data, 
-                columns=['symbol', 'headline', 'sentiment_score', 'sentiment_label']
+                moods,
+                columns=['symbol', 'mean_score', 'min_score', 'max_score', 'headlines', 'momentum', 'window_end']
             )
+            df_sentiment.insert(2, 'sentiment_label', df_sentiment['mean_score'].map(mood_label))
             st.dataframe(df_sentiment, use_container_width=True, hide_index=True)
+            headlines, p50, p95 = fetch_pipeline_latency(db)
+            if headlines:
+                st.caption(
+                    f"⏱️ Headline latency, producer → sentiment_log (last hour): "
+                    f"p50 {p50:.1f}s / p95 {p95:.1f}s over {headlines} headlines"
+                )
         else:
             st.info("No sentiment data available. Start the Flink job to see sentiment analysis.")
             
@@ -147,7 +191,7 @@ elif page == "💬 AI Analyst":
     st.title("💬 AI Financial Analyst")
     st.markdown("Ask me about market movements, stock news, or sentiment analysis!")
     
-    if conn is None:
+    if db is None:
         st.error("⚠️ Cannot connect to database. Please ensure PostgreSQL is running.")
         st.stop()
     
@@ -169,26 +213,70 @@ elif page == "💬 AI Analyst":
         with st.chat_message("assistant"):
             with st.status("🧠 Consulting the Local Oracle...", expanded=False) as status:
                 
-                # A. Vector Search (The Librarian)
+                # A. Hybrid Search (The Librarian): tickers in the question narrow the search,
+                # keyword + vector candidates are fused and reranked by recency
+                retrieval_failed = False
+                question_symbols = extract_symbols(prompt, *get_ticker_aliases())
                 try:
-                    query_vector = model.encode(prompt).tolist()
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        SELECT content FROM financial_knowledge 
-                        ORDER BY embedding <-> %s::vector 
-                        LIMIT 3;
-                    """, (query_vector,))
-                    results = cursor.fetchall()
-                    context_text = "\n".join([r[0] for r in results]) if results else "No recent news found."
+                    if not model.model.loaded:
+                        status.update(label=f"🧠 Loading the embedding model ({EMBEDDING_BACKEND})...")
+                    query_vector = model.encode_one(prompt)
+                    with db.connection() as conn:
+                        results = hybrid_search(conn, prompt, query_vector, k=3, symbols=question_symbols)
+                    context_text = "\n".join(
+                        f"[{', '.join(r['symbols'] or [])}] {r['content']}"
+                        + (f" (sentiment {r['sentiment_score']:+.2f})" if r['sentiment_score'] is not None else "")
+                        for r in results
+                    ) if results else "No recent news found."
                 except Exception as e:
+                    results = []
+                    retrieval_failed = True
                     context_text = f"Error retrieving context: {e}"
                     st.warning(f"Vector search error: {e}")
                 
-                status.update(label="💡 Llama 3 is thinking...", state="running")
+                context_symbols = set(question_symbols) | {symbol for r in results for symbol in (r['symbols'] or [])}
+                
+                # Price moves for the question and retrieved symbols (hourly rollups, not raw ticks)
+                try:
+                    moves = fetch_price_moves(db, context_symbols)
+                    if moves:
+                        context_text += "\n\nPRICE MOVES (last 24 hours):\n" + "\n".join(
+                            f"{symbol}: ${first_open:.2f} -> ${last_close:.2f} "
+                            f"({(last_close - first_open) / first_open * 100:+.2f}%), range ${low:.2f}-${high:.2f}"
+                            for symbol, first_open, last_close, high, low in moves
+                        )
+                except Exception as e:
+                    st.warning(f"Price context error: {e}")
+                
+                # Windowed sentiment per symbol (one row each, not every headline)
+                try:
+                    moods = fetch_symbol_moods(db, context_symbols)
+                    if moods:
+                        context_text += "\n\nSENTIMENT (latest window per symbol, -1 to +1):\n" + "\n".join(
+                            f"{symbol}: mean {mean:+.2f} (min {low:+.2f}, max {high:+.2f}, {count} headlines), "
+                            f"momentum {momentum:+.2f}"
+                            for symbol, mean, low, high, count, momentum, _ in moods
+                        )
+                except Exception as e:
+                    st.warning(f"Sentiment context error: {e}")
                 
-                # B. Generate Answer (The Mouth) - OLLAMA
+                # How the price actually moved after recent headlines (joined in-stream by Flink)
                 try:
-                    full_prompt = f"""You are a Real-Time Financial Sentiment Analyst.
+                    impacts = fetch_news_impact(db, context_symbols)
+                    if impacts:
+                        context_text += "\n\nPRICE REACTION TO HEADLINES:\n" + "\n".join(
+                            f"{symbol} {published_at:%Y-%m-%d %H:%M} UTC \"{headline}\" "
+                            f"(sentiment {score:+.2f}): {change_pct:+.2f}% over {horizon} min"
+                            for symbol, headline, published_at, score, change_pct, horizon in impacts
+                            if change_pct is not None and score is not None
+                        )
+                except Exception as e:
+                    st.warning(f"News impact context error: {e}")
+                
+                status.update(label="✅ Context ready", state="complete")
+            
+            # B. Generate Answer (The Mouth) - OLLAMA
+            full_prompt = f"""You are a Real-Time Financial Sentiment Analyst.
 Your goal is to explain market movements to a user based ONLY on the news context provided.
 
 CONTEXT FROM LIVE DATABASE:
@@ -204,31 +292,30 @@ INSTRUCTIONS:
 4. Be concise (under 3 sentences).
 5. Explain financial jargon simply (ELI5 style).
 6. End with a "Vibe Check" summary (e.g., "Overall Vibe: 🐻 Bearish due to regulatory fears")."""
-                    
-                    # Call Local Ollama (Windows Host via Docker internal gateway)
-                    ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
-                    response = requests.post(
-                        f"{ollama_base_url}/api/generate",
-                        json={
-                            "model": "llama3",
-                            "prompt": full_prompt,
-                            "stream": False
-                        },
-                        timeout=60
-                    )
-                    
-                    if response.status_code == 200:
-                        bot_reply = response.json()['response']
-                    else:
-                        bot_reply = f"Error: Ollama returned {response.status_code}. Make sure Ollama is running and llama3 model is pulled."
-                        
+            
+            # Same question over the same retrieved news -> reuse the answer (TTL-bound)
+            cache_key = response_key(prompt, [r['id'] for r in results])
+            bot_reply = response_cache.get(cache_key)
+            if bot_reply is not None:
+                st.markdown(bot_reply)
+                st.caption("⚡ Cached answer (same question and news context)")
+            else:
+                # Stream tokens from Local Ollama (Windows Host via Docker internal gateway)
+                timing = {}
+                try:
+                    bot_reply = st.write_stream(llm.stream_generate(full_prompt, timing))
+                    if not retrieval_failed:
+                        response_cache.put(cache_key, bot_reply)
+                    if timing.get('ttft') is not None:
+                        st.caption(f"⏱️ First token in {timing['ttft']:.2f}s, full answer in {timing['total']:.1f}s")
                 except requests.exceptions.ConnectionError:
                     bot_reply = "⚠️ Cannot reach Ollama on Windows Host. Please ensure:\n1. Ollama is running on Windows\n2. Env Var `OLLAMA_HOST=0.0.0.0:11434` is set on Windows\n3. You restarted Ollama after setting the variable."
+                    st.markdown(bot_reply)
+                except OllamaError as e:
+                    bot_reply = f"Error: {e}. Make sure Ollama is running and llama3 model is pulled."
+                    st.markdown(bot_reply)
                 except Exception as e:
                     bot_reply = f"I cannot reach Ollama. Error: {e}"
-                
-                status.update(label="✅ Answer Ready!", state="complete")
+                    st.markdown(bot_reply)
             
-            # Display Bot Reply
-            st.markdown(bot_reply)
             st.session_state.messages.append({"role": "assistant", "content": bot_reply})
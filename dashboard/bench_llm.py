@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+LLM Latency Benchmark: Time to first visible token, blocking vs streaming vs cached answers
+Runs against a local fake Ollama server that emits BENCH_TOKENS tokens, one every
+BENCH_TOKEN_MS, after BENCH_PROMPT_MS of prompt processing. Example:
+    python dashboard/bench_llm.py
+    OLLAMA_BASE_URL=http://host.docker.internal:11434 python dashboard/bench_llm.py --real
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from llm import OllamaClient, ResponseCache, response_key
+
+NUM_TOKENS = int(os.getenv("BENCH_TOKENS", "80"))
+TOKEN_MS = float(os.getenv("BENCH_TOKEN_MS", "25"))
+PROMPT_MS = float(os.getenv("BENCH_PROMPT_MS", "300"))
+RUNS = int(os.getenv("BENCH_RUNS", "5"))
+PROMPT = "Why is TSLA moving today?"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(PROMPT_MS / 1000)
+        tokens = [f"tok{i} " for i in range(NUM_TOKENS)]
+        if not body.get('stream', True):
+            time.sleep(NUM_TOKENS * TOKEN_MS / 1000)
+            payload = json.dumps({'response': ''.join(tokens), 'done': True}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for token in tokens + [None]:
+            line = json.dumps({'response': token or '', 'done': token is None}).encode() + b'\n'
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+            if token:
+                time.sleep(TOKEN_MS / 1000)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def blocking(base_url, model):
+    """Old behaviour: new connection, stream=False; the first token is visible with the last"""
+    start = time.perf_counter()
+    response = requests.post(f"{base_url}/api/generate",
+                             json={"model": model, "prompt": PROMPT, "stream": False}, timeout=60)
+    response.json()['response']
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def streaming(client):
+    timing = {}
+    for _ in client.stream_generate(PROMPT, timing):
+        pass
+    return timing['ttft'], timing['total']
+
+
+def cached(client, cache):
+    key = response_key(PROMPT, [1, 2, 3])
+    start = time.perf_counter()
+    answer = cache.get(key)
+    if answer is None:
+        answer = ''.join(client.stream_generate(PROMPT))
+        cache.put(key, answer)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare answer latency modes")
+    parser.add_argument('--real', action='store_true', help="Use OLLAMA_BASE_URL instead of the fake server")
+    args = parser.parse_args()
+
+    server = None
+    if args.real:
+        base_url = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllamaHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        print(f"🧪 Fake Ollama: {NUM_TOKENS} tokens x {TOKEN_MS:.0f} ms after {PROMPT_MS:.0f} ms prompt processing")
+
+    client = OllamaClient(base_url=base_url)
+    cache = ResponseCache()
+    modes = {
+        'blocking (stream=False)': lambda: blocking(base_url, client.model),
+        'streaming, pooled': lambda: streaming(client),
+        'cache (1st miss, then hits)': lambda: cached(client, cache),
+    }
+    print(f"📊 {RUNS} runs each, median seconds\n   {'mode':<28} {'first token':>12} {'full answer':>12}")
+    for label, run in modes.items():
+        samples = [run() for _ in range(RUNS)]
+        print(f"   {label:<28} {statistics.median(s[0] for s in samples):>12.3f} "
+              f"{statistics.median(s[1] for s in samples):>12.3f}")
+    if server:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark: pgvector query latency vs table size, with recall against exact search
+Uses a scratch table (bench_knowledge) filled with random 384-dim vectors. Example:
+    docker exec market_dashboard python bench_retrieval.py
+    BENCH_ROWS=10000,100000,1000000 BENCH_EF_SEARCH=20,40,100 python dashboard/bench_retrieval.py
+"""
+import os
+import random
+import time
+import psycopg2
+
+POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
+ROW_COUNTS = [int(n) for n in os.getenv("BENCH_ROWS", "10000,100000,1000000").split(",")]
+EF_SEARCH_VALUES = [int(n) for n in os.getenv("BENCH_EF_SEARCH", "20,40,100").split(",")]
+NUM_QUERIES = int(os.getenv("BENCH_QUERIES", "50"))
+K = int(os.getenv("BENCH_K", "3"))
+DIM = 384
+
+def random_vector(rng):
+    return [rng.uniform(-1, 1) for _ in range(DIM)]
+
+def run_queries(cursor, queries):
+    """Return (avg latency ms, list of result id lists)"""
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        cursor.execute(
+            "SELECT id FROM bench_knowledge ORDER BY embedding <=> %s::vector LIMIT %s", (q, K)
+        )
+        results.append([r[0] for r in cursor.fetchall()])
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+def main():
+    conn = psycopg2.connect(
+        dbname=os.getenv("POSTGRES_DB", "market_mood"),
+        user=os.getenv("POSTGRES_USER", "market_user"),
+        password=os.getenv("POSTGRES_PASSWORD", "market_password"),
+        host=POSTGRES_HOST,
+        port=5432
+    )
+    conn.autocommit = True
+    cursor = conn.cursor()
+    rng = random.Random(1)
+    queries = [random_vector(rng) for _ in range(NUM_QUERIES)]
+
+    cursor.execute("DROP TABLE IF EXISTS bench_knowledge")
+    cursor.execute(f"CREATE TABLE bench_knowledge (id SERIAL PRIMARY KEY, embedding vector({DIM}) NOT NULL)")
+    rows = 0
+    try:
+        for target in sorted(ROW_COUNTS):
+            print(f"\n📦 Growing bench_knowledge to {target:,} rows...")
+            cursor.execute("DROP INDEX IF EXISTS idx_bench_knowledge_embedding")
+            cursor.execute(f"""
+                INSERT INTO bench_knowledge (embedding)
+                SELECT ARRAY(SELECT random() * 2 - 1 FROM generate_series(1, {DIM}) WHERE g.i > 0)::vector
+                FROM generate_series(1, %s) AS g(i)
+            """, (target - rows,))
+            rows = target
+
+            # Exact search: no index, full scan + sort
+            exact_ms, exact = run_queries(cursor, queries)
+            print(f"   exact scan:           {exact_ms:8.2f} ms/query")
+
+            start = time.perf_counter()
+            cursor.execute("""
+                CREATE INDEX idx_bench_knowledge_embedding ON bench_knowledge
+                USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+            """)
+            print(f"   hnsw build:           {time.perf_counter() - start:8.1f} s")
+
+            for ef_search in EF_SEARCH_VALUES:
+                cursor.execute("SET hnsw.ef_search = %s", (ef_search,))
+                ann_ms, approx = run_queries(cursor, queries)
+                recall = sum(len(set(a) & set(e)) for a, e in zip(approx, exact)) / (K * len(queries))
+                print(f"   hnsw ef_search={ef_search:<4}  {ann_ms:8.2f} ms/query  recall@{K}={recall:.3f}")
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_knowledge")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Dashboard Data Access: Thread-safe PostgreSQL connection pool and the dashboard's queries
+Each query borrows its own connection and cursor, so concurrent Streamlit sessions do
+not serialize on one connection and a failed query cannot leave others in an aborted
+transaction.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
+POSTGRES_DB = os.getenv("POSTGRES_DB", "market_mood")
+POSTGRES_USER = os.getenv("POSTGRES_USER", "market_user")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "market_password")
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+# Max seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle longer than this are pinged before reuse
+DB_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_HEALTHCHECK_IDLE_SECONDS", "30"))
+
+
+class DatabasePool:
+    """
+    Wraps psycopg2's ThreadedConnectionPool. Callers block (up to DB_POOL_TIMEOUT)
+    when all connections are in use instead of getting a PoolError, and broken
+    connections are discarded and replaced.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX):
+        self.pool = pg_pool.ThreadedConnectionPool(
+            minconn,
+            maxconn,
+            dbname=POSTGRES_DB,
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD,
+            host=POSTGRES_HOST,
+            port=5432
+        )
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.last_used = {}
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self.last_used.get(id(conn), 0) < DB_HEALTHCHECK_IDLE_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self.pool.getconn()
+        if not self._healthy(conn):
+            # Reconnect: drop the broken connection, the pool opens a fresh one
+            self.pool.putconn(conn, close=True)
+            conn = self.pool.getconn()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; rolled back on error, always returned to the pool"""
+        if not self.slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise RuntimeError(f"No database connection available after {DB_POOL_TIMEOUT}s")
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                discard = broken or bool(conn.closed)
+                if discard:
+                    self.last_used.pop(id(conn), None)
+                else:
+                    self.last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn, close=discard)
+            self.slots.release()
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a connection and a fresh cursor for one query"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        self.pool.closeall()
+
+
+def bucket_for_range(hours):
+    """Rollup resolution for a chart range: ~300-400 bars per chart"""
+    if hours <= 6:
+        return "1m"
+    if hours <= 72:
+        return "5m"
+    return "1h"
+
+
+def fetch_price_symbols(db, hours=72):
+    """Symbols with at least one price bar in the window (from the hourly rollups)"""
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT symbol
+            FROM price_ohlcv
+            WHERE resolution = '1h'
+              AND bucket_start > NOW() - make_interval(hours => %s + 1)
+            ORDER BY symbol
+        """, (hours,))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fetch_price_history(db, symbol, hours=72):
+    """
+    OHLCV bars for one symbol from the price_ohlcv rollups (maintained by price_consumer).
+    Returns (bucket, open, high, low, close, samples, last_ts) rows.
+    """
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT bucket_start, open, high, low, close, samples, last_ts
+            FROM price_ohlcv
+            WHERE symbol = %s
+              AND resolution = %s
+              AND bucket_start > NOW() - make_interval(hours => %s)
+            ORDER BY bucket_start
+        """, (symbol, bucket_for_range(hours), hours))
+        return cursor.fetchall()
+
+
+def fetch_price_moves(db, symbols, hours=24):
+    """
+    Price change per symbol over the window from the hourly rollups, for LLM context.
+    Returns (symbol, first_open, last_close, high, low) rows.
+    """
+    if not symbols:
+        return []
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT symbol,
+                   (array_agg(open ORDER BY bucket_start))[1] AS first_open,
+                   (array_agg(close ORDER BY bucket_start DESC))[1] AS last_close,
+                   MAX(high), MIN(low)
+            FROM price_ohlcv
+            WHERE symbol = ANY(%s)
+              AND resolution = '1h'
+              AND bucket_start > NOW() - make_interval(hours => %s)
+            GROUP BY symbol
+        """, (list(symbols), hours))
+        return cursor.fetchall()
+
+
+def fetch_symbol_moods(db, symbols=None, hours=24):
+    """
+    Latest closed windowed mood per symbol from sentiment_window (maintained by the Flink job;
+    windows ending in the future are still filling up).
+    One row per symbol via the (symbol, window_end) primary key, independent of headline volume.
+    Returns (symbol, mean_score, min_score, max_score, headline_count, momentum, window_end) rows.
+    """
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT ON (symbol)
+                   symbol, mean_score, min_score, max_score, headline_count, momentum, window_end
+            FROM sentiment_window
+            WHERE window_end > NOW() - make_interval(hours => %s)
+              AND window_end <= NOW()
+              AND (%s::text[] IS NULL OR symbol = ANY(%s::text[]))
+            ORDER BY symbol, window_end DESC
+        """, (hours, list(symbols) if symbols else None, list(symbols) if symbols else None))
+        return cursor.fetchall()
+
+
+def fetch_news_impact(db, symbols, limit=5):
+    """
+    Most recent headline -> price move records per symbol from news_impact (Flink news impact job).
+    Returns (symbol, headline, published_at, sentiment_score, change_pct, horizon_minutes) rows.
+    """
+    if not symbols:
+        return []
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.symbol, i.headline, i.published_at, i.sentiment_score, i.change_pct, i.horizon_minutes
+            FROM unnest(%s::text[]) AS s(symbol)
+            CROSS JOIN LATERAL (
+                SELECT * FROM news_impact
+                WHERE news_impact.symbol = s.symbol
+                ORDER BY published_at DESC
+                LIMIT %s
+            ) i
+            ORDER BY i.symbol, i.published_at DESC
+        """, (list(symbols), limit))
+        return cursor.fetchall()
+
+
+def fetch_pipeline_latency(db, hours=1):
+    """
+    Headline latency from the news producer's publish (ingested_at) to the Flink job's first
+    write to sentiment_log (stored_at), over headlines stored in the last `hours`.
+    Returns (headlines, p50_seconds, p95_seconds); percentiles are None when there are no rows.
+    """
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT count(*),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY latency),
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY latency)
+            FROM (
+                SELECT EXTRACT(EPOCH FROM stored_at - ingested_at) AS latency
+                FROM sentiment_log
+                WHERE ingested_at IS NOT NULL
+                  AND stored_at > (NOW() AT TIME ZONE 'UTC') - make_interval(hours => %s)
+                  AND created_at > (NOW() AT TIME ZONE 'UTC') - make_interval(days => 7)
+            ) l
+        """, (hours,))
+        return cursor.fetchone()
+
+
+def mood_label(score):
+    """Traffic-light label for a -1..+1 sentiment score"""
+    if score > 0.1:
+        return '🟢 Positive'
+    if score < -0.1:
+        return '🔴 Negative'
+    return '🟡 Neutral'
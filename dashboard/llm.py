@@ -0,0 +1,140 @@
+"""
+LLM Client: Streaming Ollama generation and a response cache for the AI Analyst page
+- OllamaClient streams tokens from /api/generate over a pooled keep-alive session and
+  records time-to-first-token (TTFT) and total generation time
+- ResponseCache returns a previous answer for the same question over the same retrieved
+  news (key = normalized prompt + context ids) until LLM_CACHE_TTL_SECONDS expires
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+# Max seconds between streamed chunks (not for the whole answer)
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "300"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+
+
+class OllamaError(Exception):
+    """Ollama answered with an HTTP error or an error chunk"""
+
+
+class GenerationStats:
+    """Rolling TTFT / total latency samples (seconds) for the sidebar"""
+
+    def __init__(self, window=100):
+        self.ttft = deque(maxlen=window)
+        self.total = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, ttft, total):
+        with self.lock:
+            if ttft is not None:
+                self.ttft.append(ttft)
+            self.total.append(total)
+
+    def summary(self):
+        with self.lock:
+            ttft = sorted(self.ttft)
+            total = sorted(self.total)
+        if not ttft:
+            return {'count': 0, 'ttft_p50': None, 'ttft_p95': None, 'total_p50': None}
+        return {
+            'count': len(ttft),
+            'ttft_p50': ttft[len(ttft) // 2],
+            'ttft_p95': ttft[min(len(ttft) - 1, int(len(ttft) * 0.95))],
+            'total_p50': total[len(total) // 2],
+        }
+
+
+class OllamaClient:
+    def __init__(self, base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL, pool_size=10):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = GenerationStats()
+
+    def stream_generate(self, prompt, timing=None):
+        """
+        Yield response tokens as Ollama produces them (newline-delimited JSON chunks).
+        If given, `timing` is filled with 'ttft' and 'total' seconds for this call.
+        """
+        timing = {} if timing is None else timing
+        timing['ttft'] = None
+        start = time.perf_counter()
+        with self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "prompt": prompt, "stream": True},
+            stream=True,
+            timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+        ) as response:
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama returned {response.status_code}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise OllamaError(chunk['error'])
+                token = chunk.get('response', '')
+                if token:
+                    if timing['ttft'] is None:
+                        timing['ttft'] = time.perf_counter() - start
+                    yield token
+                if chunk.get('done'):
+                    break
+        timing['total'] = time.perf_counter() - start
+        self.stats.record(timing['ttft'], timing['total'])
+
+
+def normalize_prompt(prompt):
+    return re.sub(r'\s+', ' ', str(prompt)).strip().lower()
+
+
+def response_key(prompt, context_ids):
+    ids = ','.join(str(i) for i in sorted(context_ids))
+    return hashlib.sha256(f"{normalize_prompt(prompt)}\0{ids}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache of key -> answer text"""
+
+    def __init__(self, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, answer):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,218 @@
+"""
+Retrieval: Finds the knowledge rows the AI Analyst answers from
+- search_knowledge: nearest-neighbour search over knowledge_chunks with cosine distance
+  (<=>), so the HNSW vector_cosine_ops index in init.sql is used, with optional symbol
+  and recency filters
+- hybrid_search: tickers named in the question narrow the candidates, full-text (GIN) and
+  vector candidates are fused with reciprocal rank fusion, then reranked by recency
+Both return each chunk's document symbols and sentiment_log score.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+# HNSW search breadth (higher = better recall, slower). Raised automatically for
+# filtered queries, since filters are applied to the index's candidate list.
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "40"))
+FILTERED_EF_SEARCH = int(os.getenv("RAG_FILTERED_EF_SEARCH", "200"))
+# Only used if the embedding index is rebuilt as ivfflat
+IVFFLAT_PROBES = int(os.getenv("RAG_IVFFLAT_PROBES", "10"))
+# Default recency window for retrieved news (0 = no limit)
+RECENCY_HOURS = int(os.getenv("RAG_RECENCY_HOURS", "168"))
+# Hybrid search: candidates per retriever, RRF constant, and recency boost
+# (a row HALF_LIFE hours old gets half of the RECENCY_WEIGHT boost a brand-new one gets)
+CANDIDATES = int(os.getenv("RAG_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RECENCY_WEIGHT = float(os.getenv("RAG_RECENCY_WEIGHT", "1.0"))
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("RAG_RECENCY_HALF_LIFE_HOURS", "24"))
+
+TICKERS_FILE = os.getenv(
+    "TICKERS_FILE",
+    str(Path(os.getenv("PRODUCER_DIR", str(Path(__file__).resolve().parent.parent / "producer"))) / "tickers.json")
+)
+
+
+def _chunk_filters(symbols, since_hours):
+    """WHERE clause over knowledge_chunks (alias c) for the symbol and recency filters"""
+    filters = []
+    if symbols:
+        # Symbol filter via the document<->symbol table; narrows candidates to that ticker's stories
+        filters.append("""c.document_id IN (
+            SELECT document_id FROM knowledge_document_symbols WHERE symbol = ANY(%(symbols)s))""")
+    if since_hours:
+        filters.append("c.created_at > NOW() - make_interval(hours => %(since_hours)s)")
+    return " AND ".join(filters) or "TRUE", bool(filters)
+
+
+# Tickers and sentiment for a matched chunk's document (any of its news_keys; the score
+# depends on the headline only)
+DOCUMENT_DETAILS_SQL = """
+    LEFT JOIN LATERAL (
+        SELECT array_agg(symbol ORDER BY symbol) AS symbols, array_agg(news_key) AS news_keys
+        FROM knowledge_document_symbols
+        WHERE document_id = c.document_id
+    ) ds ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT sentiment_score FROM sentiment_log
+        WHERE news_key = ANY(ds.news_keys)
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) s ON TRUE
+"""
+
+
+def search_knowledge(conn, query_vector, k=3, symbols=None, since_hours=None):
+    """
+    Return the k most similar knowledge chunks as dicts: id, document_id, symbol, symbols,
+    content, created_at, similarity (cosine, 1 = identical), sentiment_score.
+    """
+    since_hours = RECENCY_HOURS if since_hours is None else since_hours
+    where, filtered = _chunk_filters(symbols, since_hours)
+    ef_search = max(HNSW_EF_SEARCH, k) if not filtered else max(FILTERED_EF_SEARCH, k)
+
+    cursor = conn.cursor()
+    try:
+        # SET LOCAL only lasts for this transaction
+        cursor.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+        cursor.execute("SET LOCAL ivfflat.probes = %s", (IVFFLAT_PROBES,))
+        cursor.execute(f"""
+            SELECT c.id, c.document_id, ds.symbols[1] AS symbol, ds.symbols, c.content, c.created_at,
+                   1 - c.distance AS similarity, s.sentiment_score
+            FROM (
+                SELECT c.id, c.document_id, c.content, c.created_at, c.embedding <=> %(vector)s::vector AS distance
+                FROM knowledge_chunks c
+                WHERE {where}
+                ORDER BY c.embedding <=> %(vector)s::vector
+                LIMIT %(k)s
+            ) c
+            {DOCUMENT_DETAILS_SQL}
+            ORDER BY c.distance
+        """, {'vector': query_vector, 'symbols': list(symbols) if symbols else None,
+              'since_hours': since_hours, 'k': k})
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_ticker_aliases(path=TICKERS_FILE):
+    """
+    Map lowercase company-name aliases to symbols from tickers.json, e.g.
+    'Alphabet (Google)' -> {'alphabet': 'GOOGL', 'google': 'GOOGL'}. Returns (symbols, aliases).
+    """
+    symbols, aliases = set(), {}
+    try:
+        with open(path, 'r') as f:
+            tickers = json.load(f).get('tickers', [])
+    except (OSError, ValueError):
+        tickers = []
+    for ticker in tickers:
+        symbol = ticker['symbol'].upper()
+        symbols.add(symbol)
+        for alias in re.split(r'[()/,]', ticker.get('name', '')):
+            alias = alias.strip().lower()
+            if alias:
+                aliases[alias] = symbol
+                aliases[alias.replace("'", "")] = symbol  # McDonald's / McDonalds
+    symbols.update(s.strip().upper() for s in os.getenv('STOCK_SYMBOLS', '').split(',') if s.strip())
+    return symbols, aliases
+
+
+def extract_symbols(question, symbols, aliases):
+    """
+    Tickers mentioned in the question: $TSLA or an upper-case symbol (TSLA; single letters
+    only with $), or a company name / alias (case-insensitive, whole words).
+    """
+    found = set()
+    for dollar, token in re.findall(r'(\$?)\b([A-Za-z]{1,5})\b', question):
+        if token.upper() in symbols and (dollar or (token.isupper() and len(token) > 1)):
+            found.add(token.upper())
+    lowered = question.lower()
+    for alias, symbol in aliases.items():
+        if re.search(rf"\b{re.escape(alias)}\b", lowered):
+            found.add(symbol)
+    return sorted(found)
+
+
+def hybrid_search(conn, question, query_vector, k=3, symbols=None, since_hours=None):
+    """
+    Return the top k knowledge chunks (at most one per story) as dicts: id, document_id,
+    symbol, symbols, content, created_at, similarity, sentiment_score (None if not scored
+    yet), score (fused + recency).
+    """
+    since_hours = RECENCY_HOURS if since_hours is None else since_hours
+    where, filtered = _chunk_filters(symbols, since_hours)
+    ef_search = max(HNSW_EF_SEARCH, CANDIDATES) if not filtered else max(FILTERED_EF_SEARCH, CANDIDATES)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+        cursor.execute("SET LOCAL ivfflat.probes = %s", (IVFFLAT_PROBES,))
+        # Keyword query: any lexeme of the question (OR), so natural-language questions match
+        cursor.execute(f"""
+            WITH query AS (
+                SELECT to_tsquery('simple', array_to_string(
+                           ARRAY(SELECT quote_literal(l)
+                                 FROM unnest(tsvector_to_array(to_tsvector('english', %(question)s))) AS l),
+                           ' | ')) AS q
+            ),
+            vector_hits AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT c.id, c.embedding <=> %(vector)s::vector AS distance
+                    FROM knowledge_chunks c
+                    WHERE {where}
+                    ORDER BY c.embedding <=> %(vector)s::vector
+                    LIMIT %(candidates)s
+                ) nearest
+            ),
+            keyword_hits AS (
+                SELECT id, row_number() OVER (ORDER BY relevance DESC) AS rank
+                FROM (
+                    SELECT c.id, ts_rank_cd(c.content_tsv, query.q) AS relevance
+                    FROM knowledge_chunks c, query
+                    WHERE c.content_tsv @@ query.q AND {where}
+                    ORDER BY relevance DESC
+                    LIMIT %(candidates)s
+                ) matches
+            ),
+            fused AS (
+                SELECT id, SUM(1.0 / (%(rrf_k)s + rank)) AS rrf
+                FROM (SELECT * FROM vector_hits UNION ALL SELECT * FROM keyword_hits) hits
+                GROUP BY id
+            ),
+            ranked AS (
+                SELECT DISTINCT ON (c.document_id)
+                       c.id, c.document_id, c.content, c.created_at, c.embedding,
+                       fused.rrf * (1 + %(recency_weight)s * power(0.5,
+                           EXTRACT(EPOCH FROM (NOW() - c.created_at)) / 3600.0 / %(half_life)s)) AS score
+                FROM fused
+                JOIN knowledge_chunks c ON c.id = fused.id
+                ORDER BY c.document_id, score DESC
+            )
+            SELECT c.id, c.document_id, ds.symbols[1] AS symbol, ds.symbols, c.content, c.created_at,
+                   1 - (c.embedding <=> %(vector)s::vector) AS similarity,
+                   s.sentiment_score, c.score
+            FROM (SELECT * FROM ranked ORDER BY score DESC LIMIT %(k)s) c
+            {DOCUMENT_DETAILS_SQL}
+            ORDER BY c.score DESC
+        """, {
+            'question': question, 'vector': query_vector, 'symbols': list(symbols) if symbols else None,
+            'since_hours': since_hours, 'candidates': CANDIDATES, 'rrf_k': RRF_K,
+            'recency_weight': RECENCY_WEIGHT, 'half_life': RECENCY_HALF_LIFE_HOURS, 'k': k,
+        })
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Sentiment Benchmark: Compares per-row vs batched Vader scoring on a synthetic stock_news stream
+Run inside the Flink container so the same NLTK/PyFlink versions are measured:
+    docker exec market_taskmanager python /opt/flink/usrlib/bench_sentiment.py
+"""
+import os
+import random
+import time
+import pandas as pd
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from flink_sentiment import SentimentScorer, BatchSentimentScorer
+
+NUM_HEADLINES = int(os.getenv('BENCH_HEADLINES', '20000'))
+BATCH_SIZES = [int(b) for b in os.getenv('BENCH_BATCH_SIZES', '100,1000,5000').split(',')]
+
+SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'NVDA', 'AMZN', 'META', 'GOOGL', 'JPM', 'XOM', 'PLTR']
+SUBJECTS = ['shares', 'earnings', 'revenue', 'guidance', 'outlook', 'margins', 'sales']
+VERBS = ['surge', 'plunge', 'beat expectations', 'miss estimates', 'rally', 'slump', 'hold steady']
+TAILS = ['after strong quarter', 'amid regulatory fears', 'on upbeat analyst note',
+         'as investors weigh risks', 'following record deliveries', 'despite layoffs']
+
+def synthetic_headlines(n):
+    """Generate headlines shaped like the stock_news topic payload"""
+    rng = random.Random(42)
+    return [
+        f"{rng.choice(SYMBOLS)} {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(TAILS)}"
+        for _ in range(n)
+    ]
+
+def report(label, n, elapsed):
+    print(f"   {label:<32} {n / elapsed:>10,.0f} headlines/sec ({elapsed:.2f}s)")
+
+def main():
+    headlines = synthetic_headlines(NUM_HEADLINES)
+    print(f"📊 Scoring {NUM_HEADLINES:,} synthetic headlines")
+
+    # Baseline: the old UDF built an analyzer (and reloaded the lexicon) per record
+    sample = headlines[:max(1, NUM_HEADLINES // 20)]
+    start = time.perf_counter()
+    for h in sample:
+        SentimentIntensityAnalyzer().polarity_scores(h)
+    report("per-row, analyzer per call", len(sample), time.perf_counter() - start)
+
+    scorer = SentimentScorer()
+    scorer.open(None)
+    start = time.perf_counter()
+    for h in headlines:
+        scorer.eval(h)
+    report("per-row, analyzer in open()", NUM_HEADLINES, time.perf_counter() - start)
+
+    batch_scorer = BatchSentimentScorer()
+    batch_scorer.open(None)
+    series = pd.Series(headlines)
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for i in range(0, NUM_HEADLINES, batch_size):
+            batch_scorer.eval(series.iloc[i:i + batch_size])
+        report(f"pandas batch={batch_size}", NUM_HEADLINES, time.perf_counter() - start)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+News Impact Job: Joins headlines with the price stream and measures the move that followed
+For every headline, prices of the same symbol from shortly before publication until
+NEWS_IMPACT_HORIZON_MINUTES after it are interval-joined in event time, and one impact
+record per headline is upserted into news_impact (refined as later prices arrive).
+"""
+import os
+from pyflink.datastream import StreamExecutionEnvironment
+from pyflink.table import StreamTableEnvironment
+
+from flink_sentiment import KAFKA_MESSAGE_FORMAT, SENTIMENT_UDF_MODE, analyze_sentiment, analyze_sentiment_batch
+
+# Measure the price change over this many minutes after a headline
+HORIZON_MINUTES = int(os.getenv('NEWS_IMPACT_HORIZON_MINUTES', '30'))
+# Look back this far for the reference price at publication (> one price producer cycle)
+BASELINE_MINUTES = int(os.getenv('NEWS_IMPACT_BASELINE_MINUTES', '5'))
+# Out-of-orderness allowed on both streams. The join keeps prices until the watermark passes
+# price time + BASELINE, so this must cover how late headlines reach Kafka: the news producer
+# polls a quiet symbol only every NEWS_MAX_POLL_SECONDS. Headlines later than this are dropped.
+NEWS_MAX_POLL_SECONDS = int(os.getenv('NEWS_MAX_POLL_SECONDS', '900'))
+WATERMARK_DELAY_MINUTES = int(os.getenv('NEWS_IMPACT_WATERMARK_DELAY_MINUTES', str(-(-NEWS_MAX_POLL_SECONDS // 60) + 5)))
+
+def news_impact_job():
+    env = StreamExecutionEnvironment.get_execution_environment()
+    t_env = StreamTableEnvironment.create(env)
+    config = t_env.get_config()
+    config.set('pipeline.name', 'flink_news_impact')
+    # published_at is written to Postgres as a naive UTC timestamp
+    config.set('table.local-time-zone', 'UTC')
+    config.set('table.exec.source.idle-timeout', '30 s')
+    # Per-headline aggregates are final once the horizon has passed; keep state a little longer
+    config.set('table.exec.state.ttl', f'{(HORIZON_MINUTES + BASELINE_MINUTES + WATERMARK_DELAY_MINUTES) * 2} min')
+    # The sentiment UDF lives in the sibling job module; ship it to the Python workers
+    t_env.add_python_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flink_sentiment.py'))
+
+    # 1. Sources (Kafka), each with its own consumer group and event-time watermark
+    t_env.execute_sql(f"""
+        CREATE TABLE news_source (
+            symbol STRING,
+            headline STRING,
+            summary STRING,
+            source STRING,
+            url STRING,
+            ts DOUBLE,
+            ingest_ts DOUBLE,
+            event_time AS TO_TIMESTAMP_LTZ(CAST(ts * 1000 AS BIGINT), 3),
+            WATERMARK FOR event_time AS event_time - INTERVAL '{WATERMARK_DELAY_MINUTES}' MINUTE
+        ) WITH (
+            'connector' = 'kafka',
+            'topic' = 'stock_news',
+            'properties.bootstrap.servers' = 'kafka:29092',
+            'properties.group.id' = 'flink-news-impact-consumer',
+            'scan.startup.mode' = 'latest-offset',
+            'format' = '{KAFKA_MESSAGE_FORMAT}'
+        )
+    """)
+
+    t_env.execute_sql(f"""
+        CREATE TABLE price_source (
+            symbol STRING,
+            price DOUBLE,
+            high DOUBLE,
+            low DOUBLE,
+            `open` DOUBLE,
+            previous_close DOUBLE,
+            ts DOUBLE,
+            ingest_ts DOUBLE,
+            volume DOUBLE,
+            event_time AS TO_TIMESTAMP_LTZ(CAST(ts * 1000 AS BIGINT), 3),
+            WATERMARK FOR event_time AS event_time - INTERVAL '{WATERMARK_DELAY_MINUTES}' MINUTE
+        ) WITH (
+            'connector' = 'kafka',
+            'topic' = 'stock_prices',
+            'properties.bootstrap.servers' = 'kafka:29092',
+            'properties.group.id' = 'flink-news-impact-consumer',
+            'scan.startup.mode' = 'latest-offset',
+            'format' = '{KAFKA_MESSAGE_FORMAT}'
+        )
+    """)
+
+    # 2. Sink (Postgres), upserted on news_key
+    t_env.execute_sql("""
+        CREATE TABLE news_impact_sink (
+            news_key STRING,
+            symbol STRING,
+            headline STRING,
+            published_at TIMESTAMP(3),
+            sentiment_score DOUBLE,
+            price_at_news DOUBLE,
+            price_after DOUBLE,
+            high_after DOUBLE,
+            low_after DOUBLE,
+            change_pct DOUBLE,
+            price_samples BIGINT,
+            horizon_minutes INT,
+            PRIMARY KEY (news_key) NOT ENFORCED
+        ) WITH (
+            'connector' = 'jdbc',
+            'url' = 'jdbc:postgresql://postgres:5432/market_mood',
+            'table-name' = 'news_impact',
+            'username' = 'market_user',
+            'password' = 'market_password'
+        )
+    """)
+
+    if SENTIMENT_UDF_MODE == 'row':
+        t_env.create_temporary_function("get_sentiment", analyze_sentiment)
+    else:
+        t_env.create_temporary_function("get_sentiment", analyze_sentiment_batch)
+
+    # 3. Score headlines, then interval-join with prices of the same symbol
+    t_env.execute_sql("""
+        CREATE TEMPORARY VIEW scored_news AS
+        SELECT
+            MD5(symbol || '|' || headline) AS news_key,
+            symbol,
+            headline,
+            get_sentiment(headline) AS score,
+            event_time
+        FROM news_source
+    """)
+
+    t_env.execute_sql(f"""
+        CREATE TEMPORARY VIEW news_prices AS
+        SELECT
+            n.news_key, n.symbol, n.headline, n.score,
+            n.event_time AS published_at,
+            p.price,
+            p.event_time >= n.event_time AS is_after,
+            -- '<epoch ms, zero-padded>|<price>': MIN/MAX over it pick the earliest/latest quote
+            -- in event time, whatever order the join emitted the rows in
+            LPAD(CAST(CAST(p.ts * 1000 AS BIGINT) AS STRING), 15, '0') || '|' || CAST(p.price AS STRING) AS stamped_price
+        FROM scored_news n
+        JOIN price_source p
+          ON n.symbol = p.symbol
+         AND p.event_time BETWEEN n.event_time - INTERVAL '{BASELINE_MINUTES}' MINUTE
+                              AND n.event_time + INTERVAL '{HORIZON_MINUTES}' MINUTE
+    """)
+
+    # 4. One impact record per headline. Reference price = latest quote before publication
+    # (or the earliest one after, if the headline predates the price stream's coverage);
+    # price_after = latest quote within the horizon. Interval-join output follows arrival
+    # order, not event time, so these are chosen by quote time via stamped_price.
+    t_env.execute_sql(f"""
+        INSERT INTO news_impact_sink
+        SELECT
+            news_key,
+            symbol,
+            headline,
+            CAST(published_at AS TIMESTAMP(3)),
+            CAST(score AS DOUBLE),
+            price_at_news,
+            price_after,
+            high_after,
+            low_after,
+            CASE WHEN price_at_news > 0 THEN (price_after - price_at_news) / price_at_news * 100 END,
+            price_samples,
+            {HORIZON_MINUTES}
+        FROM (
+            SELECT
+                news_key, symbol, headline, published_at, score,
+                CAST(SPLIT_INDEX(baseline, '|', 1) AS DOUBLE) AS price_at_news,
+                CAST(SPLIT_INDEX(latest, '|', 1) AS DOUBLE) AS price_after,
+                high_after, low_after, price_samples
+            FROM (
+                SELECT
+                    news_key, symbol, headline, published_at, score,
+                    COALESCE(MAX(CASE WHEN NOT is_after THEN stamped_price END),
+                             MIN(CASE WHEN is_after THEN stamped_price END)) AS baseline,
+                    MAX(CASE WHEN is_after THEN stamped_price END) AS latest,
+                    MAX(CASE WHEN is_after THEN price END) AS high_after,
+                    MIN(CASE WHEN is_after THEN price END) AS low_after,
+                    COUNT(*) AS price_samples
+                FROM news_prices
+                GROUP BY news_key, symbol, headline, published_at, score
+            )
+        )
+        WHERE price_after IS NOT NULL
+    """)
+
+if __name__ == '__main__':
+    news_impact_job()
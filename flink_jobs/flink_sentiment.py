@@ -1,67 +1,260 @@
-from pyflink.datastream import StreamExecutionEnvironment
+from pyflink.datastream import CheckpointingMode, StreamExecutionEnvironment
 from pyflink.table import StreamTableEnvironment, DataTypes
-from pyflink.table.udf import udf
+from pyflink.table.udf import udf, ScalarFunction
+import os
 import json
+import time
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 
+# UDF execution mode: 'pandas' scores a whole Arrow batch of headlines per call,
+# 'row' scores one headline per call (useful for debugging)
+SENTIMENT_UDF_MODE = os.getenv('SENTIMENT_UDF_MODE', 'pandas')
+# Max headlines per Arrow batch handed to the pandas UDF
+ARROW_BATCH_SIZE = os.getenv('SENTIMENT_ARROW_BATCH_SIZE', '1000')
+
+# Per-symbol mood windows over headline event time (news_source.ts).
+# Slide == size gives tumbling windows; smaller slides give overlapping (sliding) windows.
+WINDOW_SIZE_MINUTES = int(os.getenv('SENTIMENT_WINDOW_SIZE_MINUTES', '60'))
+WINDOW_SLIDE_MINUTES = int(os.getenv('SENTIMENT_WINDOW_SLIDE_MINUTES', '5'))
+# Headlines reach Kafka up to NEWS_MAX_POLL_SECONDS after publication (and the first poll
+# of a symbol carries NEWS_LOOKBACK_DAYS of history), so windows are not closed by a
+# watermark: each headline updates its windows whenever it arrives. A window's state is
+# kept this long after its last update; later headlines start it again from empty.
+WINDOW_STATE_TTL_HOURS = int(os.getenv('SENTIMENT_WINDOW_STATE_TTL_HOURS', '96'))
+
+# Parallelism of the job; match the partition count of the stock_news topic
+# (extra source subtasks would sit idle)
+PARALLELISM = int(os.getenv('SENTIMENT_PARALLELISM', '1'))
+# Checkpoints commit Kafka offsets with the job state; with the upserting sinks below a
+# restart replays from the last checkpoint without duplicating rows
+CHECKPOINT_INTERVAL_MS = int(os.getenv('SENTIMENT_CHECKPOINT_INTERVAL_MS', '30000'))
+# Optional durable checkpoint location (e.g. file:///opt/flink/usrlib/checkpoints); default keeps them on the JobManager
+CHECKPOINT_DIR = os.getenv('SENTIMENT_CHECKPOINT_DIR', '')
+# JDBC sink batching: flush after this many rows or this interval, whichever comes first
+SINK_FLUSH_MAX_ROWS = os.getenv('SENTIMENT_SINK_FLUSH_MAX_ROWS', '500')
+SINK_FLUSH_INTERVAL = os.getenv('SENTIMENT_SINK_FLUSH_INTERVAL', '1s')
+SINK_MAX_RETRIES = os.getenv('SENTIMENT_SINK_MAX_RETRIES', '3')
+# Kafka value format written by the producers ('json' or 'avro', see producer/serializers.py).
+# For 'avro' the source columns must list every field in the producer schema's order.
+KAFKA_MESSAGE_FORMAT = os.getenv('KAFKA_MESSAGE_FORMAT', 'json')
+
 # 1. Define the Sentiment Logic (UDF - User Defined Function)
-@udf(result_type=DataTypes.FLOAT())
-def analyze_sentiment(headline: str):
-    # This runs INSIDE the Flink cluster
-    sia = SentimentIntensityAnalyzer()
-    score = sia.polarity_scores(str(headline))
-    return score['compound'] # Returns float between -1 (Negative) and +1 (Positive)
+# Both scorers report to the Flink metric system (Web UI / configured reporters) under the
+# operator's metric group: headlines_scored (counter), headlines_scored_per_second (meter)
+class NoMetric:
+    """Stands in for every metric when a scorer is opened outside a job (open(None), e.g. bench_sentiment.py)"""
+
+    def inc(self, n=1):
+        pass
+
+    def mark_event(self, n=1):
+        pass
+
+    def update(self, value):
+        pass
+
+
+class SentimentScorer(ScalarFunction):
+    """Scores one headline per call. The Vader lexicon is loaded once per worker."""
+
+    def open(self, function_context):
+        # This runs INSIDE the Flink cluster, once per Python worker
+        self.sia = SentimentIntensityAnalyzer()
+        if function_context is None:
+            self.scored = self.rate = NoMetric()
+            return
+        metrics = function_context.get_metric_group()
+        self.scored = metrics.counter('headlines_scored')
+        self.rate = metrics.meter('headlines_scored_per_second', time_span_in_seconds=60)
+
+    def eval(self, headline):
+        score = self.sia.polarity_scores(str(headline))
+        self.scored.inc()
+        self.rate.mark_event()
+        return score['compound'] # Returns float between -1 (Negative) and +1 (Positive)
+
+
+class BatchSentimentScorer(ScalarFunction):
+    """Vectorized variant: receives a pandas Series of headlines per Arrow batch."""
+
+    def open(self, function_context):
+        self.sia = SentimentIntensityAnalyzer()
+        if function_context is None:
+            self.scored = self.rate = self.batch_sizes = self.batch_micros = NoMetric()
+            return
+        metrics = function_context.get_metric_group()
+        self.scored = metrics.counter('headlines_scored')
+        self.rate = metrics.meter('headlines_scored_per_second', time_span_in_seconds=60)
+        # Per Arrow batch: headlines in it and microseconds spent scoring it
+        self.batch_sizes = metrics.distribution('arrow_batch_size')
+        self.batch_micros = metrics.distribution('batch_score_micros')
+
+    def eval(self, headlines):
+        import pandas as pd
+        start = time.perf_counter()
+        polarity = self.sia.polarity_scores
+        scores = pd.Series(
+            [polarity(str(h))['compound'] for h in headlines],
+            dtype='float32'
+        )
+        self.scored.inc(len(scores))
+        self.rate.mark_event(len(scores))
+        self.batch_sizes.update(len(scores))
+        self.batch_micros.update(int((time.perf_counter() - start) * 1e6))
+        return scores
+
+
+analyze_sentiment = udf(SentimentScorer(), result_type=DataTypes.FLOAT())
+analyze_sentiment_batch = udf(BatchSentimentScorer(), result_type=DataTypes.FLOAT(), func_type='pandas')
 
 def sentiment_job():
     env = StreamExecutionEnvironment.get_execution_environment()
+    env.set_parallelism(PARALLELISM)
+    env.enable_checkpointing(CHECKPOINT_INTERVAL_MS, CheckpointingMode.EXACTLY_ONCE)
+    if CHECKPOINT_DIR:
+        env.get_checkpoint_config().set_checkpoint_storage_dir(CHECKPOINT_DIR)
     t_env = StreamTableEnvironment.create(env)
+    t_env.get_config().set('pipeline.name', 'flink_sentiment')
+    # Event times are written to Postgres as naive UTC timestamps
+    t_env.get_config().set('table.local-time-zone', 'UTC')
+    t_env.get_config().set('python.fn-execution.arrow.batch.size', ARROW_BATCH_SIZE)
+    t_env.get_config().set('table.exec.state.ttl', f'{WINDOW_STATE_TTL_HOURS} h')
 
     # 2. Define Source (Kafka)
-    t_env.execute_sql("""
+    # event_time is the headline's publish time (ts, epoch seconds) and assigns the windows;
+    # ingest_ts is when the news producer published it, carried through for latency tracking
+    t_env.execute_sql(f"""
         CREATE TABLE news_source (
             symbol STRING,
             headline STRING,
             summary STRING,
-            ts DOUBLE
+            source STRING,
+            url STRING,
+            ts DOUBLE,
+            ingest_ts DOUBLE,
+            event_time AS TO_TIMESTAMP_LTZ(CAST(ts * 1000 AS BIGINT), 3)
         ) WITH (
             'connector' = 'kafka',
             'topic' = 'stock_news',
             'properties.bootstrap.servers' = 'kafka:29092',
             'properties.group.id' = 'flink-sentiment-consumer',
             'scan.startup.mode' = 'latest-offset',
-            'format' = 'json'
+            'format' = '{KAFKA_MESSAGE_FORMAT}'
         )
     """)
 
-    # 3. Define Sink (Postgres)
-    t_env.execute_sql("""
+    # 3. Define Sinks (Postgres)
+    # Upsert on (news_key, created_at): created_at is the headline's event time, so a
+    # replayed or re-delivered headline overwrites its row instead of adding one
+    sink_options = f"""
+            'connector' = 'jdbc',
+            'url' = 'jdbc:postgresql://postgres:5432/market_mood',
+            'username' = 'market_user',
+            'password' = 'market_password',
+            'sink.buffer-flush.max-rows' = '{SINK_FLUSH_MAX_ROWS}',
+            'sink.buffer-flush.interval' = '{SINK_FLUSH_INTERVAL}',
+            'sink.max-retries' = '{SINK_MAX_RETRIES}'
+    """
+    t_env.execute_sql(f"""
         CREATE TABLE sentiment_sink (
+            news_key STRING,
             symbol STRING,
             headline STRING,
-            sentiment_score FLOAT
+            sentiment_score FLOAT,
+            created_at TIMESTAMP(3),
+            ingested_at TIMESTAMP(3),
+            PRIMARY KEY (news_key, created_at) NOT ENFORCED
         ) WITH (
-            'connector' = 'jdbc',
-            'url' = 'jdbc:postgresql://postgres:5432/market_mood',
             'table-name' = 'sentiment_log',
-            'username' = 'market_user',
-            'password' = 'market_password'
+            {sink_options}
+        )
+    """)
+
+    # Windowed mood per symbol, upserted on (symbol, window_end)
+    t_env.execute_sql(f"""
+        CREATE TABLE sentiment_window_sink (
+            symbol STRING,
+            window_start TIMESTAMP(3),
+            window_end TIMESTAMP(3),
+            mean_score DOUBLE,
+            min_score DOUBLE,
+            max_score DOUBLE,
+            headline_count BIGINT,
+            momentum DOUBLE,
+            PRIMARY KEY (symbol, window_end) NOT ENFORCED
+        ) WITH (
+            'table-name' = 'sentiment_window',
+            {sink_options}
         )
     """)
 
     # 4. Register the UDF
-    t_env.create_temporary_function("get_sentiment", analyze_sentiment)
+    if SENTIMENT_UDF_MODE == 'row':
+        t_env.create_temporary_function("get_sentiment", analyze_sentiment)
+    else:
+        t_env.create_temporary_function("get_sentiment", analyze_sentiment_batch)
+    print(f"🧠 Sentiment UDF mode: {SENTIMENT_UDF_MODE}")
 
     # 5. Process & Write
-    # We read Kafka -> Apply Function -> Write to DB
+    # We read Kafka -> Apply Function -> Write to DB (row-level scores and windowed mood)
     t_env.execute_sql("""
-        INSERT INTO sentiment_sink
-        SELECT 
-            symbol, 
-            headline, 
-            get_sentiment(headline) 
+        CREATE TEMPORARY VIEW scored_news AS
+        SELECT
+            MD5(symbol || '|' || headline) AS news_key,
+            symbol,
+            headline,
+            get_sentiment(headline) AS score,
+            ts,
+            event_time,
+            TO_TIMESTAMP_LTZ(CAST(ingest_ts * 1000 AS BIGINT), 3) AS ingested_at
         FROM news_source
     """)
 
+    # Sliding windows as an updating aggregation: each headline is expanded into the
+    # size / slide windows that contain it (window_end epoch seconds), and the per-window
+    # aggregates are upserted on (symbol, window_end) as headlines arrive, late ones included.
+    # Windows ending in the future hold the headlines so far (readers filter on window_end).
+    if WINDOW_SIZE_MINUTES % WINDOW_SLIDE_MINUTES:
+        raise ValueError("SENTIMENT_WINDOW_SIZE_MINUTES must be a multiple of SENTIMENT_WINDOW_SLIDE_MINUTES")
+    slide = WINDOW_SLIDE_MINUTES * 60
+    size = WINDOW_SIZE_MINUTES * 60
+    offsets = ', '.join(str(k) for k in range(size // slide))
+    t_env.execute_sql(f"""
+        CREATE TEMPORARY VIEW windowed_news AS
+        SELECT symbol, score, ts, (CAST(FLOOR(ts / {slide}) AS BIGINT) + 1 + k) * {slide} AS end_epoch
+        FROM scored_news
+        CROSS JOIN UNNEST(ARRAY[{offsets}]) AS w(k)
+    """)
+
+    # Momentum: mean score of the later half of the window minus the earlier half
+    # (positive = mood improving). 0 when either half has no headlines.
+    half_window = size // 2
+    statements = t_env.create_statement_set()
+    statements.add_insert_sql("""
+        INSERT INTO sentiment_sink
+        SELECT news_key, symbol, headline, score, CAST(event_time AS TIMESTAMP(3)), CAST(ingested_at AS TIMESTAMP(3))
+        FROM scored_news
+    """)
+    statements.add_insert_sql(f"""
+        INSERT INTO sentiment_window_sink
+        SELECT
+            symbol,
+            CAST(TO_TIMESTAMP_LTZ((end_epoch - {size}) * 1000, 3) AS TIMESTAMP(3)),
+            CAST(TO_TIMESTAMP_LTZ(end_epoch * 1000, 3) AS TIMESTAMP(3)),
+            CAST(AVG(score) AS DOUBLE),
+            CAST(MIN(score) AS DOUBLE),
+            CAST(MAX(score) AS DOUBLE),
+            COUNT(*),
+            COALESCE(
+                CAST(AVG(CASE WHEN ts >= end_epoch - {half_window} THEN score END) AS DOUBLE)
+                - CAST(AVG(CASE WHEN ts < end_epoch - {half_window} THEN score END) AS DOUBLE),
+                0.0
+            )
+        FROM windowed_news
+        GROUP BY symbol, end_epoch
+    """)
+    statements.execute()
+
 if __name__ == '__main__':
-    sentiment_job()
\ No newline at end of file
+    sentiment_job()
@@ -11,30 +11,180 @@ CREATE EXTENSION IF NOT EXISTS vector;
 GRANT ALL PRIVILEGES ON SCHEMA public TO market_user;
 
 -- Table 1: price_log (Time Series)
+-- Range-partitioned by day; partitions are created ahead and dropped/archived
+-- after the retention period by producer/partition_maintenance.py
 CREATE TABLE IF NOT EXISTS price_log (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     symbol VARCHAR(10) NOT NULL,
     price DECIMAL(10, 2) NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    volume BIGINT,  -- traded volume when the source provides it (NULL for REST quotes)
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Table 1b: price_ohlcv (Rollups of price_log, maintained by price_consumer.py)
+-- resolution: '1m', '5m' or '1h'; each flushed batch is merged into its bars (backfill_rollups.py recomputes them)
+CREATE TABLE IF NOT EXISTS price_ohlcv (
+    symbol VARCHAR(10) NOT NULL,
+    resolution VARCHAR(3) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    open DECIMAL(10, 2) NOT NULL,
+    high DECIMAL(10, 2) NOT NULL,
+    low DECIMAL(10, 2) NOT NULL,
+    close DECIMAL(10, 2) NOT NULL,
+    volume BIGINT NOT NULL DEFAULT 0,
+    samples INTEGER NOT NULL,
+    last_ts TIMESTAMP NOT NULL,
+    PRIMARY KEY (symbol, resolution, bucket_start)
 );
 
 -- Table 2: sentiment_log (Enriched Data)
+-- Range-partitioned by week (see price_log). created_at is the headline's publish time and
+-- (news_key, created_at) is the Flink upsert key, so replays do not duplicate rows.
+-- ingested_at (news producer publish time) and stored_at (first write) give the
+-- headline's end-to-end latency through Kafka and Flink: stored_at - ingested_at.
 CREATE TABLE IF NOT EXISTS sentiment_log (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
+    news_key CHAR(32) NOT NULL,  -- md5(symbol || '|' || headline)
     symbol VARCHAR(10) NOT NULL,
     headline TEXT NOT NULL,
     sentiment_score FLOAT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ingested_at TIMESTAMP,
+    stored_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+    PRIMARY KEY (id, created_at),
+    UNIQUE (news_key, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Table 2b: sentiment_window (Per-symbol mood over sliding event-time windows)
+-- Written by the Flink sentiment job (JDBC upsert on symbol + window_end)
+CREATE TABLE IF NOT EXISTS sentiment_window (
+    symbol VARCHAR(10) NOT NULL,
+    window_start TIMESTAMP NOT NULL,
+    window_end TIMESTAMP NOT NULL,
+    mean_score FLOAT NOT NULL,
+    min_score FLOAT NOT NULL,
+    max_score FLOAT NOT NULL,
+    headline_count BIGINT NOT NULL,
+    momentum FLOAT NOT NULL,  -- mean of the later half of the window minus the earlier half
+    PRIMARY KEY (symbol, window_end)
 );
 
--- Table 3: financial_knowledge (Vector Store) - PHASE 2: RAG Pipeline
+-- Table 2c: news_impact (Price move following each headline)
+-- Written by the Flink news impact job (interval join of stock_news with stock_prices, upsert on news_key)
+CREATE TABLE IF NOT EXISTS news_impact (
+    news_key CHAR(32) PRIMARY KEY,  -- md5(symbol || '|' || headline)
+    symbol VARCHAR(10) NOT NULL,
+    headline TEXT NOT NULL,
+    published_at TIMESTAMP NOT NULL,
+    sentiment_score FLOAT,
+    price_at_news FLOAT,
+    price_after FLOAT,  -- last price within the horizon
+    high_after FLOAT,
+    low_after FLOAT,
+    change_pct FLOAT,
+    price_samples BIGINT,
+    horizon_minutes INTEGER
+);
+
+-- Partition management
+-- ensure_partitions('price_log', '1 day', 7) creates today's partition plus 7 ahead.
+-- Partitions are named <parent>_YYYYMMDD after their lower bound.
+-- Rows that landed in the DEFAULT partition while maintenance was not running would make
+-- CREATE ... PARTITION OF fail, so for a range with such rows the default partition is
+-- detached, the new partition created, the rows moved into it and the default reattached.
+CREATE OR REPLACE FUNCTION ensure_partitions(parent TEXT, step INTERVAL, ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    start_ts TIMESTAMP := date_trunc(CASE WHEN step >= INTERVAL '7 days' THEN 'week' ELSE 'day' END, NOW()::TIMESTAMP);
+    from_ts TIMESTAMP;
+    part_name TEXT;
+    default_name TEXT;
+    key_column TEXT;
+    has_rows BOOLEAN;
+    moved BIGINT;
+    created INTEGER := 0;
+BEGIN
+    SELECT a.attname INTO key_column
+    FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent::regclass;
+    SELECT c.relname INTO default_name
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent::regclass AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+
+    FOR i IN 0..ahead LOOP
+        from_ts := start_ts + step * i;
+        part_name := format('%s_%s', parent, to_char(from_ts, 'YYYYMMDD'));
+        IF to_regclass(part_name) IS NULL THEN
+            has_rows := FALSE;
+            IF default_name IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                               default_name, key_column, from_ts, key_column, from_ts + step)
+                INTO has_rows;
+            END IF;
+            IF has_rows THEN
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, default_name);
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               part_name, parent, from_ts, from_ts + step);
+                EXECUTE format('WITH rows AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM rows',
+                               default_name, key_column, from_ts, key_column, from_ts + step, part_name);
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, default_name);
+                RAISE NOTICE 'Moved % row(s) from % into %', moved, default_name, part_name;
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               part_name, parent, from_ts, from_ts + step);
+            END IF;
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Catch-all partitions so a missed maintenance run never rejects inserts
+CREATE TABLE IF NOT EXISTS price_log_default PARTITION OF price_log DEFAULT;
+CREATE TABLE IF NOT EXISTS sentiment_log_default PARTITION OF sentiment_log DEFAULT;
+SELECT ensure_partitions('price_log', INTERVAL '1 day', 7);
+SELECT ensure_partitions('sentiment_log', INTERVAL '7 days', 2);
+
+-- Table 3: Knowledge store (Vector Store) - PHASE 2: RAG Pipeline
 -- Enabled for Combined Phase Development
-CREATE TABLE IF NOT EXISTS financial_knowledge (
-    id SERIAL PRIMARY KEY,
-    symbol VARCHAR(10),
+-- One document per story (content_hash = sha1 of the normalized headline, as in the news
+-- producer's dedup), so a story syndicated under several tickers is embedded once.
+CREATE TABLE IF NOT EXISTS knowledge_documents (
+    id BIGSERIAL PRIMARY KEY,
+    content_hash CHAR(40) NOT NULL UNIQUE,
+    headline TEXT NOT NULL,
+    summary TEXT,
+    source TEXT,
+    url TEXT,
+    published_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Embedding-sized pieces of each document; content_tsv backs keyword search
+CREATE TABLE IF NOT EXISTS knowledge_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    document_id BIGINT NOT NULL REFERENCES knowledge_documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
     content TEXT NOT NULL,
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
     embedding vector(384) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (document_id, chunk_index)
+);
+
+-- Tickers each document was published under; news_key links to its sentiment_log score
+CREATE TABLE IF NOT EXISTS knowledge_document_symbols (
+    document_id BIGINT NOT NULL REFERENCES knowledge_documents(id) ON DELETE CASCADE,
+    symbol VARCHAR(10) NOT NULL,
+    news_key CHAR(32) NOT NULL,  -- md5(symbol || '|' || headline)
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (document_id, symbol)
 );
 
 -- Grant table privileges
@@ -43,10 +193,20 @@ GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA public TO market_user;
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_price_log_symbol_timestamp ON price_log(symbol, timestamp DESC);
+-- BRIN indexes: rows arrive in time order, so tiny block-range summaries prune time scans
+CREATE INDEX IF NOT EXISTS idx_price_log_timestamp_brin ON price_log USING brin (timestamp);
+CREATE INDEX IF NOT EXISTS idx_sentiment_log_created_at_brin ON sentiment_log USING brin (created_at);
+CREATE INDEX IF NOT EXISTS idx_price_ohlcv_resolution_bucket ON price_ohlcv(resolution, bucket_start DESC);
 CREATE INDEX IF NOT EXISTS idx_sentiment_log_symbol ON sentiment_log(symbol);
+CREATE INDEX IF NOT EXISTS idx_news_impact_symbol_published ON news_impact(symbol, published_at DESC);
 -- PHASE 2: Enabled for RAG pipeline
-CREATE INDEX IF NOT EXISTS idx_financial_knowledge_symbol ON financial_knowledge(symbol);
-CREATE INDEX IF NOT EXISTS idx_financial_knowledge_embedding ON financial_knowledge USING ivfflat (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS idx_knowledge_document_symbols_symbol ON knowledge_document_symbols(symbol, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_document ON knowledge_chunks(document_id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_created_at ON knowledge_chunks(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_tsv ON knowledge_chunks USING gin (content_tsv);
+-- HNSW needs no training data (ivfflat built on an empty table has useless lists).
+-- Queries must order by cosine distance (<=>) to use it.
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_embedding ON knowledge_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- Tables created successfully
 -- You can verify with: \dt
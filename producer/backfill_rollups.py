@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Rollup Backfill: Rebuilds price_ohlcv bars from existing price_log rows
+Safe to re-run (bars are upserted). Examples:
+    docker-compose run --rm producer python backfill_rollups.py --hours 72
+    docker-compose run --rm producer python backfill_rollups.py --since 2025-01-01 --symbols AAPL,TSLA
+"""
+import argparse
+import os
+import time
+import psycopg2
+from datetime import datetime, timedelta
+from price_rollup import RESOLUTIONS, refresh_rollups
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
+POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill 1m/5m/1h OHLCV rollups from price_log")
+    parser.add_argument('--hours', type=int, default=72, help="Backfill the last N hours (default: 72)")
+    parser.add_argument('--since', help="Start date/time (ISO, UTC); overrides --hours")
+    parser.add_argument('--until', help="End date/time (ISO, UTC); default: now")
+    parser.add_argument('--symbols', help="Comma-separated symbols (default: all)")
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS), help="Comma-separated resolutions")
+    parser.add_argument('--chunk-hours', type=int, default=24, help="Hours per transaction (default: 24)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    until = datetime.fromisoformat(args.until) if args.until else datetime.utcnow()
+    since = datetime.fromisoformat(args.since) if args.since else until - timedelta(hours=args.hours)
+    symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else None
+    resolutions = [r.strip() for r in args.resolutions.split(',')]
+
+    conn = psycopg2.connect(
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        host=POSTGRES_HOST,
+        port=5432
+    )
+    print(f"🔁 Backfilling {', '.join(resolutions)} bars from {since} to {until} "
+          f"for {', '.join(symbols) if symbols else 'all symbols'}")
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        chunk_start = since
+        while chunk_start < until:
+            # Each chunk recomputes whole buckets, so bars spanning a chunk boundary are complete
+            chunk_end = min(chunk_start + timedelta(hours=args.chunk_hours), until)
+            with conn.cursor() as cursor:
+                written = refresh_rollups(cursor, chunk_start, chunk_end, symbols=symbols, resolutions=resolutions)
+            conn.commit()
+            total += written
+            print(f"   ✅ {chunk_start:%Y-%m-%d %H:%M} → {chunk_end:%Y-%m-%d %H:%M}: {written} bars")
+            chunk_start = chunk_end
+    except KeyboardInterrupt:
+        print("\n🛑 Backfill interrupted (completed chunks are committed)")
+    finally:
+        conn.close()
+
+    print(f"📊 Backfill complete: {total} bars in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
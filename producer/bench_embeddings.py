@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Embedding Benchmark: Startup time and CPU docs/sec for all-MiniLM-L6-v2 per embedding backend
+For each backend (see embedders.py) it measures, in a fresh interpreter, the import + model
+load time and the first encode; then docs/sec at each encode batch size, and how closely the
+vectors agree with the torch backend (cosine similarity). Run inside the producer container
+(no Kafka/Postgres needed):
+    docker-compose run --rm producer python bench_embeddings.py
+    docker-compose run --rm producer python bench_embeddings.py --backends torch,torch-int8,onnx,onnx-int8
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+NUM_DOCS = int(os.getenv('BENCH_DOCS', '2000'))
+BATCH_SIZES = [int(b) for b in os.getenv('BENCH_BATCH_SIZES', '1,8,32,64,128,256').split(',')]
+BACKENDS = os.getenv('BENCH_BACKENDS', 'torch')
+
+WORDS = ('shares surge plunge earnings revenue guidance outlook analyst upgrade downgrade '
+         'regulators fine record quarter deliveries layoffs dividend buyback merger lawsuit').split()
+
+# Runs in a fresh interpreter so the import cost (torch, onnxruntime) is measured cold
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from embedders import LazyEmbedder
+lazy = LazyEmbedder({backend!r})
+deferred = time.perf_counter() - start
+lazy.load()
+loaded = time.perf_counter() - start
+lazy.encode(['warm up'], batch_size=1)
+print(deferred, loaded, time.perf_counter() - start)
+"""
+
+def synthetic_docs(n):
+    """Texts shaped like rag_ingest chunks: symbol, headline and a ~40 word summary"""
+    rng = random.Random(7)
+    docs = []
+    for i in range(n):
+        headline = ' '.join(rng.choices(WORDS, k=10))
+        summary = ' '.join(rng.choices(WORDS, k=40))
+        docs.append(f"SYM{i % 50} Headline: {headline}. Summary: {summary}")
+    return docs
+
+def measure_startup(backend):
+    """(lazy construction, import + load, first encode done) seconds in a new process"""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT.format(backend=backend)],
+        cwd=Path(__file__).resolve().parent, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'startup failed')
+    return [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+
+def measure_throughput(embedder, docs):
+    """docs/sec per batch size; batch=1 mirrors the old one-text-per-message ingest loop"""
+    embedder.encode(docs[:32], batch_size=32)  # warm-up
+    rates = {}
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for i in range(0, len(docs), batch_size):
+            embedder.encode(docs[i:i + batch_size], batch_size=batch_size)
+        rates[batch_size] = len(docs) / (time.perf_counter() - start)
+    return rates
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends: startup time and encode throughput")
+    parser.add_argument('--backends', default=BACKENDS, help="Comma-separated backends (torch, torch-int8, onnx, onnx-int8)")
+    parser.add_argument('--skip-startup', action='store_true', help="Only measure encode throughput")
+    args = parser.parse_args()
+
+    import numpy as np
+    from embedders import create_embedder
+
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    docs = synthetic_docs(NUM_DOCS)
+    sample = docs[:256]
+    reference = None
+    if len(backends) > 1 and 'torch' in backends:
+        reference = np.asarray(create_embedder('torch').encode(sample, batch_size=64))
+
+    for backend in backends:
+        print(f"\n📊 {backend}")
+        if not args.skip_startup:
+            try:
+                deferred, loaded, first = measure_startup(backend)
+                print(f"   Startup: {deferred * 1000:.0f} ms until first use (lazy), "
+                      f"{loaded:.2f}s import + load, {first:.2f}s to the first vector")
+            except Exception as e:
+                print(f"   ⚠️  Skipped: {e}")
+                continue
+        try:
+            embedder = create_embedder(backend)
+        except Exception as e:
+            print(f"   ⚠️  Skipped: {e}")
+            continue
+        rates = measure_throughput(embedder, docs)
+        print(f"   Encoding {NUM_DOCS} docs on CPU: " +
+              ', '.join(f"batch {b}: {rate:.1f}/s" for b, rate in rates.items()))
+        if reference is not None and backend != 'torch':
+            vectors = np.asarray(embedder.encode(sample, batch_size=64))
+            cosine = (vectors * reference).sum(axis=1)  # both sides are L2-normalized
+            print(f"   Agreement with torch: mean cosine {cosine.mean():.4f}, min {cosine.min():.4f}")
+
+if __name__ == '__main__':
+    main()
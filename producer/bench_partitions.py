@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Partitioning Benchmark: Insert rate and 72h query latency, plain heap vs daily partitions + BRIN
+Builds two scratch tables shaped like price_log and drops them afterwards. Example:
+    docker-compose run --rm producer python bench_partitions.py
+    BENCH_ROWS=100000000 BENCH_DAYS=90 docker-compose run --rm producer python bench_partitions.py
+"""
+import os
+import time
+import psycopg2
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+NUM_ROWS = int(os.getenv('BENCH_ROWS', '1000000'))
+NUM_DAYS = int(os.getenv('BENCH_DAYS', '30'))
+NUM_SYMBOLS = int(os.getenv('BENCH_SYMBOLS', '200'))
+CHUNK_ROWS = int(os.getenv('BENCH_CHUNK_ROWS', '1000000'))
+QUERY_RUNS = int(os.getenv('BENCH_QUERY_RUNS', '5'))
+
+SETUP = {
+    'heap': [
+        """CREATE TABLE bench_price_heap (
+               id BIGSERIAL PRIMARY KEY, symbol VARCHAR(10) NOT NULL, price DECIMAL(10, 2) NOT NULL,
+               timestamp TIMESTAMP NOT NULL, volume BIGINT)""",
+        "CREATE INDEX ON bench_price_heap (symbol, timestamp DESC)",
+        "CREATE INDEX ON bench_price_heap (timestamp)",
+    ],
+    'partitioned': [
+        """CREATE TABLE bench_price_part (
+               id BIGSERIAL, symbol VARCHAR(10) NOT NULL, price DECIMAL(10, 2) NOT NULL,
+               timestamp TIMESTAMP NOT NULL, volume BIGINT, PRIMARY KEY (id, timestamp)
+           ) PARTITION BY RANGE (timestamp)""",
+        "CREATE INDEX ON bench_price_part (symbol, timestamp DESC)",
+        "CREATE INDEX ON bench_price_part USING brin (timestamp)",
+    ],
+}
+TABLES = {'heap': 'bench_price_heap', 'partitioned': 'bench_price_part'}
+
+# Rows are spread evenly over NUM_DAYS ending now, in time order (as the consumer writes them)
+INSERT_SQL = """
+    INSERT INTO {table} (symbol, price, timestamp)
+    SELECT 'SYM' || (g %% %(symbols)s), 100 + (g %% 1000) / 10.0,
+           NOW()::timestamp - make_interval(days => %(days)s)
+               + (g * (%(days)s * 86400.0 / %(rows)s)) * INTERVAL '1 second'
+    FROM generate_series(%(start)s, %(end)s) AS g
+"""
+
+QUERIES = {
+    'one symbol, 72h': """
+        SELECT count(*), avg(price) FROM {table}
+        WHERE symbol = 'SYM1' AND timestamp > NOW() - INTERVAL '72 hours'""",
+    'all symbols, 72h hourly': """
+        SELECT symbol, date_trunc('hour', timestamp), avg(price) FROM {table}
+        WHERE timestamp > NOW() - INTERVAL '72 hours' GROUP BY 1, 2""",
+}
+
+def main():
+    conn = psycopg2.connect(
+        dbname=os.getenv('POSTGRES_DB', 'market_mood'),
+        user=os.getenv('POSTGRES_USER', 'market_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'market_password'),
+        host=POSTGRES_HOST,
+        port=5432
+    )
+    conn.autocommit = True
+    cursor = conn.cursor()
+    print(f"📊 {NUM_ROWS:,} rows over {NUM_DAYS} days, {NUM_SYMBOLS} symbols")
+
+    try:
+        for kind, statements in SETUP.items():
+            table = TABLES[kind]
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in statements:
+                cursor.execute(statement)
+            if kind == 'partitioned':
+                cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+                for day in range(NUM_DAYS + 2):
+                    cursor.execute(f"""
+                        CREATE TABLE {table}_{day} PARTITION OF {table}
+                        FOR VALUES FROM (date_trunc('day', NOW()::timestamp) - make_interval(days => {NUM_DAYS - day}))
+                                   TO (date_trunc('day', NOW()::timestamp) - make_interval(days => {NUM_DAYS - day - 1}))
+                    """)
+
+            start = time.perf_counter()
+            for chunk_start in range(0, NUM_ROWS, CHUNK_ROWS):
+                cursor.execute(INSERT_SQL.format(table=table), {
+                    'symbols': NUM_SYMBOLS, 'days': NUM_DAYS, 'rows': NUM_ROWS,
+                    'start': chunk_start, 'end': min(chunk_start + CHUNK_ROWS, NUM_ROWS) - 1,
+                })
+            elapsed = time.perf_counter() - start
+            cursor.execute(f"VACUUM ANALYZE {table}")
+            if kind == 'partitioned':
+                cursor.execute(f"""
+                    SELECT pg_size_pretty(sum(pg_total_relation_size(inhrelid)))
+                    FROM pg_inherits WHERE inhparent = '{table}'::regclass""")
+            else:
+                cursor.execute(f"SELECT pg_size_pretty(pg_total_relation_size('{table}'))")
+            size = cursor.fetchone()[0]
+            print(f"\n🗄️  {kind}: {NUM_ROWS / elapsed:,.0f} rows/sec insert, {size} on disk")
+
+            for label, sql in QUERIES.items():
+                cursor.execute(sql.format(table=table))  # warm cache
+                start = time.perf_counter()
+                for _ in range(QUERY_RUNS):
+                    cursor.execute(sql.format(table=table))
+                    cursor.fetchall()
+                print(f"   {label:<26} {(time.perf_counter() - start) * 1000 / QUERY_RUNS:8.1f} ms")
+    finally:
+        for table in TABLES.values():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.close()
+
+if __name__ == '__main__':
+    main()
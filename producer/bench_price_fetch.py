@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Price Fetch Benchmark: Measures quote-cycle latency against a local stub of the Finnhub /quote API
+No API key or network access needed. Example:
+    python producer/bench_price_fetch.py
+    BENCH_STUB_LATENCY_MS=120 BENCH_WORKERS=16 python producer/bench_price_fetch.py
+"""
+import os
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from price_producer import create_session, fetch_quotes, get_finnhub_quote
+from rate_limiter import TokenBucket
+
+STUB_LATENCY_MS = int(os.getenv('BENCH_STUB_LATENCY_MS', '80'))
+SYMBOL_COUNTS = [int(n) for n in os.getenv('BENCH_SYMBOL_COUNTS', '30,200,1000').split(',')]
+WORKERS = int(os.getenv('BENCH_WORKERS', '8'))
+# Effectively unlimited by default so the engine itself is measured; set to 60 to see the quota
+CALLS_PER_MINUTE = int(os.getenv('BENCH_CALLS_PER_MINUTE', '1000000'))
+
+
+class StubQuoteHandler(BaseHTTPRequestHandler):
+    """Answers /quote with a random Finnhub-shaped payload after a fixed delay"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        time.sleep(STUB_LATENCY_MS / 1000.0)
+        price = round(random.uniform(10, 500), 2)
+        body = json.dumps({
+            'symbol': query.get('symbol', [''])[0],
+            'c': price, 'h': price * 1.01, 'l': price * 0.99, 'o': price, 'pc': price
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubQuoteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    server, base_url = start_stub_server()
+    print(f"🧪 Stub Finnhub at {base_url} ({STUB_LATENCY_MS} ms/request)")
+    session = create_session(WORKERS)
+    executor = ThreadPoolExecutor(max_workers=WORKERS)
+
+    try:
+        for count in SYMBOL_COUNTS:
+            symbols = [f"SYM{i}" for i in range(count)]
+
+            # Old path: one blocking request after another (without the extra 0.2s sleep)
+            start = time.perf_counter()
+            for symbol in symbols:
+                get_finnhub_quote(symbol, 'bench', base_url=base_url)
+            serial = time.perf_counter() - start
+
+            limiter = TokenBucket(CALLS_PER_MINUTE)
+            start = time.perf_counter()
+            fetched = sum(1 for _ in fetch_quotes(symbols, 'bench', executor, session, limiter, base_url=base_url))
+            concurrent = time.perf_counter() - start
+
+            print(f"📊 {count:>5} symbols: serial {serial:6.2f}s | "
+                  f"{WORKERS} workers {concurrent:6.2f}s ({fetched} quotes) | speedup {serial / concurrent:4.1f}x")
+    finally:
+        executor.shutdown()
+        session.close()
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
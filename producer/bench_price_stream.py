@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Price Stream Benchmark: Trades/sec the WebSocket ingest can absorb and the quotes it publishes
+Runs FinnhubTradeStream against a local stub of Finnhub's trade WebSocket (stdlib only). The
+stub sends frames of BENCH_TRADES_PER_FRAME trades for the subscribed symbols as fast as the
+client reads them, and drops the connection once after BENCH_DROP_AFTER seconds to exercise
+reconnect + resubscribe. Example:
+    docker-compose run --rm producer python bench_price_stream.py
+    docker-compose run --rm producer python bench_price_stream.py --kafka   # publish to bench_stock_prices
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from price_stream import FinnhubTradeStream
+
+NUM_SYMBOLS = int(os.getenv('BENCH_SYMBOLS', '50'))
+TRADES_PER_FRAME = int(os.getenv('BENCH_TRADES_PER_FRAME', '20'))
+SECONDS = float(os.getenv('BENCH_SECONDS', '10'))
+DROP_AFTER = float(os.getenv('BENCH_DROP_AFTER', '3'))
+BATCH_MS = int(os.getenv('BENCH_BATCH_MS', '250'))
+REST_CALLS_PER_MINUTE = int(os.getenv('FINNHUB_CALLS_PER_MINUTE', '60'))
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def ws_frame(text):
+    """Unmasked server -> client text frame"""
+    payload = text.encode('utf-8')
+    if len(payload) < 126:
+        header = struct.pack('!BB', 0x81, len(payload))
+    elif len(payload) < 65536:
+        header = struct.pack('!BBH', 0x81, 126, len(payload))
+    else:
+        header = struct.pack('!BBQ', 0x81, 127, len(payload))
+    return header + payload
+
+
+def read_frame(rfile):
+    """Read one masked client -> server frame; returns (opcode, payload) or (None, None) on EOF"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, None
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b'\0\0\0\0'
+    data = rfile.read(length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+class StubFinnhubHandler(socketserver.StreamRequestHandler):
+    """One client connection: handshake, collect subscriptions, then stream trades"""
+    stats = {'connections': 0, 'subscriptions': [], 'trades_sent': 0}
+    dropped = threading.Event()
+    started_at = None
+
+    def handle(self):
+        headers = {}
+        self.rfile.readline()
+        for line in iter(self.rfile.readline, b'\r\n'):
+            if not line:
+                return
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        self.stats['connections'] += 1
+        subscribed = []
+        self.stats['subscriptions'].append(subscribed)
+        threading.Thread(target=self.read_subscriptions, args=(subscribed,), daemon=True).start()
+
+        while not subscribed:
+            time.sleep(0.01)
+        time.sleep(0.05)  # let the rest of the subscribe messages arrive
+        frames = 0
+        try:
+            while True:
+                now = time.time()
+                trades = [{'s': random.choice(subscribed), 'p': round(random.uniform(50, 900), 2),
+                           't': int(now * 1000), 'v': random.randint(1, 500), 'c': None}
+                          for _ in range(TRADES_PER_FRAME)]
+                self.wfile.write(ws_frame(json.dumps({'type': 'trade', 'data': trades})))
+                self.stats['trades_sent'] += TRADES_PER_FRAME
+                frames += 1
+                if frames % 1000 == 0:
+                    self.wfile.write(ws_frame('{"type":"ping"}'))
+                # Simulate one abrupt network drop mid-run
+                if not self.dropped.is_set() and time.monotonic() - self.started_at >= DROP_AFTER:
+                    self.dropped.set()
+                    self.request.shutdown(socket.SHUT_RDWR)
+                    return
+        except OSError:
+            return
+
+    def read_subscriptions(self, subscribed):
+        while True:
+            opcode, payload = read_frame(self.rfile)
+            if opcode is None or opcode == 0x8:
+                return
+            if opcode == 0x1:
+                message = json.loads(payload)
+                if message.get('type') == 'subscribe':
+                    subscribed.append(message['symbol'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WebSocket price ingest against a local stub")
+    parser.add_argument('--kafka', action='store_true', help="Publish quotes to Kafka topic bench_stock_prices")
+    args = parser.parse_args()
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StubFinnhubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    symbols = [f"SYM{i:03d}" for i in range(NUM_SYMBOLS)]
+
+    published = {'quotes': 0, 'batches': 0}
+    send = None
+    if args.kafka:
+        from delivery import DeliveryTracker, format_stats
+        from serializers import create_producer
+        producer = create_producer('stock_prices')
+        tracker = DeliveryTracker(producer, 'bench_stock_prices')
+        send = lambda quote: tracker.send(quote['symbol'], quote)
+
+    def on_batch(quotes):
+        published['batches'] += 1
+        published['quotes'] += len(quotes)
+        if send:
+            for quote in quotes:
+                quote['ingest_ts'] = time.time()
+                send(quote)
+
+    stream = FinnhubTradeStream(symbols, None, on_batch, url=f"ws://127.0.0.1:{server.server_address[1]}",
+                                batch_ms=BATCH_MS, max_backoff=1)
+    print(f"🧪 Stub stream: {NUM_SYMBOLS} symbols, {TRADES_PER_FRAME} trades/frame, {BATCH_MS} ms micro-batches, "
+          f"drop after {DROP_AFTER:.0f}s, {SECONDS:.0f}s run")
+    StubFinnhubHandler.started_at = time.monotonic()
+    runner = threading.Thread(target=stream.run, daemon=True)
+    start = time.perf_counter()
+    runner.start()
+    time.sleep(SECONDS)
+    stream.stop()
+    runner.join(timeout=5)
+    elapsed = time.perf_counter() - start
+    if send:
+        tracker.flush()
+        delivery = tracker.cycle_stats()
+        producer.close()
+    server.shutdown()
+
+    stats = StubFinnhubHandler.stats
+    resubscribed = [len(s) for s in stats['subscriptions']]
+    print(f"📊 Received {stream.coalescer.trades:,} trades in {stream.messages:,} frames: "
+          f"{stream.coalescer.trades / elapsed:,.0f} trades/s, {stream.messages / elapsed:,.0f} frames/s")
+    print(f"   Published {published['quotes']:,} quotes in {published['batches']:,} micro-batches: "
+          f"{published['quotes'] / elapsed:,.0f} quotes/s "
+          f"({stream.coalescer.trades / max(published['quotes'], 1):,.0f} trades per quote)")
+    if send:
+        print(f"   Kafka: {format_stats(delivery)}")
+    print(f"   Connections: {stats['connections']} (symbols subscribed per connection: {resubscribed})")
+    print(f"   REST polling at {REST_CALLS_PER_MINUTE} calls/min: {REST_CALLS_PER_MINUTE / 60:.1f} quotes/s, "
+          f"each of {NUM_SYMBOLS} symbols refreshed every {NUM_SYMBOLS * 60 / REST_CALLS_PER_MINUTE:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Serialization Benchmark: Bytes/message and producer CPU per 100k messages, JSON vs Avro
+Messages are synthetic stock_prices/stock_news payloads. Compressed sizes are measured on
+batches of BENCH_BATCH messages, roughly what a producer batch holds at KAFKA_LINGER_MS. Example:
+    docker-compose run --rm producer python bench_serialization.py
+    docker-compose run --rm producer python bench_serialization.py --kafka   # also send through Kafka
+"""
+import argparse
+import os
+import random
+import time
+from serializers import KAFKA_COMPRESSION_TYPE, create_producer, serializer_for
+
+NUM_MESSAGES = int(os.getenv('BENCH_MESSAGES', '100000'))
+BATCH = int(os.getenv('BENCH_BATCH', '500'))
+FORMATS = ['json', 'avro']
+SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'NVDA', 'AMZN', 'GOOGL', 'META', 'AMD', 'NFLX', 'JPM']
+
+def price_message(i):
+    price = round(random.uniform(50, 900), 2)
+    return {
+        'symbol': SYMBOLS[i % len(SYMBOLS)],
+        'price': price,
+        'high': round(price * 1.02, 2),
+        'low': round(price * 0.98, 2),
+        'open': round(price * 1.001, 2),
+        'previous_close': round(price * 0.995, 2),
+        'ts': time.time(),
+    }
+
+def news_message(i):
+    symbol = SYMBOLS[i % len(SYMBOLS)]
+    headline = f"{symbol} shares {random.choice(['rise', 'fall', 'hold'])} after quarterly results beat estimates"
+    return {
+        'symbol': symbol,
+        'headline': headline,
+        'summary': headline + ". Analysts raised price targets citing strong demand and margin expansion.",
+        'source': 'Reuters',
+        'url': f"https://example.com/news/{i}",
+        'ts': float(int(time.time())),
+    }
+
+def compressor(codec):
+    """Return a bytes -> bytes function for the Kafka compression codec (None if disabled/unavailable)"""
+    try:
+        if codec == 'lz4':
+            import lz4.frame
+            return lz4.frame.compress
+        if codec == 'zstd':
+            import zstandard
+            return zstandard.ZstdCompressor().compress
+        if codec == 'gzip':
+            import gzip
+            return gzip.compress
+    except ImportError:
+        print(f"⚠️ {codec} module not installed; skipping compressed sizes")
+    return None
+
+def bench_encode(topic, messages, fmt, compress):
+    serialize = serializer_for(topic, fmt)
+    start = time.process_time()
+    encoded = [serialize(m) for m in messages]
+    cpu = time.process_time() - start
+    raw = sum(len(e) for e in encoded)
+
+    compressed = None
+    if compress:
+        compressed = 0
+        for i in range(0, len(encoded), BATCH):
+            compressed += len(compress(b''.join(encoded[i:i + BATCH])))
+    return cpu, raw, compressed
+
+def bench_kafka(topic, messages, fmt):
+    """Producer CPU (this process) to serialize, batch, compress and send every message"""
+    producer = create_producer(topic, fmt)
+    bench_topic = f"bench_{topic}_{fmt}"
+    start = time.process_time()
+    wall = time.perf_counter()
+    for message in messages:
+        producer.send(bench_topic, value=message)
+    producer.flush()
+    cpu = time.process_time() - start
+    elapsed = time.perf_counter() - wall
+    producer.close()
+    return cpu, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Kafka message formats")
+    parser.add_argument('--kafka', action='store_true', help="Also send through a real producer (bench_* topics)")
+    args = parser.parse_args()
+
+    compress = compressor(KAFKA_COMPRESSION_TYPE)
+    per_100k = 100000 / NUM_MESSAGES
+    print(f"📊 {NUM_MESSAGES:,} messages per topic, compression {KAFKA_COMPRESSION_TYPE} on {BATCH}-message batches\n")
+    for topic, factory in (('stock_prices', price_message), ('stock_news', news_message)):
+        messages = [factory(i) for i in range(NUM_MESSAGES)]
+        print(f"📨 {topic}")
+        print(f"   {'format':<6} {'bytes/msg':>10} {'compressed':>11} {'CPU s/100k':>11}"
+              + (f" {'send CPU s/100k':>16} {'msg/s':>9}" if args.kafka else ''))
+        for fmt in FORMATS:
+            cpu, raw, compressed = bench_encode(topic, messages, fmt, compress)
+            line = (f"   {fmt:<6} {raw / NUM_MESSAGES:>10.1f} "
+                    f"{(compressed / NUM_MESSAGES if compressed else float('nan')):>11.1f} {cpu * per_100k:>11.3f}")
+            if args.kafka:
+                send_cpu, elapsed = bench_kafka(topic, messages, fmt)
+                line += f" {send_cpu * per_100k:>16.3f} {NUM_MESSAGES / elapsed:>9,.0f}"
+            print(line)
+        print()
+
+if __name__ == '__main__':
+    main()
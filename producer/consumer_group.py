@@ -0,0 +1,88 @@
+"""
+Consumer Group: Helpers for running the Kafka consumers as scalable consumer-group members
+- create_consumer() subscribes with an explicit group id and a per-worker client id
+- FlushOnRevoke writes and commits a worker's buffered batch before a rebalance takes its
+  partitions away (or drops it if that fails, since the new owner re-reads from the last
+  committed offset), so scaling instances in or out neither loses nor duplicates rows
+- run_workers() runs N independent consumer loops in one process
+Messages are keyed by symbol, so each symbol lives on one partition and is processed in
+order by whichever worker owns that partition.
+"""
+import os
+import socket
+import threading
+
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from serializers import deserializer_for
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
+
+
+class FlushOnRevoke(ConsumerRebalanceListener):
+    """
+    `flush()` must write and commit everything buffered; `discard()` drops the buffer.
+    Both run on the worker's own thread, inside consumer.poll().
+    """
+
+    def __init__(self, name, flush, discard):
+        self.name = name
+        self.flush = flush
+        self.discard = discard
+
+    def on_partitions_revoked(self, revoked):
+        if not revoked:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️  {self.name}: could not flush before rebalance ({e}); dropping the batch, "
+                  f"the new owner re-reads it")
+            self.discard()
+
+    def on_partitions_lost(self, lost):
+        # Membership already expired: offsets can no longer be committed
+        self.discard()
+
+    def on_partitions_assigned(self, assigned):
+        partitions = sorted(f"{tp.topic}[{tp.partition}]" for tp in assigned)
+        print(f"🧩 {self.name}: assigned {', '.join(partitions) or 'no partitions'}")
+
+
+def create_consumer(topic, group_id, worker_id, listener=None, **overrides):
+    """Manual-commit KafkaConsumer subscribed to `topic` as a member of `group_id`"""
+    options = dict(
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        group_id=group_id,
+        client_id=f"{group_id}-{socket.gethostname()}-{worker_id}",
+        value_deserializer=deserializer_for(topic),
+        enable_auto_commit=False,
+    )
+    options.update(overrides)
+    consumer = KafkaConsumer(**options)
+    consumer.subscribe([topic], listener=listener)
+    return consumer
+
+
+def run_workers(target, count):
+    """
+    Run target(worker_id, stop_event) on `count` threads (inline when count == 1) and wait.
+    Ctrl+C sets the stop event so every worker can flush and close before returning.
+    """
+    stop = threading.Event()
+    if count <= 1:
+        try:
+            target(0, stop)
+        except KeyboardInterrupt:
+            stop.set()
+        return
+    threads = [threading.Thread(target=target, args=(i, stop), name=f"worker-{i}") for i in range(count)]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
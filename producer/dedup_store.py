@@ -0,0 +1,100 @@
+"""
+Dedup Store: Bounded record of already-published news, persisted across restarts
+Entries expire after a TTL and the least recently seen entries are evicted past max_entries.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_headline(headline):
+    """Lowercase alphanumeric words only; empty for a missing or punctuation-only headline"""
+    return re.sub(r'[^a-z0-9]+', ' ', str(headline).lower()).strip()
+
+
+def content_hash(headline):
+    """
+    Hash of the normalized headline. Syndicated stories that Finnhub lists under
+    several symbols (with different IDs) normalize to the same hash.
+    """
+    return hashlib.sha1(normalize_headline(headline).encode('utf-8')).hexdigest()
+
+
+def news_key(symbol, headline):
+    """Per-symbol headline key; same as the Flink jobs' MD5(symbol || '|' || headline)"""
+    return hashlib.md5(f"{symbol}|{headline}".encode('utf-8')).hexdigest()
+
+
+class DedupStore:
+    """
+    TTL + LRU set of keys (e.g. 'id:AAPL:123', 'hash:AAPL:<sha1>') backed by a JSON snapshot file.
+    Thread-safe, so delivery callbacks from the Kafka I/O thread can add keys.
+    """
+
+    def __init__(self, path=None, ttl_seconds=7 * 24 * 3600, max_entries=200000):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> last seen (epoch seconds), oldest first
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            seen_at = self.entries.get(key)
+            if seen_at is None:
+                return False
+            if time.time() - seen_at > self.ttl:
+                del self.entries[key]
+                return False
+            return True
+
+    def add(self, *keys):
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                self.entries[key] = now
+                self.entries.move_to_end(key)
+            self._evict(now)
+
+    def _evict(self, now):
+        while self.entries:
+            key, seen_at = next(iter(self.entries.items()))
+            if len(self.entries) > self.max_entries or now - seen_at > self.ttl:
+                self.entries.popitem(last=False)
+            else:
+                break
+
+    def load(self):
+        """Reload a snapshot written by save(). Missing or corrupt files start empty."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load dedup snapshot {self.path}: {e}")
+            return 0
+        with self.lock:
+            for key, seen_at in sorted(snapshot.get('entries', {}).items(), key=lambda kv: kv[1]):
+                self.entries[key] = seen_at
+            self._evict(time.time())
+            return len(self.entries)
+
+    def save(self):
+        """Atomically write the current entries to disk (temp file + rename)"""
+        if not self.path:
+            return
+        with self.lock:
+            snapshot = {'saved_at': time.time(), 'entries': dict(self.entries)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
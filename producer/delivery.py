@@ -0,0 +1,160 @@
+"""
+Delivery Tracker: Asynchronous Kafka delivery with callbacks and a bounded in-flight window
+KafkaProducer.send() only queues a record; whether the broker stored it is known later, on the
+producer's I/O thread. DeliveryTracker attaches success/error callbacks to every send and:
+- caps unacknowledged records at KAFKA_MAX_IN_FLIGHT, so send() blocks (backpressure on the
+  fetch loop) instead of growing the buffer while Kafka is slow, and raises after
+  KAFKA_SEND_TIMEOUT_SEC if the broker stays unreachable
+- hands outcomes back to the caller's thread: on_success/on_error run inside send(), poll()
+  and flush(), so they can touch state (e.g. the news dedup store) without locking
+- keeps per-cycle delivery stats (acknowledged, failed, send-to-ack latency percentiles)
+"""
+import collections
+import os
+import threading
+import time
+
+from metrics import counter, gauge, histogram
+
+KAFKA_MAX_IN_FLIGHT = int(os.getenv('KAFKA_MAX_IN_FLIGHT', '1000'))
+KAFKA_SEND_TIMEOUT_SEC = float(os.getenv('KAFKA_SEND_TIMEOUT_SEC', '30'))
+KAFKA_FLUSH_TIMEOUT_SEC = float(os.getenv('KAFKA_FLUSH_TIMEOUT_SEC', '30'))
+
+DELIVERY_LATENCY = histogram('producer_delivery_seconds', 'send() to broker acknowledgement', ('topic',))
+DELIVERED = counter('producer_delivered_total', 'Messages acknowledged by the broker', ('topic',))
+DELIVERY_ERRORS = counter('producer_delivery_errors_total', 'Messages the broker never acknowledged', ('topic',))
+IN_FLIGHT = gauge('producer_in_flight_messages', 'Messages sent but not yet acknowledged', ('topic',))
+BACKPRESSURE = histogram('producer_backpressure_seconds', 'Time send() waited for in-flight room', ('topic',))
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class DeliveryTracker:
+    """Wraps one KafkaProducer and topic; not thread-safe on the caller side (one fetch loop)"""
+
+    def __init__(self, producer, topic, max_in_flight=KAFKA_MAX_IN_FLIGHT, send_timeout=KAFKA_SEND_TIMEOUT_SEC):
+        self.producer = producer
+        self.topic = topic
+        self.max_in_flight = max_in_flight
+        self.send_timeout = send_timeout
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.completed = collections.deque()
+        self.in_flight = 0
+        self._reset_cycle()
+
+    def _reset_cycle(self):
+        self.cycle_started = time.monotonic()
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.blocked = 0.0
+        self.latencies = []
+
+    def send(self, key, value, on_success=None, on_error=None):
+        """
+        Queue one record. Blocks while max_in_flight records are unacknowledged; raises
+        TimeoutError if no room frees up within send_timeout (the record is not sent).
+        """
+        self.poll()
+        if not self.slots.acquire(blocking=False):
+            start = time.perf_counter()
+            if not self.slots.acquire(timeout=self.send_timeout):
+                raise TimeoutError(f"{self.max_in_flight} messages still unacknowledged after {self.send_timeout:.0f}s")
+            waited = time.perf_counter() - start
+            self.blocked += waited
+            BACKPRESSURE.observe(waited, topic=self.topic)
+            self.poll()
+        try:
+            future = self.producer.send(self.topic, key=key, value=value)
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.in_flight += 1
+        self.sent += 1
+        IN_FLIGHT.set(self.in_flight, topic=self.topic)
+        start = time.perf_counter()
+        future.add_callback(self._on_ack, start, on_success, value)
+        future.add_errback(self._on_fail, start, on_error, value)
+        return future
+
+    def _complete(self, start, callback, args):
+        # Runs on the producer's I/O thread: free the slot now, defer the caller's callback to poll()
+        latency = time.perf_counter() - start
+        with self.lock:
+            self.in_flight -= 1
+            self.completed.append((latency, callback, args))
+        IN_FLIGHT.set(self.in_flight, topic=self.topic)
+        self.slots.release()
+        return latency
+
+    def _on_ack(self, start, on_success, value, metadata):
+        latency = self._complete(start, on_success, (value, metadata))
+        DELIVERED.inc(topic=self.topic)
+        DELIVERY_LATENCY.observe(latency, topic=self.topic)
+
+    def _on_fail(self, start, on_error, value, error):
+        self._complete(start, on_error, (value, error))
+        DELIVERY_ERRORS.inc(topic=self.topic)
+
+    def poll(self):
+        """Run the callbacks of every delivery completed so far; returns how many completed"""
+        handled = 0
+        while True:
+            with self.lock:
+                if not self.completed:
+                    return handled
+                latency, callback, args = self.completed.popleft()
+            handled += 1
+            if isinstance(args[1], Exception):
+                self.failed += 1
+            else:
+                self.delivered += 1
+                self.latencies.append(latency)
+            if callback is not None:
+                callback(*args)
+
+    def flush(self, timeout=KAFKA_FLUSH_TIMEOUT_SEC):
+        """Push out everything buffered, wait for the acknowledgements and run their callbacks"""
+        try:
+            self.producer.flush(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️  Kafka flush did not complete: {e} ({self.in_flight} messages still in flight)")
+        self.poll()
+
+    def cycle_stats(self):
+        """Delivery outcome since the previous call, then start a new cycle"""
+        self.poll()
+        stats = {
+            'seconds': time.monotonic() - self.cycle_started,
+            'sent': self.sent,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'blocked': self.blocked,
+            'p50': _percentile(self.latencies, 0.50),
+            'p95': _percentile(self.latencies, 0.95),
+            'max': max(self.latencies) if self.latencies else None,
+        }
+        self._reset_cycle()
+        return stats
+
+
+def format_stats(stats):
+    """One-line summary of DeliveryTracker.cycle_stats()"""
+    line = f"{stats['delivered']}/{stats['sent']} delivered"
+    if stats['failed']:
+        line += f", {stats['failed']} failed"
+    if stats['in_flight']:
+        line += f", {stats['in_flight']} in flight"
+    if stats['p50'] is not None:
+        line += f", ack p50 {stats['p50'] * 1000:.0f} ms / p95 {stats['p95'] * 1000:.0f} ms / max {stats['max'] * 1000:.0f} ms"
+    if stats['blocked'] >= 0.001:
+        line += f", backpressure {stats['blocked']:.1f}s"
+    return line
@@ -0,0 +1,135 @@
+"""
+Embedders: Interchangeable CPU backends for all-MiniLM-L6-v2 behind one encode() interface
+Shared by rag_ingest.py and the dashboard's AI Analyst page. EMBEDDING_BACKEND selects:
+    torch       - sentence-transformers on PyTorch (default)
+    torch-int8  - the same model with its transformer's Linear layers dynamically quantized to int8
+    onnx        - ONNX Runtime with the model's ONNX export from the Hugging Face hub (no torch import)
+    onnx-int8   - ONNX Runtime with the hub's int8-quantized export (EMBEDDING_ONNX_FILE overrides the file)
+All backends return L2-normalized mean-pooled 384-d vectors in the same space; int8 vectors
+differ slightly (bench_embeddings.py reports the cosine agreement with torch).
+LazyEmbedder defers the import and model load to the first encode() that misses the cache.
+"""
+import os
+import threading
+import time
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+# Hub file used by the onnx backends (default: onnx/model.onnx, or the AVX2 int8 export for onnx-int8)
+EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', '')
+# Intra-op threads for ONNX Runtime (0 = one per core)
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', '0'))
+
+BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+ONNX_FILES = {'onnx': 'onnx/model.onnx', 'onnx-int8': 'onnx/model_quint8_avx2.onnx'}
+# all-MiniLM-L6-v2's max_seq_length in sentence-transformers; longer input is truncated
+MAX_SEQ_LENGTH = 256
+DIMENSIONS = 384
+
+
+class TorchEmbedder:
+    """sentence-transformers on CPU, optionally with int8 dynamic quantization"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, quantize=False):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        if quantize:
+            import torch
+            # Quantize the Hugging Face model inside the Transformer module (the BertModel recipe);
+            # Pooling and Normalize have no weights, and the wrapper's encode() stays as it is
+            transformer = self.model[0]
+            transformer.auto_model = torch.quantization.quantize_dynamic(
+                transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        return self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime session over the model's hub export, with the pooling and normalization
+    steps of the sentence-transformers pipeline done in numpy
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, onnx_file=ONNX_FILES['onnx'], threads=EMBEDDING_THREADS):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        repo = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()  # pad to the longest text in each batch
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(repo, onnx_file), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # Exports may add outputs (e.g. pooler_output) or reorder them: pick the token embeddings by name
+        output_names = [o.name for o in self.session.get_outputs()]
+        self.output_name = 'last_hidden_state' if 'last_hidden_state' in output_names else output_names[0]
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        import numpy as np
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {'input_ids': ids, 'attention_mask': mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.zeros_like(ids)
+            hidden = self.session.run([self.output_name], feeds)[0]  # (batch, tokens, 384)
+            # Mean over real (non-padding) tokens, then L2-normalize: the model's Pooling + Normalize modules
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        return np.vstack(batches) if batches else np.zeros((0, DIMENSIONS), dtype=np.float32)
+
+
+def create_embedder(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    """Load `backend` now (imports its runtime and the model weights)"""
+    if backend == 'torch':
+        return TorchEmbedder(model_name)
+    if backend == 'torch-int8':
+        return TorchEmbedder(model_name, quantize=True)
+    if backend in ONNX_FILES:
+        return OnnxEmbedder(model_name, onnx_file=EMBEDDING_ONNX_FILE or ONNX_FILES[backend])
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+class LazyEmbedder:
+    """
+    Same encode() interface; the backend is created on first use. Thread-safe, so worker
+    threads sharing one instance load the model once.
+    """
+
+    def __init__(self, backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend} (expected one of {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.model_name = model_name
+        self.model = None
+        self.load_seconds = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    start = time.perf_counter()
+                    model = create_embedder(self.backend, self.model_name)
+                    self.load_seconds = time.perf_counter() - start
+                    print(f"🧠 Loaded {self.model_name} ({self.backend} backend) in {self.load_seconds:.1f}s")
+                    self.model = model
+        return self.model
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        return self.load().encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
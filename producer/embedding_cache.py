@@ -0,0 +1,120 @@
+"""
+Embedding Cache: Reuses sentence embeddings for text that has been embedded before
+Shared by rag_ingest.py and the dashboard's AI Analyst page.
+- Tier 1: in-memory LRU
+- Tier 2 (optional): SQLite file, survives restarts
+Keys are a hash of the model name and the normalized text.
+"""
+import array
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """all-MiniLM-L6-v2 is uncased, so case and extra whitespace do not change the vector"""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe two-tier cache of key -> list of floats, with hit/miss counters"""
+
+    def __init__(self, max_entries=10000, sqlite_path=None):
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if sqlite_path:
+            os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+            self.db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self.db is not None:
+                row = self.db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = array.array('f', row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put_many(self, items):
+        """Store (key, vector) pairs in both tiers"""
+        with self.lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self.db is not None:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array.array('f', vector).tobytes()) for key, vector in items]
+                )
+                self.db.commit()
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'lookups': lookups,
+            'memory_hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'entries': len(self.memory),
+        }
+
+
+class CachedEmbedder:
+    """Wraps an embedder (see embedders.py); only cache misses reach model.encode()"""
+
+    def __init__(self, model, model_name, cache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def encode(self, texts, batch_size=32):
+        """Embed a list of texts, returning one list of floats per text"""
+        keys = [cache_key(self.model_name, t) for t in texts]
+        vectors = [self.cache.get(k) for k in keys]
+        # Duplicates inside the batch are encoded once
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            positions = list(missing.values())
+            encoded = self.model.encode([texts[p[0]] for p in positions], batch_size=batch_size, show_progress_bar=False)
+            new_items = []
+            for key, indexes, vector in zip(missing.keys(), positions, encoded):
+                vector = vector.tolist()
+                for i in indexes:
+                    vectors[i] = vector
+                new_items.append((key, vector))
+            self.cache.put_many(new_items)
+        return vectors
+
+    def encode_one(self, text):
+        return self.encode([text])[0]
@@ -0,0 +1,112 @@
+"""
+Knowledge Store: Normalized, dedup-aware writes for the RAG vector store
+- knowledge_documents: one row per story, keyed by story_hash() (content_hash of the headline)
+- knowledge_chunks: the story split into embedding-sized chunks, each with its vector
+- knowledge_document_symbols: which tickers a story was published under
+A syndicated story tagged to several tickers is embedded and indexed once; later
+copies only add a symbol link.
+"""
+import os
+import re
+from datetime import datetime
+from psycopg2.extras import execute_values
+from dedup_store import content_hash, news_key, normalize_headline
+
+# Chunking: MiniLM truncates at 256 word pieces, so long summaries are split into
+# overlapping word windows; each chunk repeats the headline for context
+CHUNK_WORDS = int(os.getenv('RAG_CHUNK_WORDS', '120'))
+CHUNK_OVERLAP_WORDS = int(os.getenv('RAG_CHUNK_OVERLAP_WORDS', '20'))
+
+
+def chunk_text(headline, summary, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    """Return the chunk texts for one story (a single chunk unless the summary is long)"""
+    words = re.sub(r'\s+', ' ', str(summary or '')).strip().split(' ')
+    words = [w for w in words if w]
+    if len(words) <= chunk_words:
+        return [f"Headline: {headline}. Summary: {' '.join(words) or headline}"]
+    chunks = []
+    step = max(chunk_words - overlap, 1)
+    for start in range(0, len(words), step):
+        part = ' '.join(words[start:start + chunk_words])
+        chunks.append(f"Headline: {headline}. Summary ({len(chunks) + 1}): {part}")
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def story_hash(data):
+    """content_hash of the headline; headline-less items fall back to their summary or URL"""
+    if normalize_headline(data.get('headline')):
+        return content_hash(data['headline'])
+    return content_hash(data.get('summary') or data.get('url') or '')
+
+
+def store_batch(cursor, messages, embed):
+    """
+    Store a batch of news messages (dicts with symbol, headline, summary, ...).
+    `embed(texts)` returns one vector per text and is only called for chunks of new stories.
+    Runs inside the caller's transaction; returns counts for logging.
+    """
+    stories = {}
+    for data in messages:
+        stories.setdefault(story_hash(data), []).append(data)
+
+    # New stories (ON CONFLICT covers another ingest instance inserting the same hash)
+    known = {}
+    cursor.execute(
+        "SELECT content_hash, id FROM knowledge_documents WHERE content_hash = ANY(%s)", (list(stories),)
+    )
+    known.update(cursor.fetchall())
+    new_rows = []
+    for digest, copies in stories.items():
+        if digest in known:
+            continue
+        first = copies[0]
+        published = datetime.utcfromtimestamp(float(first['ts'])) if first.get('ts') else None
+        new_rows.append((digest, first['headline'], first.get('summary'), first.get('source'), first.get('url'), published))
+    inserted = []
+    if new_rows:
+        inserted = execute_values(cursor, """
+            INSERT INTO knowledge_documents (content_hash, headline, summary, source, url, published_at)
+            VALUES %s
+            ON CONFLICT (content_hash) DO NOTHING
+            RETURNING content_hash, id
+        """, new_rows, fetch=True)
+        known.update(inserted)
+        missing = [row[0] for row in new_rows if row[0] not in known]
+        if missing:
+            cursor.execute(
+                "SELECT content_hash, id FROM knowledge_documents WHERE content_hash = ANY(%s)", (missing,)
+            )
+            known.update(cursor.fetchall())
+
+    # Chunk and embed only the stories this batch created
+    chunk_rows = []
+    for digest, document_id in inserted:
+        first = stories[digest][0]
+        for index, text in enumerate(chunk_text(first['headline'], first.get('summary'))):
+            chunk_rows.append((document_id, index, text))
+    if chunk_rows:
+        vectors = embed([text for _, _, text in chunk_rows])
+        execute_values(cursor, """
+            INSERT INTO knowledge_chunks (document_id, chunk_index, content, embedding)
+            VALUES %s
+            ON CONFLICT (document_id, chunk_index) DO NOTHING
+        """, [row + (vector,) for row, vector in zip(chunk_rows, vectors)], template="(%s, %s, %s, %s::vector)")
+
+    # Every copy links its symbol to the story
+    links = {(known[digest], data['symbol']): news_key(data['symbol'], data['headline'])
+             for digest, copies in stories.items() for data in copies}
+    execute_values(cursor, """
+        INSERT INTO knowledge_document_symbols (document_id, symbol, news_key)
+        VALUES %s
+        ON CONFLICT (document_id, symbol) DO NOTHING
+    """, [(document_id, symbol, key) for (document_id, symbol), key in links.items()])
+
+    return {
+        'messages': len(messages),
+        'new_documents': len(inserted),
+        'duplicates': len(messages) - len(inserted),
+        'chunks': len(chunk_rows),
+        'links': len(links),
+    }
@@ -0,0 +1,241 @@
+"""
+Pipeline Metrics: In-process counters, gauges and histograms exposed in Prometheus text format
+Each service calls start_metrics_server() once; GET /metrics on METRICS_PORT returns every
+metric registered in this process. METRICS_PORT=0 disables the endpoint (metrics are still
+collected, so the periodic print() summaries keep working).
+Rates (messages/sec) come from counters via rate() in Prometheus or by diffing two scrapes.
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Seconds; covers a fast local DB flush up to a slow Finnhub call or a backed-up pipeline
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonic total (messages, rows, errors)"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(_label_key(self.labelnames, labels), 0)
+
+
+class Gauge(Metric):
+    """Point-in-time value (consumer lag, buffered rows)"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observations (latencies, batch sizes)"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, state in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['counts']):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {state['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    """Process-wide set of metrics, created once at module level by each service"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    return REGISTRY.counter(name, help_text, labelnames)
+
+
+def gauge(name, help_text, labelnames=()):
+    return REGISTRY.gauge(name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, help_text, labelnames, buckets)
+
+
+# Shared across services: seconds from a message's ingest_ts (set by the producer when it
+# fetched the data) to the point named by `stage`
+PIPELINE_LATENCY = histogram(
+    'pipeline_latency_seconds', 'Seconds from producer ingest_ts to the given stage', ('stage',)
+)
+
+
+def observe_pipeline_latency(stage, messages, now=None):
+    """Record now - ingest_ts for each message dict that carries one"""
+    now = time.time() if now is None else now
+    for data in messages:
+        ingest_ts = data.get('ingest_ts') if data else None
+        if ingest_ts:
+            PIPELINE_LATENCY.observe(max(0.0, now - float(ingest_ts)), stage=stage)
+
+
+def update_consumer_lag(consumer, lag_gauge):
+    """
+    Set lag_gauge{topic, partition} = high watermark - position for each assigned partition.
+    Uses the high watermark from the last fetch response, so no extra broker round trip.
+    Returns the total lag (None until the first fetch has completed).
+    """
+    total = None
+    for tp in consumer.assignment():
+        highwater = consumer.highwater(tp)
+        if highwater is None:
+            continue
+        lag = max(0, highwater - consumer.position(tp))
+        lag_gauge.set(lag, topic=tp.topic, partition=tp.partition)
+        total = (total or 0) + lag
+    return total
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics from a daemon thread; returns the server (None if disabled or the port is taken)"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠️  Metrics endpoint disabled, could not bind port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    print(f"📈 Metrics: http://0.0.0.0:{port}/metrics")
+    return server
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Knowledge Migration: Copies the old financial_knowledge table into the knowledge_* tables
+init.sql only runs on an empty data volume, so databases created before the normalized
+knowledge store still have financial_knowledge (one row per message, ivfflat index) and none
+of the new tables. This creates them (same definitions as init.sql), stores every old row
+through knowledge_store.store_batch (so stories are deduplicated and linked to each symbol
+exactly as rag_ingest does), reusing its vector instead of re-embedding, and keeps the old
+created_at so recency ranking is unchanged. The old table is dropped once every row is copied.
+Safe to re-run. Examples:
+    docker-compose run --rm producer python migrate_knowledge.py
+    docker-compose run --rm producer python migrate_knowledge.py --keep-old
+"""
+import argparse
+import os
+import re
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from knowledge_store import chunk_text, store_batch, story_hash
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
+POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
+
+# Knowledge store schema, as in init.sql
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS knowledge_documents (
+    id BIGSERIAL PRIMARY KEY,
+    content_hash CHAR(40) NOT NULL UNIQUE,
+    headline TEXT NOT NULL,
+    summary TEXT,
+    source TEXT,
+    url TEXT,
+    published_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS knowledge_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    document_id BIGINT NOT NULL REFERENCES knowledge_documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    embedding vector(384) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (document_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS knowledge_document_symbols (
+    document_id BIGINT NOT NULL REFERENCES knowledge_documents(id) ON DELETE CASCADE,
+    symbol VARCHAR(10) NOT NULL,
+    news_key CHAR(32) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (document_id, symbol)
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_document_symbols_symbol ON knowledge_document_symbols(symbol, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_document ON knowledge_chunks(document_id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_created_at ON knowledge_chunks(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_tsv ON knowledge_chunks USING gin (content_tsv);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_embedding ON knowledge_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+"""
+
+# The old rag_ingest.py content format: "<SYMBOL> Headline: <headline>. Summary: <summary>"
+LEGACY_CONTENT = re.compile(r'^\S+ Headline: (.*?)\. Summary: (.*)$', re.DOTALL)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Copy financial_knowledge into the knowledge_* tables")
+    parser.add_argument('--batch-size', type=int, default=500, help="Old rows per transaction (default: 500)")
+    parser.add_argument('--keep-old', action='store_true', help="Keep financial_knowledge after copying it")
+    return parser.parse_args()
+
+def parse_content(content):
+    """(headline, summary) of an old row; content that does not match the format is the headline"""
+    match = LEGACY_CONTENT.match(content)
+    if match is None:
+        return content, None
+    return match.group(1), match.group(2).strip() or None
+
+def copy_batch(cursor, rows):
+    """Store old (symbol, content, embedding, created_at) rows; returns store_batch's counts"""
+    messages = []
+    vectors = {}
+    for symbol, content, embedding, created_at in rows:
+        headline, summary = parse_content(content)
+        messages.append({'symbol': symbol, 'headline': headline, 'summary': summary, 'created_at': created_at})
+        # A story's chunks all reuse the vector of its first copy
+        for text in chunk_text(headline, summary):
+            vectors.setdefault(text, embedding)
+    result = store_batch(cursor, messages, lambda texts: [vectors[text] for text in texts])
+
+    # Backdate to the first time the story (and each symbol link) was seen
+    first_seen = {}
+    for data in messages:
+        for key in (story_hash(data), (story_hash(data), data['symbol'])):
+            first_seen[key] = min(first_seen.get(key, data['created_at']), data['created_at'])
+    execute_values(cursor, """
+        UPDATE knowledge_documents d SET created_at = LEAST(d.created_at, v.created_at)
+        FROM (VALUES %s) AS v (content_hash, created_at)
+        WHERE d.content_hash = v.content_hash
+    """, [(key, seen) for key, seen in first_seen.items() if isinstance(key, str)])
+    cursor.execute("""
+        UPDATE knowledge_chunks c SET created_at = LEAST(c.created_at, d.created_at)
+        FROM knowledge_documents d
+        WHERE c.document_id = d.id AND d.content_hash = ANY(%s)
+    """, ([key for key in first_seen if isinstance(key, str)],))
+    execute_values(cursor, """
+        UPDATE knowledge_document_symbols s SET created_at = LEAST(s.created_at, v.created_at)
+        FROM (VALUES %s) AS v (content_hash, symbol, created_at), knowledge_documents d
+        WHERE d.content_hash = v.content_hash AND s.document_id = d.id AND s.symbol = v.symbol
+    """, [key + (seen,) for key, seen in first_seen.items() if isinstance(key, tuple)])
+    return result
+
+def main():
+    args = parse_args()
+    conn = psycopg2.connect(
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        host=POSTGRES_HOST,
+        port=5432
+    )
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA)
+            cursor.execute("GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO market_user")
+            cursor.execute("GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA public TO market_user")
+            cursor.execute("SELECT to_regclass('financial_knowledge') IS NOT NULL")
+            legacy = cursor.fetchone()[0]
+        conn.commit()
+        print("✅ knowledge_documents, knowledge_chunks and knowledge_document_symbols are in place")
+        if not legacy:
+            print("📊 No financial_knowledge table: nothing to copy")
+            return
+
+        copied = new_documents = last_id = 0
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, symbol, content, embedding::text, COALESCE(created_at, CURRENT_TIMESTAMP)
+                    FROM financial_knowledge
+                    WHERE id > %s AND symbol IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, args.batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                result = copy_batch(cursor, [row[1:] for row in rows])
+            conn.commit()
+            last_id = rows[-1][0]
+            copied += len(rows)
+            new_documents += result['new_documents']
+            print(f"   ✅ {copied} rows: {result['new_documents']} new stories, {result['links']} symbol links")
+
+        if args.keep_old:
+            print("📦 Keeping financial_knowledge (--keep-old)")
+        else:
+            with conn.cursor() as cursor:
+                cursor.execute("DROP TABLE financial_knowledge")
+            conn.commit()
+            print("🗑️  Dropped financial_knowledge and its ivfflat index")
+        print(f"📊 Migration complete: {copied} rows, {new_documents} new stories "
+              f"in {time.perf_counter() - start:.1f}s")
+    except KeyboardInterrupt:
+        print("\n🛑 Migration interrupted (completed batches are committed; re-run to finish)")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -3,78 +3,108 @@
 News Producer: Fetches regular stock news (NOT crypto) from Finnhub API and publishes to Kafka
 Supports all US stock symbols available on Finnhub (AAPL, MSFT, TSLA, etc.)
 """
+import functools
 import os
 import time
-import json
 import requests
-from kafka import KafkaProducer
 from datetime import datetime, timedelta
 from pathlib import Path
+from dedup_store import DedupStore, content_hash, normalize_headline
+from delivery import DeliveryTracker, format_stats
+from metrics import counter, histogram, start_metrics_server
+from news_scheduler import NewsScheduler, cursor_key
+from rate_limiter import TokenBucket
+from serializers import KAFKA_MESSAGE_FORMAT, create_producer
+from ticker_registry import (PRODUCER_INSTANCE_COUNT, PRODUCER_INSTANCE_ID, instance_api_key, instance_budget,
+                             load_instance_symbols)
 
 # Configuration
-FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY')
+# This instance's key (its own FINNHUB_API_KEYS entry when PRODUCER_QUOTA_SCOPE=instance)
+FINNHUB_API_KEY = instance_api_key(os.getenv('FINNHUB_API_KEY'))
+FINNHUB_BASE_URL = os.getenv('FINNHUB_BASE_URL', 'https://finnhub.io/api/v1')
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
 TOPIC_NAME = 'stock_news'
-TICKERS_FILE = Path(__file__).parent / 'tickers.json'
 
-def load_tickers():
-    """
-    Load ticker symbols from seed file (tickers.json) or environment variable.
-    Priority: STOCK_SYMBOLS env var > tickers.json > default fallback
-    """
-    # Priority 1: Environment variable override
-    symbols_env = os.getenv('STOCK_SYMBOLS', '').strip()
-    if symbols_env:
-        return [s.strip().upper() for s in symbols_env.split(',') if s.strip()]
-    
-    # Priority 2: Load from tickers.json seed file
-    try:
-        if TICKERS_FILE.exists():
-            with open(TICKERS_FILE, 'r') as f:
-                ticker_data = json.load(f)
-                # Extract symbols from ticker objects
-                symbols = [ticker['symbol'] for ticker in ticker_data.get('tickers', [])]
-                if symbols:
-                    print(f"✅ Loaded {len(symbols)} tickers from {TICKERS_FILE.name}")
-                    return symbols
-    except Exception as e:
-        print(f"⚠️  Warning: Could not load tickers.json: {e}")
-        print(f"   Falling back to default ticker list")
-    
-    # Priority 3: Default fallback (if file doesn't exist or is invalid)
-    return [
-        'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA', 'NFLX', 'AMD', 'INTC',
-        'JPM', 'BAC', 'GS', 'V', 'MA', 'PYPL', 'COIN',
-        'DIS', 'NKE', 'KO', 'PEP', 'WMT', 'COST', 'SBUX', 'MCD',
-        'BA', 'XOM', 'CVX', 'LLY', 'PLTR'
-    ]
+# Scheduling: share of the Finnhub quota used for company-news calls, and
+# bounds on how often a single symbol is polled (hot symbols approach the minimum).
+# The budget is this instance's (divided between instances when PRODUCER_QUOTA_SCOPE=shared)
+NEWS_CALLS_PER_MINUTE = instance_budget(int(os.getenv('NEWS_CALLS_PER_MINUTE', '30')))
+NEWS_MIN_POLL_SECONDS = int(os.getenv('NEWS_MIN_POLL_SECONDS', '60'))
+NEWS_MAX_POLL_SECONDS = int(os.getenv('NEWS_MAX_POLL_SECONDS', '900'))
+NEWS_LOOKBACK_DAYS = int(os.getenv('NEWS_LOOKBACK_DAYS', '3'))
+# New headlines published per poll, oldest first; the rest are fetched again on the next poll
+# (on a first start without saved cursors, the newest ones are published and older lookback skipped)
+NEWS_MAX_PER_POLL = int(os.getenv('NEWS_MAX_PER_POLL', '5'))
 
-# Load ticker symbols
-SYMBOLS = load_tickers()
+# Dedup store: bounded set of published IDs/content hashes, snapshotted to disk
+# (one file per instance when the ticker list is split)
+NEWS_DEDUP_PATH = os.getenv('NEWS_DEDUP_PATH', str(
+    Path(__file__).parent / 'state' /
+    ('news_dedup.json' if PRODUCER_INSTANCE_COUNT == 1 else f'news_dedup-{PRODUCER_INSTANCE_ID}.json')
+))
+# Per-symbol cursors (last published headline), saved with the dedup snapshot so a restart resumes from them
+NEWS_CURSOR_PATH = os.getenv('NEWS_CURSOR_PATH', str(
+    Path(__file__).parent / 'state' /
+    ('news_cursors.json' if PRODUCER_INSTANCE_COUNT == 1 else f'news_cursors-{PRODUCER_INSTANCE_ID}.json')
+))
+NEWS_DEDUP_TTL_HOURS = int(os.getenv('NEWS_DEDUP_TTL_HOURS', '168'))
+NEWS_DEDUP_MAX_ENTRIES = int(os.getenv('NEWS_DEDUP_MAX_ENTRIES', '200000'))
+NEWS_DEDUP_SNAPSHOT_SECONDS = int(os.getenv('NEWS_DEDUP_SNAPSHOT_SECONDS', '60'))
 
-def get_finnhub_news(symbol, api_key):
+# Metrics (served on METRICS_PORT, see metrics.py)
+FINNHUB_LATENCY = histogram('finnhub_request_seconds', 'Finnhub REST call latency', ('endpoint', 'outcome'))
+MESSAGES_PUBLISHED = counter('producer_messages_total', 'Messages handed to the Kafka producer', ('topic',))
+PUBLISH_ERRORS = counter('producer_errors_total', 'Messages that could not be queued for Kafka', ('topic',))
+DUPLICATES_SKIPPED = counter('news_duplicates_total', 'Headlines skipped by the dedup store')
+# Seconds between Finnhub's publish time and our publish to Kafka (source + polling delay)
+SOURCE_DELAY = histogram('news_source_delay_seconds', 'Headline publish time to Kafka publish',
+                         buckets=(5, 15, 30, 60, 120, 300, 900, 1800, 3600, 4 * 3600, 24 * 3600))
+
+# Symbols owned by this producer instance (all of them unless PRODUCER_INSTANCE_COUNT > 1)
+SYMBOLS = load_instance_symbols()
+
+def get_finnhub_news(symbol, api_key, from_date=None, session=None):
     """Fetch news for a symbol from Finnhub API"""
-    url = f"https://finnhub.io/api/v1/company-news"
-    # Finnhub requires from/to dates.
-    # Use last 3 days to ensure we get *some* news for testing/dev,
-    # even if today is quiet or timezone differs.
-    today = datetime.now()
-    three_days_ago = today - timedelta(days=3)
+    url = f"{FINNHUB_BASE_URL}/company-news"
+    # Finnhub requires from/to dates (day granularity).
+    # The scheduler passes the last-seen headline date; without it, fall back to
+    # the last NEWS_LOOKBACK_DAYS so we get *some* news even if today is quiet.
+    today = datetime.utcnow()
+    if from_date is None:
+        from_date = (today - timedelta(days=NEWS_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
 
     params = {
         'symbol': symbol,
-        'from': three_days_ago.strftime('%Y-%m-%d'),
+        'from': from_date,
         'to': today.strftime('%Y-%m-%d'),
         'token': api_key
     }
     
+    start = time.perf_counter()
+    outcome = 'error'
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = (session or requests).get(url, params=params, timeout=10)
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        outcome = 'ok'
+        # Errors (e.g. quota exceeded) come back as a JSON object instead of a list
+        return data if isinstance(data, list) else []
     except Exception as e:
         print(f"Error fetching news for {symbol}: {e}")
         return []
+    finally:
+        FINNHUB_LATENCY.observe(time.perf_counter() - start, endpoint='company-news', outcome=outcome)
+
+def news_keys(symbol, news):
+    """
+    Dedup keys of one headline. Keys are per symbol: a story syndicated under several tickers is
+    published once for each, so rag_ingest links it to every symbol (it is only embedded once).
+    Headline-less items all normalize to the same hash, so they dedup on ID only.
+    """
+    id_key = f"id:{symbol}:{news.get('id', 0)}"
+    headline = news.get('headline', '')
+    return (id_key, f"hash:{symbol}:{content_hash(headline)}") if normalize_headline(headline) else (id_key,)
+
 
 def main():
     if not FINNHUB_API_KEY:
@@ -82,79 +112,146 @@ def main():
         return
     
     # Initialize Kafka producer
-    producer = KafkaProducer(
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-        retries=3
-    )
+    producer = create_producer(TOPIC_NAME)
+    tracker = DeliveryTracker(producer, TOPIC_NAME)
     
     num_symbols = len(SYMBOLS)
-    print(f"📰 News Producer started. Publishing to topic: {TOPIC_NAME}")
+    print(f"📰 News Producer started. Publishing to topic: {TOPIC_NAME} ({KAFKA_MESSAGE_FORMAT})")
     print(f"Monitoring {num_symbols} symbols: {', '.join(SYMBOLS)}")
     
-    # Rate limit warning: Finnhub Free Tier = 60 calls/minute
-    # Each symbol = 1 API call, so 30 symbols = 30 calls
-    # Recommendation: Run cycle every 60 seconds (30 calls/minute, safe buffer)
-    if num_symbols > 30:
-        print(f"⚠️  WARNING: {num_symbols} symbols will use {num_symbols} API calls per cycle.")
-        print(f"   Finnhub Free Tier limit: 60 calls/minute. Consider reducing symbols or increasing cycle time.")
-    
-    # Calculate safe cycle time: ensure we stay under 60 calls/minute
-    # If we have N symbols, we need at least N/60 minutes between cycles
-    # For safety, use 60 seconds (1 minute) minimum
-    cycle_time = max(60, int((num_symbols / 60) * 60) + 5)  # Add 5 second buffer
-    print(f"⏱️  Rate limit: Running cycle every {cycle_time} seconds ({num_symbols} calls per cycle)")
+    # Rate limit: Finnhub Free Tier = 60 calls/minute per API key (shared with the price producer).
+    # Calls are spread evenly over the quota window by the token bucket; symbols with
+    # recent news are polled more often, quiet ones back off to NEWS_MAX_POLL_SECONDS.
+    scheduler = NewsScheduler(
+        SYMBOLS,
+        NEWS_CALLS_PER_MINUTE,
+        min_interval=NEWS_MIN_POLL_SECONDS,
+        max_interval=NEWS_MAX_POLL_SECONDS,
+        lookback_days=NEWS_LOOKBACK_DAYS
+    )
+    limiter = TokenBucket(NEWS_CALLS_PER_MINUTE, burst=1)
+    session = requests.Session()
+    start_metrics_server()
+    print(f"⏱️  Rate limit: {NEWS_CALLS_PER_MINUTE} calls/minute, "
+          f"each symbol polled every {NEWS_MIN_POLL_SECONDS}-{int(max(scheduler.base_interval, NEWS_MAX_POLL_SECONDS))}s")
     
-    # Track published headlines to avoid duplicates
-    published_headlines = set()
+    # Track published headlines (by Finnhub ID and by content hash, per symbol) to avoid duplicates,
+    # including across restarts
+    published = DedupStore(
+        NEWS_DEDUP_PATH,
+        ttl_seconds=NEWS_DEDUP_TTL_HOURS * 3600,
+        max_entries=NEWS_DEDUP_MAX_ENTRIES
+    )
+    print(f"🗂️  Dedup store: {published.load()} entries loaded from {NEWS_DEDUP_PATH}")
+    print(f"🗂️  News cursors: {scheduler.load(NEWS_CURSOR_PATH)} symbols resume from {NEWS_CURSOR_PATH}")
+    # Keys of headlines sent but not yet acknowledged; they only enter the dedup store once
+    # the broker has them, so a failed delivery can be published again later
+    pending = set()
+
+    # Delivery outcome per headline of the current poll (True/False, None while in flight);
+    # the scheduler's cursor only moves past headlines that reached Kafka
+    def on_delivered(outcomes, index, keys, message, metadata):
+        outcomes[index] = True
+        pending.difference_update(keys)
+        published.add(*keys)
+        SOURCE_DELAY.observe(max(0.0, message['ingest_ts'] - message['ts']))
+        print(f"✅ Published: {message['symbol']} - {message['headline'][:50]}...")
+
+    def on_failed(outcomes, index, keys, message, error):
+        outcomes[index] = False
+        pending.difference_update(keys)
+        print(f"❌ Delivery failed for {message['symbol']}: {error} (re-fetched on the next poll)")
     
     try:
-        cycle_count = 0
+        api_calls_made = 0
+        report_at = time.monotonic() + 60
+        snapshot_at = time.monotonic() + NEWS_DEDUP_SNAPSHOT_SECONDS
         while True:
-            cycle_count += 1
-            print(f"\n🔄 Cycle #{cycle_count} - Fetching news for {num_symbols} symbols...")
-            api_calls_made = 0
+            symbol, wait = scheduler.next_symbol()
+            if wait > 0:
+                time.sleep(wait)
+            limiter.acquire()
+            
+            news_items = get_finnhub_news(symbol, FINNHUB_API_KEY, from_date=scheduler.from_date(symbol), session=session)
+            api_calls_made += 1
+            
+            # Only headlines past this symbol's cursor, oldest first; already published ones
+            # (same ID, or the same story under another ID) do not count against the cap
+            is_published = lambda news: any(key in published or key in pending for key in news_keys(symbol, news))
+            fresh_items = scheduler.record(symbol, news_items, limit=NEWS_MAX_PER_POLL, seen=is_published)
+            outcomes = [None] * len(fresh_items)
             
-            for symbol in SYMBOLS:
-                news_items = get_finnhub_news(symbol, FINNHUB_API_KEY)
-                api_calls_made += 1
+            for index, news in enumerate(fresh_items):
+                headline = news.get('headline', '')
+                summary = news.get('summary', '')
+                keys = news_keys(symbol, news)
                 
-                # Small delay to respect API rate limits (avoid bursting)
-                time.sleep(1.0)
+                # Skip if this symbol already published it (same ID, or the same story under another ID)
+                if any(key in published or key in pending for key in keys):
+                    DUPLICATES_SKIPPED.inc()
+                    outcomes[index] = True
+                    continue
                 
-                for news in news_items[:5]:  # Limit to 5 most recent per symbol
-                    headline = news.get('headline', '')
-                    summary = news.get('summary', '')
-                    news_id = news.get('id', 0)
-                    
-                    # Skip if already published
-                    if news_id in published_headlines:
-                        continue
-                    
-                    # Prepare message
-                    message = {
-                        'symbol': symbol,
-                        'headline': headline,
-                        'summary': summary or headline,
-                        'source': news.get('source', 'Unknown'),
-                        'url': news.get('url', ''),
-                        'ts': news.get('datetime', int(time.time()))
-                    }
-                    
-                    # Publish to Kafka
-                    try:
-                        producer.send(TOPIC_NAME, value=message)
-                        published_headlines.add(news_id)
-                        print(f"✅ Published: {symbol} - {headline[:50]}...")
-                    except Exception as e:
-                        print(f"❌ Error publishing to Kafka: {e}")
+                # Prepare message
+                message = {
+                    'symbol': symbol,
+                    'headline': headline,
+                    'summary': summary or headline,
+                    'source': news.get('source', 'Unknown'),
+                    'url': news.get('url', ''),
+                    'ts': float(news.get('datetime') or time.time()),
+                    # Publish time, so downstream stages can measure end-to-end latency
+                    'ingest_ts': time.time()
+                }
+                
+                # Publish to Kafka
+                try:
+                    tracker.send(symbol, message, on_success=functools.partial(on_delivered, outcomes, index, keys),
+                                 on_error=functools.partial(on_failed, outcomes, index, keys))
+                    pending.update(keys)
+                    MESSAGES_PUBLISHED.inc(topic=TOPIC_NAME)
+                except Exception as e:
+                    outcomes[index] = False
+                    PUBLISH_ERRORS.inc(topic=TOPIC_NAME)
+                    print(f"❌ Error publishing to Kafka: {e}")
+            
+            # One flush per poll: this symbol's headlines go out as one batch and are
+            # acknowledged (and deduped) before the next call
+            if pending:
+                tracker.flush()
+            # Failed or unconfirmed headlines keep the cursor behind them, so they are re-fetched;
+            # anything acknowledged after this point is in the dedup store and skipped next time
+            scheduler.commit(
+                symbol,
+                [cursor_key(news) for news, ok in zip(fresh_items, outcomes) if ok],
+                [cursor_key(news) for news, ok in zip(fresh_items, outcomes) if not ok]
+            )
+            
+            if time.monotonic() >= report_at:
+                hot = sorted(scheduler.velocity.items(), key=lambda kv: kv[1], reverse=True)[:5]
+                print(f"📊 Last minute: {api_calls_made} API calls, headlines {format_stats(tracker.cycle_stats())}. "
+                      f"Hottest: {', '.join(f'{s}={v:.1f}' for s, v in hot if v > 0) or 'none'}")
+                api_calls_made = 0
+                report_at = time.monotonic() + 60
             
-            print(f"📊 Cycle complete: Made {api_calls_made} API calls. Waiting {cycle_time} seconds before next cycle...")
-            time.sleep(cycle_time)
+            if time.monotonic() >= snapshot_at:
+                try:
+                    published.save()
+                    scheduler.save(NEWS_CURSOR_PATH)
+                except Exception as e:
+                    print(f"⚠️  Warning: Could not save dedup snapshot: {e}")
+                snapshot_at = time.monotonic() + NEWS_DEDUP_SNAPSHOT_SECONDS
             
     except KeyboardInterrupt:
         print("\n🛑 Shutting down news producer...")
     finally:
+        tracker.flush()
+        try:
+            published.save()
+            scheduler.save(NEWS_CURSOR_PATH)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not save dedup snapshot: {e}")
+        session.close()
         producer.close()
 
 if __name__ == '__main__':
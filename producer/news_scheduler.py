@@ -0,0 +1,145 @@
+"""
+News Scheduler: Decides which symbol to poll next for company news
+- Spreads the symbol set across the per-minute API quota
+- Polls symbols with recent news more often (news velocity)
+- Tracks the last-seen headline (timestamp, ID) per symbol for incremental fetches; the cursor
+  only moves past headlines the caller reports as published, and is saved across restarts
+"""
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+
+class NewsScheduler:
+    """
+    Priority queue of symbols keyed by next due time.
+
+    A symbol's poll interval starts at the time needed to cycle through every
+    symbol at `calls_per_minute`, and shrinks as its news velocity (exponentially
+    weighted new headlines per poll) grows, clamped to [min_interval, max_interval].
+    """
+
+    def __init__(self, symbols, calls_per_minute, min_interval=60, max_interval=900,
+                 lookback_days=3, velocity_decay=0.3):
+        self.calls_per_minute = calls_per_minute
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lookback_days = lookback_days
+        self.velocity_decay = velocity_decay
+        self.last_seen = {}
+        self.holdback = {}
+        self.velocity = {symbol: 0.0 for symbol in symbols}
+        now = time.monotonic()
+        # All symbols are due immediately; the rate limiter paces the first pass
+        self.queue = [(now, i, symbol) for i, symbol in enumerate(symbols)]
+        heapq.heapify(self.queue)
+        self.sequence = len(self.queue)
+
+    @property
+    def base_interval(self):
+        """Seconds needed to poll every symbol once at the configured quota"""
+        return max(self.min_interval, len(self.velocity) * 60.0 / self.calls_per_minute)
+
+    def interval_for(self, symbol):
+        interval = self.base_interval / (1.0 + self.velocity[symbol])
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_symbol(self):
+        """Return (symbol, seconds_until_due) for the symbol that should be polled next"""
+        due_at, _, symbol = heapq.heappop(self.queue)
+        return symbol, max(0.0, due_at - time.monotonic())
+
+    def from_date(self, symbol):
+        """Start date for the next fetch: last-seen headline date, or the initial lookback"""
+        if symbol in self.last_seen:
+            start = datetime.utcfromtimestamp(self.last_seen[symbol][0])
+        else:
+            start = datetime.utcnow() - timedelta(days=self.lookback_days)
+        return start.strftime('%Y-%m-%d')
+
+    def record(self, symbol, news_items, limit=None, seen=None):
+        """
+        Register a poll result and reschedule the symbol.
+        Returns the items past the symbol's cursor, oldest first, with at most `limit` of them
+        not yet `seen` (already published items are returned too, so the cursor can pass them,
+        but do not count against the limit). Without a cursor (first start) the newest `limit`
+        are returned and the older lookback is skipped, so polling starts at current news.
+        The cursor does not move here; call commit() once the items are published.
+        """
+        cursor = self.last_seen.get(symbol)
+        fresh = sorted((n for n in news_items if cursor is None or cursor_key(n) > cursor), key=cursor_key)
+        new_count = sum(1 for n in fresh if seen is None or not seen(n))
+        self.holdback[symbol] = None
+        backlog = False
+        if limit is not None and new_count > limit:
+            # Walk from the newest end without a cursor, from the oldest with one
+            order = range(len(fresh) - 1, -1, -1) if cursor is None else range(len(fresh))
+            taken = 0
+            for index in order:
+                if seen is None or not seen(fresh[index]):
+                    if taken == limit:
+                        break
+                    taken += 1
+            if cursor is None:
+                fresh = fresh[index + 1:]
+            else:
+                # Items past the cap are fetched again next poll: the cursor stops before the first of them
+                self.holdback[symbol] = cursor_key(fresh[index])
+                fresh = fresh[:index]
+                backlog = True
+
+        # The first poll returns the whole lookback window, so it does not count as velocity
+        if cursor is not None:
+            decay = self.velocity_decay
+            self.velocity[symbol] = decay * new_count + (1 - decay) * self.velocity[symbol]
+
+        # A symbol with more news than one poll takes is polled again as soon as allowed
+        interval = self.min_interval if backlog else self.interval_for(symbol)
+        heapq.heappush(self.queue, (time.monotonic() + interval, self.sequence, symbol))
+        self.sequence += 1
+        return fresh
+
+    def commit(self, symbol, done, retry=()):
+        """
+        Advance the symbol's cursor past the cursor_key()s in `done` (published or duplicate),
+        but not past the oldest key in `retry` (failed or unconfirmed) or the first item held
+        back by the limit, so those are fetched again on the next poll.
+        """
+        blocked = [key for key in list(retry) + [self.holdback.pop(symbol, None)] if key is not None]
+        stop = min(blocked) if blocked else None
+        done = [key for key in done if stop is None or key < stop]
+        if done:
+            cursor = self.last_seen.get(symbol)
+            self.last_seen[symbol] = max(done) if cursor is None else max(cursor, max(done))
+
+    def load(self, path):
+        """Restore the cursors written by save(); returns how many symbols have one"""
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r') as f:
+                cursors = json.load(f).get('cursors', {})
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load news cursors {path}: {e}")
+            return 0
+        for symbol, (ts, news_id) in cursors.items():
+            if symbol in self.velocity:
+                self.last_seen[symbol] = (ts, news_id)
+        return len(self.last_seen)
+
+    def save(self, path):
+        """Atomically write the cursors to disk (temp file + rename), so a restart resumes from them"""
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved_at': time.time(), 'cursors': self.last_seen}, f)
+        os.replace(tmp_path, path)
+
+
+def cursor_key(news):
+    """Position of a headline in a symbol's feed: (datetime, Finnhub ID), so same-second items are ordered"""
+    return (news.get('datetime') or 0, news.get('id') or 0)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Partition Maintenance: Creates upcoming price_log/sentiment_log partitions and retires old ones
+Expired partitions (and expired rows of the DEFAULT partitions) are optionally exported to
+Parquet before being dropped.
+    python partition_maintenance.py            # run once
+    python partition_maintenance.py --loop     # run every PARTITION_MAINTENANCE_INTERVAL_SEC
+"""
+import argparse
+import os
+import time
+import psycopg2
+from datetime import datetime, timedelta
+from pathlib import Path
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
+POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
+
+# Export expired partitions here as Parquet before dropping them (empty = drop without export)
+ARCHIVE_DIR = os.getenv('PARTITION_ARCHIVE_DIR', '')
+INTERVAL_SEC = int(os.getenv('PARTITION_MAINTENANCE_INTERVAL_SEC', '3600'))
+
+# parent table -> partition settings
+PARTITIONED_TABLES = {
+    'price_log': {
+        'step': '1 day',
+        'ahead': int(os.getenv('PRICE_LOG_PARTITIONS_AHEAD', '7')),
+        'retention_days': int(os.getenv('PRICE_LOG_RETENTION_DAYS', '30')),
+    },
+    'sentiment_log': {
+        'step': '7 days',
+        'ahead': int(os.getenv('SENTIMENT_LOG_PARTITIONS_AHEAD', '2')),
+        'retention_days': int(os.getenv('SENTIMENT_LOG_RETENTION_DAYS', '90')),
+    },
+}
+
+def list_partitions(cursor, parent):
+    """Return ([(partition_name, upper_bound)] for the range partitions, default partition name or None)"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (parent,))
+    partitions = []
+    default = None
+    for name, bound in cursor.fetchall():
+        # e.g. FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2025-01-02 00:00:00'), or DEFAULT
+        if 'TO (' not in bound:
+            default = name
+            continue
+        upper = bound.split("TO ('", 1)[1].split("'", 1)[0]
+        partitions.append((name, datetime.fromisoformat(upper)))
+    return partitions, default
+
+def partition_key(cursor, parent):
+    """Name of the (single) column `parent` is range-partitioned on"""
+    cursor.execute("""
+        SELECT a.attname
+        FROM pg_partitioned_table p
+        JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+        WHERE p.partrelid = %s::regclass
+    """, (parent,))
+    return cursor.fetchone()[0]
+
+def write_parquet(name, columns, rows):
+    """Write rows to <ARCHIVE_DIR>/<name>.parquet (pyarrow ships with streamlit/pandas installs)"""
+    import pandas as pd
+    Path(ARCHIVE_DIR).mkdir(parents=True, exist_ok=True)
+    target = Path(ARCHIVE_DIR) / f"{name}.parquet"
+    pd.DataFrame(rows, columns=columns).to_parquet(target, index=False)
+    return target
+
+def archive_partition(conn, name):
+    """Export one partition to <ARCHIVE_DIR>/<name>.parquet"""
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT * FROM "{name}"')
+        columns = [c[0] for c in cursor.description]
+        rows = cursor.fetchall()
+    return write_parquet(name, columns, rows), len(rows)
+
+def expire_default_rows(conn, parent, default, cutoff):
+    """Delete (and archive) rows older than cutoff from the DEFAULT partition; returns the row count"""
+    with conn.cursor() as cursor:
+        key = partition_key(cursor, parent)
+        cursor.execute(f'DELETE FROM "{default}" WHERE "{key}" < %s RETURNING *', (cutoff,))
+        rows = cursor.fetchall()
+        columns = [c[0] for c in cursor.description]
+    if rows and ARCHIVE_DIR:
+        # Written before the commit: if the export fails, the delete is rolled back
+        target = write_parquet(f"{default}_before_{cutoff:%Y%m%d%H%M}", columns, rows)
+        print(f"📦 {parent}: archived {len(rows)} expired rows of {default} to {target}")
+    conn.commit()
+    return len(rows)
+
+def maintain_table(conn, parent, settings):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT ensure_partitions(%s, %s::interval, %s)", (parent, settings['step'], settings['ahead']))
+        created = cursor.fetchone()[0]
+    conn.commit()
+    for notice in conn.notices:
+        print(f"🔀 {parent}: {notice.strip().removeprefix('NOTICE:').strip()}")
+    del conn.notices[:]
+    if created:
+        print(f"✅ {parent}: created {created} partition(s)")
+
+    with conn.cursor() as cursor:
+        partitions, default = list_partitions(cursor, parent)
+    conn.commit()
+    cutoff = datetime.utcnow() - timedelta(days=settings['retention_days'])
+    for name, upper in partitions:
+        if upper > cutoff:
+            continue
+        try:
+            if ARCHIVE_DIR:
+                target, rows = archive_partition(conn, name)
+                print(f"📦 {parent}: archived {name} ({rows} rows) to {target}")
+            with conn.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{parent}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+            conn.commit()
+            print(f"🗑️  {parent}: dropped {name} (older than {settings['retention_days']} days)")
+        except Exception as e:
+            conn.rollback()
+            # Keep the partition if the export failed, so no data is lost
+            print(f"❌ {parent}: could not retire {name}: {e}")
+
+    # Rows that fell into the default partition (out-of-range or written while no partition
+    # existed, e.g. lookback headlines) follow the same retention
+    if default:
+        try:
+            expired = expire_default_rows(conn, parent, default, cutoff)
+            if expired:
+                print(f"🗑️  {parent}: deleted {expired} rows older than {settings['retention_days']} days from {default}")
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ {parent}: could not expire rows in {default}: {e}")
+
+def maintain(conn):
+    # Each table on its own, so a failure on one does not stop the others
+    for parent, settings in PARTITIONED_TABLES.items():
+        try:
+            maintain_table(conn, parent, settings)
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ {parent}: partition maintenance failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and retire time partitions")
+    parser.add_argument('--loop', action='store_true', help="Keep running every PARTITION_MAINTENANCE_INTERVAL_SEC")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        host=POSTGRES_HOST,
+        port=5432
+    )
+    print(f"🗓️  Partition maintenance started (archive: {ARCHIVE_DIR or 'disabled'})")
+    try:
+        while True:
+            try:
+                maintain(conn)
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Partition maintenance failed: {e}")
+            if not args.loop:
+                break
+            time.sleep(INTERVAL_SEC)
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down partition maintenance...")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
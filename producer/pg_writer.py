@@ -0,0 +1,84 @@
+"""
+Batch Writer: Buffers rows in memory and flushes them to PostgreSQL in one statement
+Flushes when either the row count or the buffer age threshold is reached.
+"""
+import time
+from psycopg2.extras import execute_values
+
+
+class BatchWriter:
+    """
+    Collects rows for a single INSERT statement and writes them with execute_values.
+
+    `before_commit` (optional) is called as before_commit(cursor, rows) inside the
+    insert's transaction, e.g. to refresh derived tables atomically with the rows.
+    `on_flush` (optional) is called after each successful commit, e.g. to commit
+    Kafka offsets so that messages are only acknowledged once they are durable.
+    """
+
+    def __init__(self, conn, insert_sql, template=None, max_rows=5000, max_latency_ms=200,
+                 on_flush=None, before_commit=None):
+        self.conn = conn
+        self.insert_sql = insert_sql
+        self.template = template
+        self.max_rows = max_rows
+        self.max_latency = max_latency_ms / 1000.0
+        self.on_flush = on_flush
+        self.before_commit = before_commit
+        self.buffer = []
+        self.first_row_at = None
+        # Running totals for throughput reporting
+        self.rows_written = 0
+        self.flush_count = 0
+        self.flush_seconds = 0.0
+
+    def add(self, row):
+        """Buffer a row. The caller decides when to flush (see should_flush)."""
+        if not self.buffer:
+            self.first_row_at = time.monotonic()
+        self.buffer.append(row)
+
+    def discard(self):
+        """Drop the buffered rows without writing them (e.g. their partitions were reassigned)"""
+        self.buffer = []
+        self.first_row_at = None
+
+    def free_slots(self):
+        return max(0, self.max_rows - len(self.buffer))
+
+    def should_flush(self):
+        if not self.buffer:
+            return False
+        if len(self.buffer) >= self.max_rows:
+            return True
+        return time.monotonic() - self.first_row_at >= self.max_latency
+
+    def time_until_flush(self):
+        """Seconds until the current buffer hits its latency deadline (None if empty)"""
+        if not self.buffer:
+            return None
+        return max(0.0, self.max_latency - (time.monotonic() - self.first_row_at))
+
+    def flush(self):
+        """Write the buffered rows in one transaction. Raises on failure, keeping the buffer."""
+        if not self.buffer:
+            return 0
+        start = time.perf_counter()
+        try:
+            with self.conn.cursor() as cursor:
+                execute_values(cursor, self.insert_sql, self.buffer, template=self.template, page_size=len(self.buffer))
+                if self.before_commit:
+                    self.before_commit(cursor, self.buffer)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        written = len(self.buffer)
+        self.buffer = []
+        self.first_row_at = None
+        self.rows_written += written
+        self.flush_count += 1
+        self.flush_seconds += time.perf_counter() - start
+        if self.on_flush:
+            self.on_flush()
+        return written
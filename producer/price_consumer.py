@@ -1,21 +1,61 @@
 #!/usr/bin/env python3
 """
 Price Consumer: Consumes stock prices from Kafka and writes to PostgreSQL
+Rows are buffered and flushed in batches; Kafka offsets are committed only after
+a successful flush (at-least-once delivery without per-row commits).
+Scale out with more instances or PRICE_CONSUMER_WORKERS; each worker is a member of the
+PRICE_CONSUMER_GROUP_ID consumer group and flushes its buffer before a rebalance.
 """
 import os
-import json
+import time
 import psycopg2
-from kafka import KafkaConsumer
+from datetime import datetime
+from consumer_group import FlushOnRevoke, create_consumer, run_workers
+from metrics import (SIZE_BUCKETS, counter, gauge, histogram, observe_pipeline_latency,
+                     start_metrics_server, update_consumer_lag)
+from pg_writer import BatchWriter
+from price_rollup import rollup_rows
 
 # Configuration
-KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
 TOPIC_NAME = 'stock_prices'
+# Instances (and worker threads) sharing a group id split the topic's partitions between them
+PRICE_CONSUMER_GROUP_ID = os.getenv('PRICE_CONSUMER_GROUP_ID', 'price-consumer')
+PRICE_CONSUMER_WORKERS = int(os.getenv('PRICE_CONSUMER_WORKERS', '1'))
 POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
 POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
 POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
 POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
 
-def main():
+# Batching: flush after FLUSH_MAX_ROWS rows or FLUSH_INTERVAL_MS, whichever comes first
+FLUSH_MAX_ROWS = int(os.getenv('PRICE_FLUSH_MAX_ROWS', '5000'))
+FLUSH_INTERVAL_MS = int(os.getenv('PRICE_FLUSH_INTERVAL_MS', '200'))
+STATS_INTERVAL_SEC = int(os.getenv('PRICE_STATS_INTERVAL_SEC', '30'))
+# Refresh 1m/5m/1h OHLCV bars in the same transaction as each batch
+PRICE_ROLLUPS_ENABLED = os.getenv('PRICE_ROLLUPS_ENABLED', 'true').lower() == 'true'
+
+# Metrics (served on METRICS_PORT, see metrics.py)
+MESSAGES_CONSUMED = counter('consumer_messages_total', 'Kafka records consumed', ('topic',))
+INVALID_MESSAGES = counter('consumer_invalid_messages_total', 'Records dropped as invalid', ('topic',))
+CONSUMER_LAG = gauge('consumer_lag_messages', 'High watermark minus consumer position', ('topic', 'partition'))
+FLUSH_LATENCY = histogram('db_flush_seconds', 'Time to write and commit one batch', ('table',))
+FLUSH_ROWS = histogram('db_flush_rows', 'Rows per committed batch', ('table',), buckets=SIZE_BUCKETS)
+FLUSH_ERRORS = counter('db_flush_errors_total', 'Failed batch writes (retried)', ('table',))
+
+INSERT_SQL = "INSERT INTO price_log (symbol, price, timestamp, volume) VALUES %s"
+
+def to_row(message):
+    """Convert a Kafka record into a price_log row (None if the payload is invalid)"""
+    data = message.value
+    symbol = data.get('symbol')
+    price = data.get('price')
+    if not (symbol and price):
+        return None
+    # Kafka record timestamp (ms) = publish time, so batching does not skew the series
+    return (symbol, price, datetime.utcfromtimestamp(message.timestamp / 1000.0), data.get('volume'))
+
+def consume(worker_id, stop):
+    """One consumer-group member: its own Kafka consumer, PostgreSQL connection and batch writer"""
+    name = f"price-consumer[{worker_id}]"
     # Connect to PostgreSQL
     try:
         conn = psycopg2.connect(
@@ -25,49 +65,106 @@ def main():
             host=POSTGRES_HOST,
             port=5432
         )
-        cursor = conn.cursor()
-        print(f"✅ Connected to PostgreSQL database: {POSTGRES_DB}")
+        print(f"✅ {name}: connected to PostgreSQL database: {POSTGRES_DB}")
     except Exception as e:
-        print(f"❌ Error connecting to PostgreSQL: {e}")
+        print(f"❌ {name}: error connecting to PostgreSQL: {e}")
         return
-    
-    # Initialize Kafka consumer
-    consumer = KafkaConsumer(
-        TOPIC_NAME,
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-        auto_offset_reset='latest',
-        enable_auto_commit=True
+
+    # Payloads of the buffered rows (for their ingest_ts), dropped with each flush
+    pending_values = []
+
+    def flush():
+        """Flush the writer, recording batch size, flush latency and end-to-end latency"""
+        start = time.perf_counter()
+        written = writer.flush()
+        if written:
+            FLUSH_LATENCY.observe(time.perf_counter() - start, table='price_log')
+            FLUSH_ROWS.observe(written, table='price_log')
+            observe_pipeline_latency('price_log', pending_values)
+            pending_values.clear()
+        return written
+
+    def discard():
+        writer.discard()
+        pending_values.clear()
+
+    # Offsets are committed manually after each flush, and before partitions are revoked
+    consumer = create_consumer(
+        TOPIC_NAME, PRICE_CONSUMER_GROUP_ID, worker_id,
+        listener=FlushOnRevoke(name, flush, discard),
+        auto_offset_reset='latest'
     )
-    
-    print(f"💰 Price Consumer started. Listening to topic: {TOPIC_NAME}")
-    
+
+    writer = BatchWriter(
+        conn,
+        INSERT_SQL,
+        max_rows=FLUSH_MAX_ROWS,
+        max_latency_ms=FLUSH_INTERVAL_MS,
+        on_flush=consumer.commit,
+        before_commit=rollup_rows if PRICE_ROLLUPS_ENABLED else None
+    )
+
     try:
-        for message in consumer:
-            data = message.value
-            symbol = data.get('symbol')
-            price = data.get('price')
-            
-            if symbol and price:
+        last_report = time.monotonic()
+        last_rows = 0
+        while not stop.is_set():
+            # Only poll as many records as fit in the buffer, so every consumed
+            # offset is covered by the next flush
+            if writer.free_slots() > 0:
+                wait = writer.time_until_flush()
+                timeout_ms = FLUSH_INTERVAL_MS if wait is None else int(wait * 1000)
+                records = consumer.poll(timeout_ms=max(timeout_ms, 1), max_records=writer.free_slots())
+                for messages in records.values():
+                    MESSAGES_CONSUMED.inc(len(messages), topic=TOPIC_NAME)
+                    for message in messages:
+                        row = to_row(message)
+                        if row:
+                            writer.add(row)
+                            pending_values.append(message.value)
+                        else:
+                            INVALID_MESSAGES.inc(topic=TOPIC_NAME)
+                            print(f"⚠️ Invalid message format: {message.value}")
+
+            if writer.should_flush():
                 try:
-                    cursor.execute(
-                        "INSERT INTO price_log (symbol, price, timestamp) VALUES (%s, %s, NOW())",
-                        (symbol, price)
-                    )
-                    conn.commit()
-                    print(f"✅ Stored: {symbol} @ ${price:.2f}")
+                    written = flush()
+                    update_consumer_lag(consumer, CONSUMER_LAG)
+                    print(f"✅ {name}: stored batch of {written} prices")
                 except Exception as e:
-                    print(f"❌ Error inserting price: {e}")
-                    conn.rollback()
-            else:
-                print(f"⚠️ Invalid message format: {data}")
-                
+                    # Offsets stay uncommitted; the buffer is retried on the next pass
+                    FLUSH_ERRORS.inc(table='price_log')
+                    print(f"❌ {name}: error flushing price batch ({len(writer.buffer)} rows): {e}")
+                    time.sleep(1)
+
+            now = time.monotonic()
+            if now - last_report >= STATS_INTERVAL_SEC:
+                rows = writer.rows_written - last_rows
+                avg_flush_ms = (writer.flush_seconds / writer.flush_count * 1000) if writer.flush_count else 0
+                lag = update_consumer_lag(consumer, CONSUMER_LAG)
+                print(f"📊 {name}: {rows / (now - last_report):.1f} rows/sec "
+                      f"({writer.rows_written} total, {writer.flush_count} flushes, avg flush {avg_flush_ms:.1f} ms, "
+                      f"lag {'n/a' if lag is None else lag})")
+                last_report = now
+                last_rows = writer.rows_written
+
     except KeyboardInterrupt:
-        print("\n🛑 Shutting down price consumer...")
+        pass
     finally:
-        cursor.close()
-        conn.close()
+        print(f"\n🛑 Shutting down {name}...")
+        try:
+            flush()
+        except Exception as e:
+            print(f"❌ {name}: error flushing final batch: {e}")
+        # Leaves the group, so the remaining members take over its partitions right away
         consumer.close()
+        conn.close()
+
+def main():
+    print(f"💰 Price Consumer started. Listening to topic: {TOPIC_NAME} "
+          f"(group {PRICE_CONSUMER_GROUP_ID}, {PRICE_CONSUMER_WORKERS} worker(s))")
+    print(f"📦 Batching: flush every {FLUSH_MAX_ROWS} rows or {FLUSH_INTERVAL_MS} ms")
+    start_metrics_server()
+    run_workers(consume, PRICE_CONSUMER_WORKERS)
 
 if __name__ == '__main__':
     main()
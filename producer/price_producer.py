@@ -2,68 +2,70 @@
 """
 Price Producer: Fetches regular stock prices (NOT crypto) from Finnhub API and publishes to Kafka
 Supports all US stock symbols available on Finnhub (AAPL, MSFT, TSLA, etc.)
+PRICE_INGEST_MODE=rest polls /quote per symbol each cycle; PRICE_INGEST_MODE=websocket keeps one
+trade subscription open and publishes per-symbol micro-batches (see price_stream.py), falling
+back to REST polling if the stream cannot be established.
 """
 import os
 import time
-import json
 import requests
-from kafka import KafkaProducer
-from datetime import datetime
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from delivery import DeliveryTracker, format_stats
+from metrics import SIZE_BUCKETS, counter, histogram, start_metrics_server
+from rate_limiter import TokenBucket
+from serializers import KAFKA_MESSAGE_FORMAT, create_producer
+from ticker_registry import instance_api_key, instance_budget, load_instance_symbols
 
 # Configuration
-FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY')
+# This instance's key (its own FINNHUB_API_KEYS entry when PRODUCER_QUOTA_SCOPE=instance)
+FINNHUB_API_KEY = instance_api_key(os.getenv('FINNHUB_API_KEY'))
+FINNHUB_BASE_URL = os.getenv('FINNHUB_BASE_URL', 'https://finnhub.io/api/v1')
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
 TOPIC_NAME = 'stock_prices'
-TICKERS_FILE = Path(__file__).parent / 'tickers.json'
 
-def load_tickers():
-    """
-    Load ticker symbols from seed file (tickers.json) or environment variable.
-    Priority: STOCK_SYMBOLS env var > tickers.json > default fallback
-    """
-    # Priority 1: Environment variable override
-    symbols_env = os.getenv('STOCK_SYMBOLS', '').strip()
-    if symbols_env:
-        return [s.strip().upper() for s in symbols_env.split(',') if s.strip()]
-    
-    # Priority 2: Load from tickers.json seed file
-    try:
-        if TICKERS_FILE.exists():
-            with open(TICKERS_FILE, 'r') as f:
-                ticker_data = json.load(f)
-                # Extract symbols from ticker objects
-                symbols = [ticker['symbol'] for ticker in ticker_data.get('tickers', [])]
-                if symbols:
-                    print(f"✅ Loaded {len(symbols)} tickers from {TICKERS_FILE.name}")
-                    return symbols
-    except Exception as e:
-        print(f"⚠️  Warning: Could not load tickers.json: {e}")
-        print(f"   Falling back to default ticker list")
-    
-    # Priority 3: Default fallback (if file doesn't exist or is invalid)
-    return [
-        'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA', 'NFLX', 'AMD', 'INTC',
-        'JPM', 'BAC', 'GS', 'V', 'MA', 'PYPL', 'COIN',
-        'DIS', 'NKE', 'KO', 'PEP', 'WMT', 'COST', 'SBUX', 'MCD',
-        'BA', 'XOM', 'CVX', 'LLY', 'PLTR'
-    ]
-
-# Load ticker symbols
-SYMBOLS = load_tickers()
-
-def get_finnhub_quote(symbol, api_key):
+# Fetch engine: concurrent workers share one keep-alive session and one token bucket.
+# The budget is this instance's (divided between instances when PRODUCER_QUOTA_SCOPE=shared)
+FINNHUB_CALLS_PER_MINUTE = instance_budget(int(os.getenv('FINNHUB_CALLS_PER_MINUTE', '60')))
+FETCH_WORKERS = int(os.getenv('PRICE_FETCH_WORKERS', '8'))
+CYCLE_SECONDS = int(os.getenv('PRICE_CYCLE_SECONDS', '60'))
+# 'rest' polls /quote once per symbol per cycle; 'websocket' streams trades (see price_stream.py)
+PRICE_INGEST_MODE = os.getenv('PRICE_INGEST_MODE', 'rest').lower()
+STATS_INTERVAL_SEC = int(os.getenv('PRICE_STATS_INTERVAL_SEC', '30'))
+
+# Metrics (served on METRICS_PORT, see metrics.py)
+FINNHUB_LATENCY = histogram('finnhub_request_seconds', 'Finnhub REST call latency', ('endpoint', 'outcome'))
+MESSAGES_PUBLISHED = counter('producer_messages_total', 'Messages handed to the Kafka producer', ('topic',))
+PUBLISH_ERRORS = counter('producer_errors_total', 'Messages that could not be queued for Kafka', ('topic',))
+CYCLE_DURATION = histogram('price_cycle_seconds', 'Wall time of one fetch-and-publish cycle')
+STREAM_BATCH = histogram('price_stream_batch_quotes', 'Quotes per coalesced WebSocket micro-batch', buckets=SIZE_BUCKETS)
+
+# Symbols owned by this producer instance (all of them unless PRODUCER_INSTANCE_COUNT > 1)
+SYMBOLS = load_instance_symbols()
+
+def create_session(pool_size=FETCH_WORKERS):
+    """HTTP session with a keep-alive connection pool sized for the fetch workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_finnhub_quote(symbol, api_key, session=None, base_url=FINNHUB_BASE_URL):
     """Fetch current quote for a symbol from Finnhub API"""
-    url = f"https://finnhub.io/api/v1/quote"
+    url = f"{base_url}/quote"
     params = {
         'symbol': symbol,
         'token': api_key
     }
     
+    start = time.perf_counter()
+    outcome = 'error'
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = (session or requests).get(url, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
+        outcome = 'ok'
         
         # Finnhub returns: c (current price), h, l, o, pc (previous close)
         if data.get('c') and data['c'] > 0:
@@ -74,12 +76,134 @@ def get_finnhub_quote(symbol, api_key):
                 'low': float(data.get('l', 0)),
                 'open': float(data.get('o', 0)),
                 'previous_close': float(data.get('pc', 0)),
-                'timestamp': datetime.utcnow().isoformat()
+                'ts': time.time()  # epoch seconds (UTC)
             }
         return None
     except Exception as e:
         print(f"Error fetching quote for {symbol}: {e}")
         return None
+    finally:
+        FINNHUB_LATENCY.observe(time.perf_counter() - start, endpoint='quote', outcome=outcome)
+
+def fetch_quotes(symbols, api_key, executor, session, limiter, base_url=FINNHUB_BASE_URL):
+    """
+    Fetch quotes for all symbols concurrently, yielding each quote as soon as it arrives.
+    The token bucket is acquired before each request, so the quota holds across workers.
+    """
+    def fetch(symbol):
+        limiter.acquire()
+        return get_finnhub_quote(symbol, api_key, session=session, base_url=base_url)
+
+    futures = [executor.submit(fetch, symbol) for symbol in symbols]
+    for future in as_completed(futures):
+        quote = future.result()
+        if quote:
+            yield quote
+
+def publish_quote(tracker, quote, on_success=None):
+    """
+    Stamp ingest_ts (for end-to-end latency downstream) and hand the quote to Kafka.
+    Returns False if it could not be queued; delivery itself is reported to on_success later.
+    """
+    try:
+        quote['ingest_ts'] = time.time()
+        tracker.send(quote['symbol'], quote, on_success=on_success, on_error=report_failure)
+        MESSAGES_PUBLISHED.inc(topic=TOPIC_NAME)
+        return True
+    except Exception as e:
+        PUBLISH_ERRORS.inc(topic=TOPIC_NAME)
+        print(f"❌ Error publishing to Kafka: {e}")
+        return False
+
+def report_published(quote, metadata):
+    print(f"✅ Published: {quote['symbol']} @ ${quote['price']:.2f}")
+
+def report_failure(quote, error):
+    print(f"❌ Delivery failed for {quote['symbol']}: {error}")
+
+def run_polling(tracker):
+    """REST mode: one /quote call per symbol every CYCLE_SECONDS"""
+    num_symbols = len(SYMBOLS)
+    print(f"⏱️  Rate limit: {FINNHUB_CALLS_PER_MINUTE} calls/minute across {FETCH_WORKERS} workers, cycle every {CYCLE_SECONDS}s")
+    if num_symbols > FINNHUB_CALLS_PER_MINUTE * CYCLE_SECONDS / 60:
+        print(f"⚠️  WARNING: {num_symbols} symbols cannot be fetched within one {CYCLE_SECONDS}s cycle at this quota.")
+        print(f"   Cycles will overrun and be skipped. Reduce symbols or raise FINNHUB_CALLS_PER_MINUTE.")
+    
+    session = create_session()
+    limiter = TokenBucket(FINNHUB_CALLS_PER_MINUTE)
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    
+    try:
+        cycle_count = 0
+        # Cycles run on a fixed clock (start + n * CYCLE_SECONDS), not sleep-after-work,
+        # so fetch time does not make the cadence drift
+        next_cycle_at = time.monotonic()
+        while True:
+            cycle_count += 1
+            cycle_start = time.monotonic()
+            print(f"\n🔄 Cycle #{cycle_count} - Fetching prices for {num_symbols} symbols...")
+            
+            for quote in fetch_quotes(SYMBOLS, FINNHUB_API_KEY, executor, session, limiter):
+                publish_quote(tracker, quote, on_success=report_published)
+            # Wait for this cycle's acknowledgements so its numbers are final
+            tracker.flush()
+            delivery = tracker.cycle_stats()
+            
+            elapsed = time.monotonic() - cycle_start
+            CYCLE_DURATION.observe(elapsed)
+            next_cycle_at += CYCLE_SECONDS
+            now = time.monotonic()
+            if now > next_cycle_at:
+                skipped = int((now - next_cycle_at) // CYCLE_SECONDS) + 1
+                next_cycle_at += skipped * CYCLE_SECONDS
+                print(f"⚠️  Cycle took {elapsed:.1f}s (> {CYCLE_SECONDS}s), skipping {skipped} slot(s)")
+            
+            wait = next_cycle_at - now
+            print(f"📊 Cycle complete: {delivery['delivered']}/{num_symbols} quotes in {elapsed:.1f}s "
+                  f"({format_stats(delivery)}). Next cycle in {wait:.1f}s...")
+            time.sleep(wait)
+    finally:
+        executor.shutdown(wait=False)
+        session.close()
+
+def run_streaming(tracker, url=None):
+    """WebSocket mode: one trade subscription for all symbols, coalesced into per-symbol micro-batches"""
+    from price_stream import FINNHUB_WS_URL, PRICE_STREAM_BATCH_MS, PRICE_STREAM_MAX_SYMBOLS, FinnhubTradeStream
+
+    if len(SYMBOLS) > PRICE_STREAM_MAX_SYMBOLS:
+        print(f"⚠️  WARNING: {len(SYMBOLS)} symbols exceed the {PRICE_STREAM_MAX_SYMBOLS}-symbol WebSocket limit; "
+              f"Finnhub ignores subscriptions past the limit.")
+    print(f"⏱️  Streaming trades from {url or FINNHUB_WS_URL}, one quote per symbol every {PRICE_STREAM_BATCH_MS} ms at most")
+    report = {'at': time.monotonic() + STATS_INTERVAL_SEC, 'trades': 0}
+
+    def on_batch(quotes):
+        # No per-batch flush: the in-flight limit alone throttles the stream if Kafka falls behind
+        STREAM_BATCH.observe(len(quotes))
+        for quote in quotes:
+            publish_quote(tracker, quote)
+        now = time.monotonic()
+        if now >= report['at']:
+            trades = stream.coalescer.trades - report['trades']
+            print(f"📊 Last {STATS_INTERVAL_SEC}s: {trades} trades -> {format_stats(tracker.cycle_stats())} "
+                  f"({stream.connects - 1} reconnects so far)")
+            report.update(at=now + STATS_INTERVAL_SEC, trades=stream.coalescer.trades)
+
+    stream = FinnhubTradeStream(SYMBOLS, FINNHUB_API_KEY, on_batch, url=url or FINNHUB_WS_URL)
+    try:
+        stream.run()
+    finally:
+        stream.stop()
+
+def run_ingest(tracker, mode=PRICE_INGEST_MODE, url=None):
+    """Run the configured ingest mode; a WebSocket stream that keeps failing falls back to REST polling"""
+    if mode == 'websocket':
+        from price_stream import StreamUnavailable
+        try:
+            run_streaming(tracker, url=url)
+            return
+        except StreamUnavailable as e:
+            print(f"⚠️  Trade stream unavailable ({e}); falling back to REST polling")
+    run_polling(tracker)
 
 def main():
     if not FINNHUB_API_KEY:
@@ -87,43 +211,20 @@ def main():
         return
     
     # Initialize Kafka producer
-    producer = KafkaProducer(
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-        retries=3
-    )
+    producer = create_producer(TOPIC_NAME)
+    tracker = DeliveryTracker(producer, TOPIC_NAME)
     
     num_symbols = len(SYMBOLS)
-    print(f"💰 Price Producer started. Publishing to topic: {TOPIC_NAME}")
+    print(f"💰 Price Producer started ({PRICE_INGEST_MODE} mode). Publishing to topic: {TOPIC_NAME} ({KAFKA_MESSAGE_FORMAT})")
     print(f"Monitoring {num_symbols} symbols: {', '.join(SYMBOLS)}")
-    print(f"💡 Note: Price data uses WebSocket/Quote API - can track all {num_symbols} simultaneously without rate limit issues")
+    start_metrics_server()
     
     try:
-        cycle_count = 0
-        while True:
-            cycle_count += 1
-            print(f"\n🔄 Cycle #{cycle_count} - Fetching prices for {num_symbols} symbols...")
-            
-            for symbol in SYMBOLS:
-                quote = get_finnhub_quote(symbol, FINNHUB_API_KEY)
-                
-                if quote:
-                    try:
-                        producer.send(TOPIC_NAME, value=quote)
-                        print(f"✅ Published: {symbol} @ ${quote['price']:.2f}")
-                    except Exception as e:
-                        print(f"❌ Error publishing to Kafka: {e}")
-                
-                # Small delay between symbols to avoid overwhelming API
-                time.sleep(0.2)
-            
-            # Wait 1 minute before next cycle (prices update frequently)
-            print(f"⏳ Waiting 60 seconds before next fetch cycle...")
-            time.sleep(60)
-            
+        run_ingest(tracker)
     except KeyboardInterrupt:
         print("\n🛑 Shutting down price producer...")
     finally:
+        tracker.flush()
         producer.close()
 
 if __name__ == '__main__':
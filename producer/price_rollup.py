@@ -0,0 +1,114 @@
+"""
+Price Rollups: Maintains 1m/5m/1h OHLCV bars per symbol in price_ohlcv
+- rollup_rows() (price consumer, every flush) folds only the new batch into its bars:
+  high/low widen, close follows the newest tick, volume and samples add up. Its cost
+  depends on the batch, not on how many ticks the bars already hold.
+- refresh_rollups() (backfill_rollups.py) recomputes whole bars from price_log and is
+  idempotent, so it also repairs bars after replays or out-of-order ticks (an incremental
+  update never moves a bar's open earlier).
+"""
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+
+# resolution label -> bucket width
+RESOLUTIONS = {
+    '1m': '1 minute',
+    '5m': '5 minutes',
+    '1h': '1 hour',
+}
+BUCKET_SECONDS = {'1m': 60, '5m': 300, '1h': 3600}
+# Same origin as date_bin() in ROLLUP_SQL
+BUCKET_ORIGIN = datetime(2000, 1, 1)
+
+MERGE_SQL = """
+    INSERT INTO price_ohlcv (symbol, resolution, bucket_start, open, high, low, close, volume, samples, last_ts)
+    VALUES %s
+    ON CONFLICT (symbol, resolution, bucket_start) DO UPDATE SET
+        high = GREATEST(price_ohlcv.high, EXCLUDED.high),
+        low = LEAST(price_ohlcv.low, EXCLUDED.low),
+        close = CASE WHEN EXCLUDED.last_ts >= price_ohlcv.last_ts THEN EXCLUDED.close ELSE price_ohlcv.close END,
+        volume = price_ohlcv.volume + EXCLUDED.volume,
+        samples = price_ohlcv.samples + EXCLUDED.samples,
+        last_ts = GREATEST(price_ohlcv.last_ts, EXCLUDED.last_ts)
+"""
+
+ROLLUP_SQL = """
+    INSERT INTO price_ohlcv (symbol, resolution, bucket_start, open, high, low, close, volume, samples, last_ts)
+    SELECT symbol,
+           %(resolution)s,
+           date_bin(%(width)s::interval, timestamp, TIMESTAMP '2000-01-01') AS bucket_start,
+           (array_agg(price ORDER BY timestamp))[1],
+           MAX(price),
+           MIN(price),
+           (array_agg(price ORDER BY timestamp DESC))[1],
+           COALESCE(SUM(volume), 0),
+           COUNT(*),
+           MAX(timestamp)
+    FROM price_log
+    WHERE timestamp >= date_bin(%(width)s::interval, %(since)s, TIMESTAMP '2000-01-01')
+      AND timestamp < date_bin(%(width)s::interval, %(until)s, TIMESTAMP '2000-01-01') + %(width)s::interval
+      AND (%(symbols)s::text[] IS NULL OR symbol = ANY(%(symbols)s::text[]))
+    GROUP BY symbol, bucket_start
+    ON CONFLICT (symbol, resolution, bucket_start) DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume,
+        samples = EXCLUDED.samples,
+        last_ts = EXCLUDED.last_ts
+"""
+
+
+def refresh_rollups(cursor, since, until, symbols=None, resolutions=None):
+    """
+    Recompute every bar overlapping [since, until] for the given symbols (all if None).
+    Runs in the caller's transaction; returns the number of bars written.
+    """
+    written = 0
+    for resolution in resolutions or RESOLUTIONS:
+        cursor.execute(ROLLUP_SQL, {
+            'resolution': resolution,
+            'width': RESOLUTIONS[resolution],
+            'since': since,
+            'until': until,
+            'symbols': list(symbols) if symbols is not None else None,
+        })
+        written += cursor.rowcount
+    return written
+
+
+def bucket_start(timestamp, resolution):
+    width = BUCKET_SECONDS[resolution]
+    offset = (timestamp - BUCKET_ORIGIN).total_seconds()
+    return BUCKET_ORIGIN + timedelta(seconds=offset - offset % width)
+
+
+def aggregate_rows(rows, resolutions=None):
+    """Partial bars for a batch of (symbol, price, timestamp, volume) rows, keyed by (symbol, resolution, bucket_start)"""
+    bars = {}
+    for symbol, price, timestamp, volume in sorted(rows, key=lambda row: row[2]):
+        price = float(price)
+        for resolution in resolutions or RESOLUTIONS:
+            key = (symbol, resolution, bucket_start(timestamp, resolution))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = [price, price, price, price, volume or 0, 1, timestamp]
+            else:
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+                bar[4] += volume or 0
+                bar[5] += 1
+                bar[6] = timestamp
+    return bars
+
+
+def rollup_rows(cursor, rows):
+    """BatchWriter hook: merge a batch of (symbol, price, timestamp, volume) rows into their bars"""
+    if not rows:
+        return 0
+    bars = aggregate_rows(rows)
+    # Sorted, so concurrent writers lock bars in the same order
+    execute_values(cursor, MERGE_SQL, [key + tuple(bars[key]) for key in sorted(bars)], page_size=len(bars))
+    return len(bars)
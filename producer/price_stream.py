@@ -0,0 +1,177 @@
+"""
+Price Stream: Finnhub trade WebSocket ingest for the price producer (PRICE_INGEST_MODE=websocket)
+One persistent connection subscribes to every symbol. Trades are coalesced per symbol into
+micro-batches of PRICE_STREAM_BATCH_MS; each batch becomes one stock_prices message
+(last price, batch high/low/open, summed volume), so a busy symbol publishes at most one
+quote per batch interval however many trades it prints. Dropped or silent connections
+are re-established with exponential backoff and every symbol is subscribed again; after
+PRICE_STREAM_FALLBACK_AFTER connections in a row fail before their first frame, run() raises
+StreamUnavailable so the price producer can fall back to REST polling.
+"""
+import json
+import os
+import time
+
+import websocket
+
+FINNHUB_WS_URL = os.getenv('FINNHUB_WS_URL', 'wss://ws.finnhub.io')
+# Trades per symbol are merged over this window before publishing
+PRICE_STREAM_BATCH_MS = int(os.getenv('PRICE_STREAM_BATCH_MS', '1000'))
+# Finnhub pings idle connections; no frame for this long means the connection is dead
+PRICE_STREAM_IDLE_TIMEOUT = float(os.getenv('PRICE_STREAM_IDLE_TIMEOUT', '60'))
+PRICE_STREAM_RECONNECT_MAX_SECONDS = float(os.getenv('PRICE_STREAM_RECONNECT_MAX_SECONDS', '60'))
+# Consecutive connections that fail before any frame arrives before giving up on the stream (0 = never)
+PRICE_STREAM_FALLBACK_AFTER = int(os.getenv('PRICE_STREAM_FALLBACK_AFTER', '5'))
+# Finnhub's free tier accepts 50 symbols per connection; extra subscriptions are ignored by the server
+PRICE_STREAM_MAX_SYMBOLS = int(os.getenv('PRICE_STREAM_MAX_SYMBOLS', '50'))
+
+
+class StreamUnavailable(Exception):
+    """The trade stream could not be (re)established PRICE_STREAM_FALLBACK_AFTER times in a row"""
+
+
+class TradeCoalescer:
+    """Merges trades into one pending quote per symbol until drain() is called"""
+
+    def __init__(self, batch_ms=PRICE_STREAM_BATCH_MS):
+        self.interval = batch_ms / 1000.0
+        self.pending = {}
+        self.first_trade_at = None
+        self.trades = 0
+
+    def add(self, trade):
+        """Add one Finnhub trade ({'s': symbol, 'p': price, 't': epoch ms, 'v': volume})"""
+        symbol, price = trade.get('s'), trade.get('p')
+        if not symbol or not price:
+            return
+        price = float(price)
+        ts = float(trade.get('t') or time.time() * 1000) / 1000.0
+        quote = self.pending.get(symbol)
+        if quote is None:
+            if not self.pending:
+                self.first_trade_at = time.monotonic()
+            self.pending[symbol] = {
+                'symbol': symbol, 'price': price, 'high': price, 'low': price, 'open': price,
+                'previous_close': None, 'ts': ts, 'volume': float(trade.get('v') or 0),
+            }
+        else:
+            if ts >= quote['ts']:
+                quote['price'] = price
+                quote['ts'] = ts
+            quote['high'] = max(quote['high'], price)
+            quote['low'] = min(quote['low'], price)
+            quote['volume'] += float(trade.get('v') or 0)
+        self.trades += 1
+
+    def time_until_flush(self):
+        """Seconds until the oldest pending trade reaches the batch interval (None if empty)"""
+        if not self.pending:
+            return None
+        return max(0.0, self.interval - (time.monotonic() - self.first_trade_at))
+
+    def drain(self):
+        """Return the pending quotes (one per symbol) and start a new batch"""
+        quotes = list(self.pending.values())
+        self.pending = {}
+        self.first_trade_at = None
+        return quotes
+
+
+class FinnhubTradeStream:
+    """
+    Keeps one subscription for all `symbols` alive and calls on_batch(quotes) with each
+    coalesced micro-batch. run() blocks until stop() is called (or KeyboardInterrupt), or
+    raises StreamUnavailable after `max_failures` connections in a row fail before their first frame.
+    """
+
+    def __init__(self, symbols, api_key, on_batch, url=FINNHUB_WS_URL, batch_ms=PRICE_STREAM_BATCH_MS,
+                 idle_timeout=PRICE_STREAM_IDLE_TIMEOUT, max_backoff=PRICE_STREAM_RECONNECT_MAX_SECONDS,
+                 max_failures=PRICE_STREAM_FALLBACK_AFTER):
+        self.symbols = list(symbols)
+        self.url = f"{url}?token={api_key}" if api_key else url
+        self.on_batch = on_batch
+        self.coalescer = TradeCoalescer(batch_ms)
+        self.idle_timeout = idle_timeout
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self.running = False
+        self.connects = 0
+        self.messages = 0
+
+    def stop(self):
+        self.running = False
+
+    def _connect(self):
+        ws = websocket.create_connection(self.url, timeout=10)
+        for symbol in self.symbols:
+            ws.send(json.dumps({'type': 'subscribe', 'symbol': symbol}))
+        self.connects += 1
+        return ws
+
+    def _handle(self, raw):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            print(f"⚠️  Ignoring malformed stream frame: {raw[:80]!r}")
+            return
+        kind = message.get('type')
+        if kind == 'trade':
+            for trade in message.get('data') or []:
+                self.coalescer.add(trade)
+        elif kind == 'error':
+            print(f"⚠️  Finnhub stream error: {message.get('msg')}")
+
+    def _flush(self):
+        quotes = self.coalescer.drain()
+        if quotes:
+            self.on_batch(quotes)
+
+    def run(self):
+        self.running = True
+        backoff = min(1.0, self.max_backoff)
+        failures = 0
+        while self.running:
+            ws = None
+            received = False
+            try:
+                ws = self._connect()
+                print(f"🔌 Stream connected ({'reconnect #' + str(self.connects - 1) if self.connects > 1 else 'first connect'}), "
+                      f"subscribed to {len(self.symbols)} symbols")
+                backoff = min(1.0, self.max_backoff)
+                last_frame = time.monotonic()
+                while self.running:
+                    wait = self.coalescer.time_until_flush()
+                    ws.settimeout(self.coalescer.interval if wait is None else max(wait, 0.001))
+                    try:
+                        raw = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        raw = None
+                    now = time.monotonic()
+                    if raw:
+                        last_frame = now
+                        received = True
+                        failures = 0
+                        self.messages += 1
+                        self._handle(raw)
+                    elif raw == '':
+                        raise websocket.WebSocketConnectionClosedException("Connection closed by server")
+                    if self.coalescer.time_until_flush() == 0:
+                        self._flush()
+                    if now - last_frame > self.idle_timeout:
+                        raise websocket.WebSocketTimeoutException(f"No frames for {self.idle_timeout:.0f}s")
+            except (websocket.WebSocketException, OSError) as e:
+                if not self.running:
+                    break
+                # Publish what arrived before the drop, then back off and resubscribe
+                self._flush()
+                if not received:
+                    failures += 1
+                    if self.max_failures and failures >= self.max_failures:
+                        raise StreamUnavailable(f"{failures} connections in a row failed, last: {e}") from e
+                print(f"⚠️  Stream disconnected ({e}); reconnecting in {backoff:.1f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if ws is not None:
+                    ws.close()
+        self._flush()
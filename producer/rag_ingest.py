@@ -1,39 +1,199 @@
 # producer/rag_ingest.py
-# PHASE 2: RAG Pipeline - Creates embeddings and stores in financial_knowledge table
+# PHASE 2: RAG Pipeline - Creates embeddings and stores them in the knowledge_* tables
 # This script is ready but not used in Phase 1
-# Uncomment financial_knowledge table in init.sql before using this script
+#
+# Messages are consumed in micro-batches: one encode() call and one transaction per
+# batch, with Kafka offsets committed only after the batch is stored. Stories already
+# in the store (same normalized headline) are linked to the new symbol, not re-embedded.
+# A failed batch is retried with backoff while its partitions are paused (the worker keeps
+# polling, so it stays in the group). After RAG_MAX_RETRIES failures it is stored one message
+# at a time and messages that fail on their own are skipped; a database outage is retried
+# until the database is back, never skipped.
+# Workers (RAG_INGEST_WORKERS, or more instances) join the RAG_INGEST_GROUP_ID consumer
+# group and store their pending batch before a rebalance moves its partitions.
 
-from kafka import KafkaConsumer
+import os
+import time
 import psycopg2
-import json
-from sentence_transformers import SentenceTransformer
-
-# 1. Load a small, free embedding model
-# 'all-MiniLM-L6-v2' is fast and perfect for this
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# 2. Connect to DB
-conn = psycopg2.connect("dbname=market_mood user=market_user password=market_password host=postgres")
-cursor = conn.cursor()
-
-consumer = KafkaConsumer('stock_news', bootstrap_servers='kafka:29092')
-
-print("🧠 The Professor is listening...")
-
-for msg in consumer:
-    data = json.loads(msg.value.decode('utf-8'))
-    
-    # Create a rich text chunk
-    # e.g. "Apple (AAPL) Headline: New Headset Released. Summary: Apple announced..."
-    text_content = f"{data['symbol']} Headline: {data['headline']}. Summary: {data['summary']}"
-    
-    # 3. Create Vector (The Magic)
-    vector = model.encode(text_content).tolist()
-    
-    # 4. Save to pgvector
-    cursor.execute(
-        "INSERT INTO financial_knowledge (symbol, content, embedding) VALUES (%s, %s, %s)",
-        (data['symbol'], text_content, vector)
+from pathlib import Path
+from consumer_group import FlushOnRevoke, create_consumer, run_workers
+from embedders import EMBEDDING_BACKEND, EMBEDDING_MODEL, LazyEmbedder
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from knowledge_store import store_batch
+from metrics import (SIZE_BUCKETS, counter, gauge, histogram, observe_pipeline_latency,
+                     start_metrics_server, update_consumer_lag)
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
+POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
+
+# Micro-batching: max messages per poll, and batch size passed to model.encode()
+RAG_MAX_BATCH = int(os.getenv('RAG_MAX_BATCH', '256'))
+RAG_ENCODE_BATCH_SIZE = int(os.getenv('RAG_ENCODE_BATCH_SIZE', '64'))
+RAG_POLL_TIMEOUT_MS = int(os.getenv('RAG_POLL_TIMEOUT_MS', '1000'))
+# Instances (and worker threads) sharing a group id split the stock_news partitions
+RAG_INGEST_GROUP_ID = os.getenv('RAG_INGEST_GROUP_ID', 'rag-ingest')
+RAG_INGEST_WORKERS = int(os.getenv('RAG_INGEST_WORKERS', '1'))
+# Failed attempts at one batch before its failing messages are skipped, and the backoff cap
+RAG_MAX_RETRIES = int(os.getenv('RAG_MAX_RETRIES', '3'))
+RAG_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv('RAG_RETRY_BACKOFF_MAX_SECONDS', '30'))
+
+# Embedding cache: duplicate headlines skip model.encode() entirely
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '50000'))
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', str(Path(__file__).parent / 'state' / 'embedding_cache.sqlite'))
+
+# Metrics (served on METRICS_PORT, see metrics.py)
+MESSAGES_CONSUMED = counter('consumer_messages_total', 'Kafka records consumed', ('topic',))
+CONSUMER_LAG = gauge('consumer_lag_messages', 'High watermark minus consumer position', ('topic', 'partition'))
+BATCH_SIZE = histogram('rag_batch_messages', 'Headlines per stored batch', buckets=SIZE_BUCKETS)
+EMBED_LATENCY = histogram('rag_embed_seconds', 'Time to embed the new chunks of one batch')
+FLUSH_LATENCY = histogram('db_flush_seconds', 'Time to write and commit one batch', ('table',))
+FLUSH_ERRORS = counter('db_flush_errors_total', 'Failed batch writes (retried)', ('table',))
+DOCUMENTS = counter('rag_documents_total', 'Headlines stored, by outcome', ('outcome',))
+SKIPPED = counter('rag_skipped_messages_total', 'Headlines dropped because they cannot be stored')
+
+def embed_batch(embedder, texts):
+    """Encode a batch of texts in one call; returns one list of floats per text"""
+    with EMBED_LATENCY.time():
+        return embedder.encode(texts, batch_size=RAG_ENCODE_BATCH_SIZE)
+
+def connect():
+    return psycopg2.connect(
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        host=POSTGRES_HOST,
+        port=5432
+    )
+
+def is_outage(error):
+    """The database is unreachable (retry until it is back), as opposed to a batch it rejects"""
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+def store(conn, embedder, batch):
+    """Store one batch in one transaction; on failure roll back and re-raise"""
+    try:
+        with conn.cursor() as cursor:
+            result = store_batch(cursor, batch, lambda texts: embed_batch(embedder, texts))
+        conn.commit()
+        return result
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+
+def store_each(name, conn, embedder, batch):
+    """Store a batch that keeps failing one message at a time, skipping messages that fail on their own"""
+    totals = {'messages': 0, 'new_documents': 0, 'duplicates': 0, 'chunks': 0, 'links': 0}
+    for data in batch:
+        try:
+            result = store(conn, embedder, [data])
+        except Exception as e:
+            if is_outage(e):
+                raise
+            SKIPPED.inc()
+            print(f"⚠️  {name}: skipping headline that cannot be stored ({e}): "
+                  f"{data.get('symbol')} - {str(data.get('headline'))[:50]}")
+            continue
+        for field in totals:
+            totals[field] += result[field]
+    return totals
+
+def report(name, consumer, cache, result, batch, elapsed):
+    """Metrics and a log line for one stored batch"""
+    FLUSH_LATENCY.observe(elapsed, table='knowledge_documents')
+    BATCH_SIZE.observe(result['messages'])
+    DOCUMENTS.inc(result['new_documents'], outcome='new')
+    DOCUMENTS.inc(result['duplicates'], outcome='duplicate')
+    observe_pipeline_latency('knowledge_store', batch)
+    lag = update_consumer_lag(consumer, CONSUMER_LAG)
+    stats = cache.stats()
+    print(f"{name}: stored knowledge for {result['messages']} headlines: {result['new_documents']} new stories "
+          f"({result['chunks']} chunks embedded), {result['duplicates']} already known, "
+          f"{result['links']} symbol links in {elapsed:.2f}s "
+          f"(embedding cache hit rate {stats['hit_rate']:.0%}, lag {'n/a' if lag is None else lag})")
+
+def ingest(worker_id, stop, embedder, cache):
+    """One consumer-group member: its own Kafka consumer and DB connection, sharing the embedder"""
+    name = f"rag-ingest[{worker_id}]"
+    db = {'conn': connect()}
+    # Current batch; a failed batch is retried before consuming more. `failures` counts the
+    # failed attempts at it that were not outages
+    pending = []
+    attempts = {'failures': 0, 'total': 0}
+
+    def flush():
+        """Store the pending batch and commit its offsets; raises if it could not be stored"""
+        start = time.perf_counter()
+        if pending:
+            if db['conn'].closed:
+                db['conn'] = connect()
+            if attempts['failures'] < RAG_MAX_RETRIES:
+                result = store(db['conn'], embedder, pending)
+            else:
+                result = store_each(name, db['conn'], embedder, pending)
+            consumer.commit()
+            report(name, consumer, cache, result, pending, time.perf_counter() - start)
+        pending.clear()
+        attempts.update(failures=0, total=0)
+
+    consumer = create_consumer(
+        'stock_news', RAG_INGEST_GROUP_ID, worker_id,
+        listener=FlushOnRevoke(name, flush, pending.clear)
     )
-    conn.commit()
-    print(f"Stored knowledge for {data['symbol']}")
\ No newline at end of file
+
+    try:
+        while not stop.is_set():
+            if not pending:
+                records = consumer.poll(timeout_ms=RAG_POLL_TIMEOUT_MS, max_records=RAG_MAX_BATCH)
+                batch = [m.value for messages in records.values() for m in messages]
+                MESSAGES_CONSUMED.inc(len(batch), topic='stock_news')
+                pending[:] = [d for d in batch if d.get('symbol') and d.get('headline')]
+                attempts.update(failures=0, total=0)
+                if not pending:
+                    continue
+
+            # 3. Create Vectors (The Magic) for new stories only, then save to pgvector
+            try:
+                flush()
+            except Exception as e:
+                # Offsets stay uncommitted; the batch is retried after a backoff
+                FLUSH_ERRORS.inc(table='knowledge_documents')
+                attempts['total'] += 1
+                if not is_outage(e):
+                    attempts['failures'] += 1
+                backoff = min(2 ** (attempts['total'] - 1), RAG_RETRY_BACKOFF_MAX_SECONDS)
+                print(f"❌ {name}: error storing batch of {len(pending)} (attempt {attempts['total']}): {e}; "
+                      f"retrying in {backoff:.0f}s")
+                # Keep polling while backing off, so the group does not evict this worker;
+                # paused partitions return no records (a rebalance here flushes or drops the batch)
+                consumer.pause(*consumer.assignment())
+                try:
+                    consumer.poll(timeout_ms=int(backoff * 1000))
+                finally:
+                    consumer.resume(*consumer.paused())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\n🛑 Shutting down {name}...")
+        db['conn'].close()
+        consumer.close()
+
+def main():
+    # 1. A small, free embedding model (all-MiniLM-L6-v2) shared by all workers; it is loaded
+    # by the first batch with headlines not already in the embedding cache or the store
+    model = LazyEmbedder(EMBEDDING_BACKEND)
+    cache = EmbeddingCache(max_entries=EMBEDDING_CACHE_SIZE, sqlite_path=EMBEDDING_CACHE_PATH or None)
+    embedder = CachedEmbedder(model, EMBEDDING_MODEL, cache)
+
+    print(f"🧠 The Professor is listening... (group {RAG_INGEST_GROUP_ID}, {RAG_INGEST_WORKERS} worker(s), "
+          f"{EMBEDDING_BACKEND} embeddings)")
+    print(f"📦 Batching: up to {RAG_MAX_BATCH} messages per poll, encode batch_size={RAG_ENCODE_BATCH_SIZE}")
+    start_metrics_server()
+
+    # 2. Each worker connects to the DB and joins the consumer group
+    run_workers(lambda worker_id, stop: ingest(worker_id, stop, embedder, cache), RAG_INGEST_WORKERS)
+
+if __name__ == '__main__':
+    main()
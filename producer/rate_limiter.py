@@ -0,0 +1,44 @@
+"""
+Rate Limiter: Thread-safe token bucket used to stay inside Finnhub's per-minute API quota
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `calls_per_minute` calls on average, with bursts of up to `burst` calls.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, calls_per_minute, burst=None):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, calls_per_minute // 6))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self):
+        """Take a token if one is available right now"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Topic Replay: Records a Kafka topic to a JSONL file and replays it at a multiple of real time
+Used to load-test the Flink sentiment job. Examples:
+    docker-compose run --rm producer python replay_topic.py record --topic stock_news --out state/news.jsonl
+    docker-compose run --rm producer python replay_topic.py replay --in state/news.jsonl --speed 10 --verify sentiment_log
+Replayed messages get their event time ('ts') rewritten to the send time, so they land in
+current windows and partitions and are stored as new rows rather than upserts. Recordings are
+format-neutral JSONL; replays are sent in KAFKA_MESSAGE_FORMAT.
+"""
+import argparse
+import json
+import os
+import time
+import psycopg2
+from datetime import datetime
+from kafka import KafkaConsumer
+from serializers import create_producer, deserializer_for
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
+POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'postgres')
+POSTGRES_DB = os.getenv('POSTGRES_DB', 'market_mood')
+POSTGRES_USER = os.getenv('POSTGRES_USER', 'market_user')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'market_password')
+
+def record(args):
+    """Dump the topic from the earliest offset; stops after --idle-ms without new records"""
+    consumer = KafkaConsumer(
+        args.topic,
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+        value_deserializer=deserializer_for(args.topic),
+        consumer_timeout_ms=args.idle_ms
+    )
+    count = 0
+    with open(args.out, 'w') as f:
+        for message in consumer:
+            f.write(json.dumps({
+                'timestamp': message.timestamp,
+                'key': message.key.decode('utf-8') if message.key else None,
+                'value': message.value
+            }) + '\n')
+            count += 1
+            if args.max_messages and count >= args.max_messages:
+                break
+    consumer.close()
+    print(f"✅ Recorded {count} messages from {args.topic} to {args.out}")
+
+def restamp(value, now):
+    """Move the message's event time (epoch seconds in 'ts') to `now`"""
+    if 'ts' in value:
+        value['ts'] = now
+    return value
+
+def count_rows(conn, table, since):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {table} WHERE created_at >= %s", (since,))
+        count = cursor.fetchone()[0]
+    conn.commit()
+    return count
+
+def replay(args):
+    with open(args.infile) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        print(f"⚠️ No messages in {args.infile}")
+        return
+    records.sort(key=lambda r: r['timestamp'])
+    topic = args.topic or 'stock_news'
+    span = (records[-1]['timestamp'] - records[0]['timestamp']) / 1000.0
+    print(f"🔁 Replaying {len(records)} messages ({span:.0f}s recorded) to {topic} at {args.speed}x "
+          f"(~{span / args.speed:.0f}s)")
+
+    producer = create_producer(topic)
+    conn = None
+    if args.verify:
+        conn = psycopg2.connect(dbname=POSTGRES_DB, user=POSTGRES_USER, password=POSTGRES_PASSWORD,
+                                host=POSTGRES_HOST, port=5432)
+
+    start_wall = time.time()
+    # Event times are rewritten to wall-clock send time, so count rows from here on
+    start_db = datetime.utcfromtimestamp(start_wall).replace(microsecond=0)
+    first_ts = records[0]['timestamp']
+    behind = 0.0
+    for i, record in enumerate(records, 1):
+        # Preserve the recorded inter-arrival gaps, compressed by --speed
+        due = start_wall + (record['timestamp'] - first_ts) / 1000.0 / args.speed
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            behind = max(behind, -delay)
+        value = record['value'] if args.keep_ts else restamp(record['value'], time.time())
+        # Always a fresh ingest time, so end-to-end latency reflects this replay
+        value['ingest_ts'] = time.time()
+        producer.send(topic, key=record.get('key') or value.get('symbol'), value=value)
+        if i % 1000 == 0:
+            print(f"   {i}/{len(records)} sent ({i / (time.time() - start_wall):.0f} msg/s)")
+    producer.flush()
+    producer.close()
+    elapsed = time.time() - start_wall
+    print(f"📊 Sent {len(records)} messages in {elapsed:.1f}s ({len(records) / max(elapsed, 1e-9):.0f} msg/s, "
+          f"max {behind * 1000:.0f} ms behind schedule)")
+
+    if conn is not None:
+        # Wait for the pipeline to drain: rows stop arriving or all messages are stored
+        deadline = time.time() + args.verify_timeout
+        last, stored = -1, 0
+        while time.time() < deadline:
+            stored = count_rows(conn, args.verify, start_db)
+            if stored >= len(records) or stored == last:
+                break
+            last = stored
+            time.sleep(5)
+        drained = time.time() - start_wall
+        print(f"🗄️  {args.verify}: {stored}/{len(records)} rows stored after {drained:.1f}s "
+              f"({stored / drained:.0f} rows/s end to end, {drained - elapsed:.1f}s behind the producer)")
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay a Kafka topic for load tests")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help="Dump a topic to JSONL")
+    rec.add_argument('--topic', default='stock_news')
+    rec.add_argument('--out', required=True)
+    rec.add_argument('--max-messages', type=int, default=0, help="Stop after N messages (0 = all)")
+    rec.add_argument('--idle-ms', type=int, default=10000, help="Stop after this long without new messages")
+
+    rep = sub.add_parser('replay', help="Send a JSONL recording back to Kafka")
+    rep.add_argument('--in', dest='infile', required=True)
+    rep.add_argument('--topic', help="Target topic (default: stock_news)")
+    rep.add_argument('--speed', type=float, default=10.0, help="Replay rate as a multiple of real time (default: 10)")
+    rep.add_argument('--keep-ts', action='store_true', help="Keep recorded event times (replays become upserts)")
+    rep.add_argument('--verify', help="Table to watch for stored rows (e.g. sentiment_log)")
+    rep.add_argument('--verify-timeout', type=int, default=300)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    else:
+        replay(args)
+
+if __name__ == '__main__':
+    main()
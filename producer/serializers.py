@@ -0,0 +1,110 @@
+"""
+Kafka Serialization: Pluggable message formats and a tuned producer factory
+KAFKA_MESSAGE_FORMAT selects the wire format for stock_prices and stock_news:
+    json - UTF-8 JSON objects (default, human-readable)
+    avro - schemaless Avro binary (fastavro); field layout matches the schema Flink's
+           'avro' format derives from the source table DDL, so the Flink jobs can read it
+Deserializers accept both formats, so consumers keep working while producers switch over.
+"""
+import io
+import json
+import os
+from kafka import KafkaProducer
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
+KAFKA_MESSAGE_FORMAT = os.getenv('KAFKA_MESSAGE_FORMAT', 'json')
+# Producer batching: compression codec (none, gzip, lz4, zstd), wait up to linger_ms to fill batch_size bytes
+KAFKA_COMPRESSION_TYPE = os.getenv('KAFKA_COMPRESSION_TYPE', 'lz4')
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', '20'))
+KAFKA_BATCH_SIZE = int(os.getenv('KAFKA_BATCH_SIZE', '65536'))
+
+def _nullable(name, avro_type):
+    # Flink maps nullable columns to ["null", type] unions, null first
+    return {'name': name, 'type': ['null', avro_type], 'default': None}
+
+# Field order must match the column order of the Flink source tables.
+# ts = event time (quote fetch / headline publish), ingest_ts = when the producer published it
+SCHEMAS = {
+    'stock_prices': {
+        'type': 'record', 'name': 'record',
+        'fields': [
+            _nullable('symbol', 'string'),
+            _nullable('price', 'double'),
+            _nullable('high', 'double'),
+            _nullable('low', 'double'),
+            _nullable('open', 'double'),
+            _nullable('previous_close', 'double'),
+            _nullable('ts', 'double'),
+            _nullable('ingest_ts', 'double'),
+            _nullable('volume', 'double'),  # summed trade volume (WebSocket mode only)
+        ],
+    },
+    'stock_news': {
+        'type': 'record', 'name': 'record',
+        'fields': [
+            _nullable('symbol', 'string'),
+            _nullable('headline', 'string'),
+            _nullable('summary', 'string'),
+            _nullable('source', 'string'),
+            _nullable('url', 'string'),
+            _nullable('ts', 'double'),
+            _nullable('ingest_ts', 'double'),
+        ],
+    },
+}
+
+_parsed = {}
+
+def _schema(topic):
+    if topic not in _parsed:
+        import fastavro
+        _parsed[topic] = fastavro.parse_schema(SCHEMAS[topic])
+    return _parsed[topic]
+
+def json_serializer(value):
+    return json.dumps(value).encode('utf-8')
+
+def serializer_for(topic, fmt=None):
+    """Return a value serializer (dict -> bytes) for `topic` in format `fmt` (default KAFKA_MESSAGE_FORMAT)"""
+    fmt = fmt or KAFKA_MESSAGE_FORMAT
+    if fmt == 'json':
+        return json_serializer
+    if fmt == 'avro':
+        import fastavro
+        schema = _schema(topic)
+
+        def avro_serializer(value):
+            buffer = io.BytesIO()
+            fastavro.schemaless_writer(buffer, schema, value)
+            return buffer.getvalue()
+        return avro_serializer
+    raise ValueError(f"Unknown KAFKA_MESSAGE_FORMAT: {fmt}")
+
+def deserializer_for(topic):
+    """Return a value deserializer (bytes -> dict) that accepts JSON or Avro for `topic`"""
+    def deserialize(data):
+        # A JSON object starts with '{'; an Avro record starts with a union index byte (0x00/0x02)
+        if data[:1] == b'{':
+            return json.loads(data.decode('utf-8'))
+        import fastavro
+        return fastavro.schemaless_reader(io.BytesIO(data), _schema(topic))
+    return deserialize
+
+def key_serializer(key):
+    # Records are keyed by symbol: the default partitioner (murmur2, as in the Java client)
+    # keeps each symbol on one partition, so its messages stay in order
+    return key.encode('utf-8') if key is not None else None
+
+def create_producer(topic, fmt=None, **overrides):
+    """KafkaProducer for `topic` with the configured format, compression and batching"""
+    options = dict(
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        key_serializer=key_serializer,
+        value_serializer=serializer_for(topic, fmt),
+        compression_type=None if KAFKA_COMPRESSION_TYPE == 'none' else KAFKA_COMPRESSION_TYPE,
+        linger_ms=KAFKA_LINGER_MS,
+        batch_size=KAFKA_BATCH_SIZE,
+        retries=3,
+    )
+    options.update(overrides)
+    return KafkaProducer(**options)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Ticker Registry: The ticker list shared by the producers, and its split across producer instances
+Symbols are assigned to PRODUCER_INSTANCE_COUNT instances with a consistent hash ring
+(PRODUCER_RING_VNODES virtual nodes per instance), so changing the instance count only moves
+about 1/N of the symbols. Each instance polls only its own symbols, with its own rate budget.
+Run it to preview an assignment and how many symbols a resize moves:
+    python ticker_registry.py --instances 4 --resize 5
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+from pathlib import Path
+
+TICKERS_FILE = Path(__file__).parent / 'tickers.json'
+
+# This process's slot (0-based) out of PRODUCER_INSTANCE_COUNT producers of the same kind
+PRODUCER_INSTANCE_ID = int(os.getenv('PRODUCER_INSTANCE_ID', '0'))
+PRODUCER_INSTANCE_COUNT = int(os.getenv('PRODUCER_INSTANCE_COUNT', '1'))
+PRODUCER_RING_VNODES = int(os.getenv('PRODUCER_RING_VNODES', '128'))
+# 'shared' (default): all instances use FINNHUB_API_KEY, so the quota is divided between them;
+# 'instance': each instance uses its own key from FINNHUB_API_KEYS (comma-separated, one per
+# instance, in instance-id order) and spends the full FINNHUB_CALLS_PER_MINUTE
+PRODUCER_QUOTA_SCOPE = os.getenv('PRODUCER_QUOTA_SCOPE', 'shared').lower()
+FINNHUB_API_KEYS = [key.strip() for key in os.getenv('FINNHUB_API_KEYS', '').split(',') if key.strip()]
+
+DEFAULT_TICKERS = [
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA', 'NFLX', 'AMD', 'INTC',
+    'JPM', 'BAC', 'GS', 'V', 'MA', 'PYPL', 'COIN',
+    'DIS', 'NKE', 'KO', 'PEP', 'WMT', 'COST', 'SBUX', 'MCD',
+    'BA', 'XOM', 'CVX', 'LLY', 'PLTR'
+]
+
+
+def load_tickers(tickers_file=TICKERS_FILE):
+    """
+    Load ticker symbols from seed file (tickers.json) or environment variable.
+    Priority: STOCK_SYMBOLS env var > tickers.json > default fallback
+    """
+    # Priority 1: Environment variable override
+    symbols_env = os.getenv('STOCK_SYMBOLS', '').strip()
+    if symbols_env:
+        return [s.strip().upper() for s in symbols_env.split(',') if s.strip()]
+
+    # Priority 2: Load from tickers.json seed file
+    try:
+        if tickers_file.exists():
+            with open(tickers_file, 'r') as f:
+                ticker_data = json.load(f)
+                # Extract symbols from ticker objects
+                symbols = [ticker['symbol'] for ticker in ticker_data.get('tickers', [])]
+                if symbols:
+                    print(f"✅ Loaded {len(symbols)} tickers from {tickers_file.name}")
+                    return symbols
+    except Exception as e:
+        print(f"⚠️  Warning: Could not load tickers.json: {e}")
+        print(f"   Falling back to default ticker list")
+
+    # Priority 3: Default fallback (if file doesn't exist or is invalid)
+    return list(DEFAULT_TICKERS)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring over instance ids 0..instance_count-1"""
+
+    def __init__(self, instance_count, vnodes=PRODUCER_RING_VNODES):
+        if instance_count < 1:
+            raise ValueError("instance_count must be at least 1")
+        self.instance_count = instance_count
+        points = sorted((_hash(f"instance-{i}#{v}"), i) for i in range(instance_count) for v in range(vnodes))
+        self.keys = [point for point, _ in points]
+        self.owners = [owner for _, owner in points]
+
+    def instance_for(self, symbol):
+        """The instance that owns `symbol` (first ring point clockwise of its hash)"""
+        index = bisect.bisect(self.keys, _hash(symbol.upper())) % len(self.keys)
+        return self.owners[index]
+
+    def assign(self, symbols):
+        """Return {instance_id: [symbols]} preserving the input order within each instance"""
+        assignment = {i: [] for i in range(self.instance_count)}
+        for symbol in symbols:
+            assignment[self.instance_for(symbol)].append(symbol)
+        return assignment
+
+
+def instance_symbols(symbols, instance_id=PRODUCER_INSTANCE_ID, instance_count=PRODUCER_INSTANCE_COUNT):
+    """The subset of `symbols` this producer instance is responsible for"""
+    if not 0 <= instance_id < instance_count:
+        raise ValueError(f"PRODUCER_INSTANCE_ID must be in 0..{instance_count - 1}, got {instance_id}")
+    if instance_count == 1:
+        return list(symbols)
+    ring = HashRing(instance_count)
+    return [symbol for symbol in symbols if ring.instance_for(symbol) == instance_id]
+
+
+def instance_budget(calls_per_minute, instance_count=PRODUCER_INSTANCE_COUNT, scope=PRODUCER_QUOTA_SCOPE):
+    """Calls per minute this instance may spend (the whole quota unless one key is shared)"""
+    if scope == 'shared':
+        return max(1, calls_per_minute // instance_count)
+    return calls_per_minute
+
+
+def instance_api_key(default, instance_id=PRODUCER_INSTANCE_ID, instance_count=PRODUCER_INSTANCE_COUNT,
+                     scope=PRODUCER_QUOTA_SCOPE, keys=FINNHUB_API_KEYS):
+    """
+    The Finnhub key this instance calls with: `default` (FINNHUB_API_KEY) unless the quota is
+    per instance, which needs a distinct key for every instance, since N instances spending
+    the full quota on one key get rate-limited (HTTP 429).
+    """
+    if scope == 'shared' or (instance_count == 1 and not keys):
+        return default
+    if scope != 'instance':
+        raise ValueError(f"PRODUCER_QUOTA_SCOPE must be 'shared' or 'instance', got {scope!r}")
+    if len(set(keys)) < instance_count:
+        raise ValueError(
+            f"PRODUCER_QUOTA_SCOPE=instance needs FINNHUB_API_KEYS with {instance_count} distinct keys "
+            f"(one per instance), got {len(set(keys))}; use PRODUCER_QUOTA_SCOPE=shared to split one key's quota"
+        )
+    return keys[instance_id]
+
+
+def load_instance_symbols():
+    """load_tickers() narrowed to this instance, with a one-line summary when the list is split"""
+    symbols = load_tickers()
+    mine = instance_symbols(symbols)
+    if PRODUCER_INSTANCE_COUNT > 1:
+        print(f"🧩 Instance {PRODUCER_INSTANCE_ID}/{PRODUCER_INSTANCE_COUNT}: {len(mine)} of {len(symbols)} symbols")
+    return mine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preview the symbol split across producer instances")
+    parser.add_argument('--instances', type=int, default=PRODUCER_INSTANCE_COUNT, help="Instance count")
+    parser.add_argument('--resize', type=int, help="Also show how many symbols move at this instance count")
+    parser.add_argument('--synthetic', type=int, default=0, help="Use N synthetic symbols instead of tickers.json")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i:05d}" for i in range(args.synthetic)] if args.synthetic else load_tickers()
+    assignment = HashRing(args.instances).assign(symbols)
+    sizes = [len(assignment[i]) for i in range(args.instances)]
+    print(f"📊 {len(symbols)} symbols over {args.instances} instances: {sizes} "
+          f"(ideal {len(symbols) / args.instances:.1f})")
+    if args.resize:
+        ring = HashRing(args.resize)
+        before = {symbol: i for i, owned in assignment.items() for symbol in owned}
+        moved = sum(1 for symbol in symbols if ring.instance_for(symbol) != before[symbol])
+        print(f"🔀 {args.instances} -> {args.resize} instances moves {moved} symbols "
+              f"({moved / max(len(symbols), 1):.1%}; ideal "
+              f"{abs(args.resize - args.instances) / max(args.resize, args.instances):.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,7 @@ echo ""
 # ============================================
 # STEP 1: Pre-flight Checks
 # ============================================
-echo "📋 Step 1/6: Running pre-flight checks..."
+echo "📋 Step 1/7: Running pre-flight checks..."
 
 # Check if .env exists
 if [ ! -f .env ]; then
@@ -89,7 +89,7 @@ echo ""
 # ============================================
 # STEP 2: Detect Windows Host IP (for Ollama)
 # ============================================
-echo "📋 Step 2/6: Detecting Windows Host IP for Ollama connection..."
+echo "📋 Step 2/7: Detecting Windows Host IP for Ollama connection..."
 
 # Try to resolve host.docker.internal first (preferred for WSL2)
 if host_ip=$(python3 -c "import socket; print(socket.gethostbyname('host.docker.internal'))" 2>/dev/null); then
@@ -112,7 +112,7 @@ echo ""
 # ============================================
 # STEP 3: Clean up old containers (if any)
 # ============================================
-echo "📋 Step 3/6: Checking for old containers..."
+echo "📋 Step 3/7: Checking for old containers..."
 
 # Check for containers with corrupted metadata
 CORRUPTED_CONTAINERS=$(docker ps -a --filter "name=market_" --format "{{.Names}}" | grep -E "^[a-f0-9]{12}_market_" || true)
@@ -128,49 +128,32 @@ fi
 echo ""
 
 # ============================================
-# STEP 4: Start Infrastructure & Producers
+# STEP 4: Start Kafka, Provision Topics, Start Services & Producers
 # ============================================
-echo "📋 Step 4/6: Starting all services (Infrastructure + Producers)..."
-echo "   This includes: Kafka, PostgreSQL, Flink, Dashboard, and all Producers"
+echo "📋 Step 4/7: Starting Kafka and provisioning topics..."
 echo ""
 
-# Try to start services, handle network recreation if needed
-if ! docker-compose --profile producers up -d 2>&1 | tee /tmp/compose_output.txt | grep -q "needs to be recreated"; then
-    # Success or other error
-    if grep -q "ERROR" /tmp/compose_output.txt; then
-        # Check if it's the network recreation issue
-        if grep -q "needs to be recreated" /tmp/compose_output.txt; then
-            echo -e "   ${YELLOW}⚠️  Network configuration changed. Recreating...${NC}"
-            docker-compose --profile producers down > /dev/null 2>&1
-            sleep 2
-            echo "   Restarting with fresh network..."
-            docker-compose --profile producers up -d
-        else
-            # Some other error
+# docker-compose up -d with the given arguments, recreating the network if its configuration changed
+compose_up() {
+    if ! docker-compose "$@" up -d 2>&1 | tee /tmp/compose_output.txt | grep -q "needs to be recreated"; then
+        # Success or other error
+        if grep -q "ERROR" /tmp/compose_output.txt; then
             cat /tmp/compose_output.txt
+            rm -f /tmp/compose_output.txt
             exit 1
         fi
+    else
+        # Network needs recreation
+        echo -e "   ${YELLOW}⚠️  Network configuration changed. Recreating...${NC}"
+        docker-compose --profile producers down > /dev/null 2>&1
+        sleep 2
+        echo "   Restarting with fresh network..."
+        docker-compose "$@" up -d
     fi
-else
-    # Network needs recreation
-    echo -e "   ${YELLOW}⚠️  Network configuration changed. Recreating...${NC}"
-    docker-compose --profile producers down > /dev/null 2>&1
-    sleep 2
-    echo "   Restarting with fresh network..."
-    docker-compose --profile producers up -d
-fi
+    rm -f /tmp/compose_output.txt
+}
 
-rm -f /tmp/compose_output.txt
-
-echo ""
-echo -e "   ${GREEN}✅ Docker containers started${NC}"
-echo ""
-
-# ============================================
-# STEP 5: Wait for Services to be Healthy
-# ============================================
-echo "📋 Step 5/6: Waiting for services to become healthy..."
-echo ""
+compose_up kafka
 
 # Wait for Kafka
 echo "   Waiting for Kafka..."
@@ -192,6 +175,53 @@ if [ $RETRY -eq $MAX_RETRIES ]; then
     exit 1
 fi
 
+# Provision topics before any producer runs, so the first records land on the final partition
+# layout. Producers key records by symbol, so each symbol stays on one partition; the partition
+# count caps how many consumer-group members (price-consumer / rag-ingest workers, Flink source
+# subtasks) can share a topic. Growing an existing topic remaps symbols to other partitions, so
+# per-symbol ordering breaks for records already in it: that only happens with KAFKA_GROW_PARTITIONS=true.
+echo "   Provisioning Kafka topics (${KAFKA_TOPIC_PARTITIONS:-6} partitions)..."
+provision_topic() {
+    local topic=$1
+    local partitions=$2
+    docker exec market_kafka kafka-topics --bootstrap-server localhost:9092 --create --if-not-exists \
+        --topic "$topic" --partitions "$partitions" --replication-factor 1 > /dev/null 2>&1 || true
+    local current
+    current=$(docker exec market_kafka kafka-topics --bootstrap-server localhost:9092 --describe --topic "$topic" 2>/dev/null \
+        | grep -o 'PartitionCount:[[:space:]]*[0-9]*' | grep -o '[0-9]*$' || true)
+    if [ -n "$current" ] && [ "$current" -lt "$partitions" ]; then
+        if [ "${KAFKA_GROW_PARTITIONS:-false}" = "true" ]; then
+            docker exec market_kafka kafka-topics --bootstrap-server localhost:9092 --alter --topic "$topic" --partitions "$partitions" > /dev/null
+            echo -e "   ${YELLOW}⚠️  $topic: increased from $current to $partitions partitions (existing symbols move to new partitions)${NC}"
+        else
+            echo -e "   ${YELLOW}⚠️  $topic has $current partitions, KAFKA_TOPIC_PARTITIONS asks for $partitions. Left unchanged:${NC}"
+            echo "      adding partitions moves symbols to other partitions, so consumers may see their records out of order."
+            echo "      Drain the topic first, then rerun with KAFKA_GROW_PARTITIONS=true to grow it."
+        fi
+    elif [ -n "$current" ]; then
+        echo -e "   ${GREEN}✅ $topic: $current partitions${NC}"
+    else
+        echo -e "   ${YELLOW}⚠️  Could not provision $topic. Check: docker logs market_kafka${NC}"
+    fi
+}
+provision_topic stock_prices "${KAFKA_TOPIC_PARTITIONS:-6}"
+provision_topic stock_news "${KAFKA_TOPIC_PARTITIONS:-6}"
+
+echo ""
+echo "   Starting the remaining services and producers..."
+echo "   This includes: PostgreSQL, Flink, Dashboard, and all Producers"
+compose_up --profile producers
+
+echo ""
+echo -e "   ${GREEN}✅ Docker containers started${NC}"
+echo ""
+
+# ============================================
+# STEP 5: Wait for Services to be Healthy
+# ============================================
+echo "📋 Step 5/7: Waiting for services to become healthy..."
+echo ""
+
 # Wait for PostgreSQL
 echo "   Waiting for PostgreSQL..."
 RETRY=0
@@ -243,23 +273,26 @@ echo ""
 # ============================================
 # STEP 6: Submit Flink Job
 # ============================================
-echo "📋 Step 6/6: Checking Flink job status..."
-
-# Check if Flink sentiment job is already running
-FLINK_JOBS=$(docker exec market_jobmanager ./bin/flink list 2>/dev/null | grep "flink_sentiment" | wc -l)
-
-if [ "$FLINK_JOBS" -eq "0" ]; then
-    echo "   ⚠️  Flink job not running. Submitting..."
-    
-    if docker exec market_jobmanager ./bin/flink run -py /opt/flink/usrlib/flink_sentiment.py 2>&1 | grep -q "Job has been submitted"; then
-        echo -e "   ${GREEN}✅ Flink sentiment job submitted successfully${NC}"
+echo "📋 Step 6/7: Checking Flink job status..."
+
+# Submit each Flink job unless it is already running (jobs are named after their script)
+submit_flink_job() {
+    local job=$1
+    if [ "$(docker exec market_jobmanager ./bin/flink list 2>/dev/null | grep -c "$job")" -eq "0" ]; then
+        echo "   ⚠️  Flink job $job not running. Submitting..."
+        if docker exec market_jobmanager ./bin/flink run -d -py /opt/flink/usrlib/$job.py 2>&1 | grep -q "Job has been submitted"; then
+            echo -e "   ${GREEN}✅ Flink job $job submitted successfully${NC}"
+        else
+            echo -e "   ${YELLOW}⚠️  Flink job $job submission may have failed. Check logs.${NC}"
+            echo "   Check logs: docker logs market_jobmanager"
+        fi
     else
-        echo -e "   ${YELLOW}⚠️  Flink job submission may have failed. Check logs.${NC}"
-        echo "   Check logs: docker logs market_jobmanager"
+        echo -e "   ${GREEN}✅ Flink job $job is already running${NC}"
     fi
-else
-    echo -e "   ${GREEN}✅ Flink sentiment job is already running${NC}"
-fi
+}
+
+submit_flink_job flink_sentiment
+submit_flink_job flink_news_impact
 
 echo ""
 
@@ -300,7 +333,8 @@ echo ""
 echo "🌊 Flink Job Management:"
 echo "   Check status:    docker exec market_jobmanager ./bin/flink list"
 echo "   View Flink UI:   http://localhost:8081"
-echo "   Submit manually: docker exec market_jobmanager ./bin/flink run -py /opt/flink/usrlib/flink_sentiment.py"
+echo "   Submit manually: docker exec market_jobmanager ./bin/flink run -d -py /opt/flink/usrlib/flink_sentiment.py"
+echo "                    docker exec market_jobmanager ./bin/flink run -d -py /opt/flink/usrlib/flink_news_impact.py"
 
 echo ""
 echo "🎉 Happy analyzing!"
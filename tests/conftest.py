@@ -0,0 +1,13 @@
+"""
+Test setup: the producer and dashboard modules are flat scripts (imported by file name inside
+their containers), so both directories go on sys.path. Run from the repo root:
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for directory in ('producer', 'dashboard'):
+    path = str(ROOT / directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,200 @@
+"""
+AI Analyst LLM client (dashboard/llm.py) against a local fake of Ollama's streaming /api/generate:
+token order, time-to-first-token, errors mid-stream, and the answer cache (reuse, expiry, eviction).
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm import OllamaClient, OllamaError, ResponseCache, response_key
+
+
+class FakeOllama:
+    """
+    Streams `script` as newline-delimited JSON chunks (chunked encoding, like Ollama); each
+    entry is (delay_seconds, chunk). `status` other than 200 answers with that error instead.
+    """
+
+    def __init__(self, script, status=200):
+        self.script = script
+        self.status = status
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake.requests.append((self.path, json.loads(self.rfile.read(int(self.headers['Content-Length'])))))
+                if fake.status != 200:
+                    body = json.dumps({'error': 'unavailable'}).encode()
+                    self.send_response(fake.status)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for delay, chunk in fake.script:
+                    time.sleep(delay)
+                    line = (json.dumps(chunk) + '\n').encode()
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def tokens(*words, delay=0.0):
+    return [(delay, {'response': word, 'done': False}) for word in words]
+
+
+DONE = (0.0, {'response': '', 'done': True})
+
+
+@pytest.fixture
+def fake_ollama():
+    servers = []
+
+    def start(script, status=200):
+        servers.append(FakeOllama(script, status))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def ask(client, cache, prompt, context_ids):
+    """The AI Analyst page's flow: answer from the cache, or stream it and cache the complete answer"""
+    key = response_key(prompt, context_ids)
+    answer = cache.get(key)
+    if answer is None:
+        answer = ''.join(client.stream_generate(prompt))
+        cache.put(key, answer)
+    return answer
+
+
+def test_streams_tokens_in_order(fake_ollama):
+    server = fake_ollama(tokens('Apple', ' shares', ' rose', '.') + [DONE])
+    client = OllamaClient(base_url=server.url, model='llama3')
+
+    assert list(client.stream_generate('Why is AAPL up?')) == ['Apple', ' shares', ' rose', '.']
+    path, body = server.requests[0]
+    assert path == '/api/generate'
+    assert body == {'model': 'llama3', 'prompt': 'Why is AAPL up?', 'stream': True}
+
+
+def test_stops_at_the_done_chunk(fake_ollama):
+    server = fake_ollama(tokens('one') + [DONE] + tokens('ignored'))
+    client = OllamaClient(base_url=server.url)
+
+    assert list(client.stream_generate('q')) == ['one']
+
+
+def test_records_time_to_first_token(fake_ollama):
+    # An empty chunk right away, the first real token after 0.3s of "prompt processing"
+    server = fake_ollama([(0.0, {'response': '', 'done': False}), (0.3, {'response': 'first', 'done': False})]
+                         + tokens(' second', ' third', delay=0.1) + [DONE])
+    client = OllamaClient(base_url=server.url)
+    timing = {}
+
+    stream = client.stream_generate('q', timing)
+    assert next(stream) == 'first'
+    first_seen = timing['ttft']
+    assert list(stream) == [' second', ' third']
+
+    assert 0.3 <= first_seen < 0.5
+    assert timing['ttft'] == first_seen
+    assert timing['total'] >= first_seen + 0.2
+    summary = client.stats.summary()
+    assert summary['count'] == 1
+    assert summary['ttft_p50'] == timing['ttft']
+    assert summary['total_p50'] == timing['total']
+
+
+def test_error_mid_stream_raises_after_the_tokens_so_far(fake_ollama):
+    server = fake_ollama(tokens('partial', ' answer') + [(0.0, {'error': 'model runner crashed'})])
+    client = OllamaClient(base_url=server.url)
+    received = []
+
+    with pytest.raises(OllamaError, match='model runner crashed'):
+        for token in client.stream_generate('q'):
+            received.append(token)
+    assert received == ['partial', ' answer']
+    # A failed generation is not a latency sample
+    assert client.stats.summary()['count'] == 0
+
+
+def test_http_error_raises(fake_ollama):
+    server = fake_ollama([], status=503)
+    client = OllamaClient(base_url=server.url)
+
+    with pytest.raises(OllamaError, match='503'):
+        list(client.stream_generate('q'))
+
+
+def test_cache_reuses_the_answer_for_the_same_question_and_context(fake_ollama):
+    server = fake_ollama(tokens('TSLA', ' fell') + [DONE])
+    client = OllamaClient(base_url=server.url)
+    cache = ResponseCache(ttl_seconds=60)
+
+    assert ask(client, cache, 'Why is TSLA moving?', [3, 1, 2]) == 'TSLA fell'
+    # Same question up to case/whitespace, same retrieved news in another order: no new generation
+    assert ask(client, cache, '  why is   TSLA moving? ', [2, 3, 1]) == 'TSLA fell'
+    assert len(server.requests) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Different retrieved news is a different answer
+    ask(client, cache, 'Why is TSLA moving?', [1, 2, 4])
+    assert len(server.requests) == 2
+
+
+def test_failed_generation_is_not_cached(fake_ollama):
+    server = fake_ollama(tokens('partial') + [(0.0, {'error': 'out of memory'})])
+    client = OllamaClient(base_url=server.url)
+    cache = ResponseCache(ttl_seconds=60)
+
+    with pytest.raises(OllamaError):
+        ask(client, cache, 'q', [1])
+    assert cache.get(response_key('q', [1])) is None
+
+
+def test_cache_entries_expire():
+    cache = ResponseCache(ttl_seconds=0.05)
+    key = response_key('q', [1])
+    cache.put(key, 'answer')
+    assert cache.get(key) == 'answer'
+
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    assert key not in cache.entries
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = ResponseCache(ttl_seconds=60, max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # 'b' is now the least recently used
+    cache.put('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
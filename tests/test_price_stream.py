@@ -0,0 +1,225 @@
+"""
+WebSocket price ingest (price_stream.py) against an in-process stub of Finnhub's trade stream:
+subscription, trade -> quote coalescing, reconnect + resubscribe, and the REST fallback.
+"""
+import base64
+import functools
+import hashlib
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import pytest
+
+import price_stream
+from price_stream import FinnhubTradeStream, StreamUnavailable, TradeCoalescer
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+SYMBOLS = ['AAPL', 'MSFT', 'NVDA']
+
+
+def ws_frame(text):
+    """Unmasked server -> client text frame"""
+    payload = text.encode('utf-8')
+    if len(payload) < 126:
+        return struct.pack('!BB', 0x81, len(payload)) + payload
+    return struct.pack('!BBH', 0x81, 126, len(payload)) + payload
+
+
+def read_frame(rfile):
+    """One masked client -> server frame as (opcode, payload); (None, None) on EOF"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, None
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b'\0\0\0\0'
+    data = rfile.read(length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+def trade_frame(*trades):
+    return json.dumps({'type': 'trade', 'data': [
+        {'s': symbol, 'p': price, 't': ts_ms, 'v': volume} for symbol, price, ts_ms, volume in trades
+    ]})
+
+
+class StubTradeServer:
+    """
+    Finnhub-like trade WebSocket. Connection i waits for every symbol's subscribe message, sends
+    script[i] (a list of text frames), then drops the connection if drop[i] is set, else stays idle.
+    """
+
+    def __init__(self, script, drop=(), expected_symbols=len(SYMBOLS)):
+        self.script = script
+        self.drop = drop
+        self.expected_symbols = expected_symbols
+        self.subscriptions = []  # symbols subscribed on each connection, in connect order
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve(self)
+
+        self.tcp = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.tcp.daemon_threads = True
+        self.url = f"ws://127.0.0.1:{self.tcp.server_address[1]}"
+        threading.Thread(target=self.tcp.serve_forever, daemon=True).start()
+
+    def serve(self, handler):
+        headers = {}
+        handler.rfile.readline()
+        for line in iter(handler.rfile.readline, b'\r\n'):
+            if not line:
+                return
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+        handler.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        index = len(self.subscriptions)
+        subscribed = []
+        self.subscriptions.append(subscribed)
+        while len(subscribed) < self.expected_symbols:
+            opcode, payload = read_frame(handler.rfile)
+            if opcode is None or opcode == 0x8:
+                return
+            message = json.loads(payload)
+            if message.get('type') == 'subscribe':
+                subscribed.append(message['symbol'])
+        for frame in (self.script[index] if index < len(self.script) else []):
+            handler.wfile.write(ws_frame(frame))
+        handler.wfile.flush()
+        if index < len(self.drop) and self.drop[index]:
+            handler.request.shutdown(socket.SHUT_RDWR)
+            return
+        # Stay connected until the client goes away
+        while read_frame(handler.rfile)[0] not in (None, 0x8):
+            pass
+
+    def close(self):
+        self.tcp.shutdown()
+        self.tcp.server_close()
+
+
+def closed_port_url():
+    """A ws:// URL nothing listens on, so every connect is refused"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"ws://127.0.0.1:{port}"
+
+
+def run_until(stream, done, timeout=5.0):
+    """Run the stream in a thread until done() holds (or timeout), then stop it"""
+    runner = threading.Thread(target=stream.run, daemon=True)
+    runner.start()
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stream.stop()
+    runner.join(timeout=5)
+    assert not runner.is_alive()
+
+
+@pytest.fixture
+def batches():
+    """Every micro-batch passed to on_batch"""
+    return []
+
+
+def test_subscribes_every_symbol(batches):
+    server = StubTradeServer(script=[[trade_frame(('AAPL', 10.0, 1000, 1))]])
+    stream = FinnhubTradeStream(SYMBOLS, 'token', batches.append, url=server.url, batch_ms=50)
+    try:
+        run_until(stream, lambda: batches)
+    finally:
+        server.close()
+    assert server.subscriptions == [SYMBOLS]
+    assert stream.connects == 1
+
+
+def test_trades_become_one_quote_per_symbol_per_batch(batches):
+    frames = [
+        trade_frame(('AAPL', 10.0, 1000, 5), ('MSFT', 300.0, 1500, 10)),
+        'not json',
+        json.dumps({'type': 'ping'}),
+        # A late trade (older timestamp) widens the range but does not become the price
+        trade_frame(('AAPL', 12.0, 3000, 1), ('AAPL', 11.0, 2000, 2)),
+    ]
+    server = StubTradeServer(script=[frames])
+    stream = FinnhubTradeStream(SYMBOLS, 'token', batches.append, url=server.url, batch_ms=200)
+    try:
+        run_until(stream, lambda: batches)
+    finally:
+        server.close()
+
+    assert len(batches) == 1
+    quotes = {quote['symbol']: quote for quote in batches[0]}
+    assert set(quotes) == {'AAPL', 'MSFT'}
+    assert quotes['AAPL'] == {
+        'symbol': 'AAPL', 'price': 12.0, 'high': 12.0, 'low': 10.0, 'open': 10.0,
+        'previous_close': None, 'ts': 3.0, 'volume': 8.0,
+    }
+    assert quotes['MSFT']['price'] == 300.0
+    assert quotes['MSFT']['volume'] == 10.0
+    assert stream.coalescer.trades == 4
+
+
+def test_reconnects_and_resubscribes_after_a_drop(batches):
+    server = StubTradeServer(
+        script=[[trade_frame(('AAPL', 10.0, 1000, 1))], [trade_frame(('MSFT', 300.0, 2000, 1))]],
+        drop=[True, False],
+    )
+    stream = FinnhubTradeStream(SYMBOLS, 'token', batches.append, url=server.url, batch_ms=50, max_backoff=0.05)
+    received = lambda: {quote['symbol'] for batch in batches for quote in batch}
+    try:
+        run_until(stream, lambda: received() == {'AAPL', 'MSFT'})
+    finally:
+        server.close()
+
+    # The trade before the drop is published, and the new connection subscribes to everything again
+    assert received() == {'AAPL', 'MSFT'}
+    assert stream.connects == 2
+    assert server.subscriptions == [SYMBOLS, SYMBOLS]
+
+
+def test_gives_up_after_consecutive_failed_connects(batches):
+    stream = FinnhubTradeStream(SYMBOLS, 'token', batches.append, url=closed_port_url(),
+                                max_backoff=0.01, max_failures=3)
+    with pytest.raises(StreamUnavailable):
+        stream.run()
+    assert stream.connects == 0
+    assert batches == []
+
+
+def test_price_producer_falls_back_to_rest_polling(monkeypatch):
+    import price_producer
+
+    polled = []
+    monkeypatch.setattr(price_producer, 'run_polling', polled.append)
+    monkeypatch.setattr(price_stream, 'FinnhubTradeStream',
+                        functools.partial(FinnhubTradeStream, max_backoff=0.01, max_failures=2))
+    tracker = object()
+    price_producer.run_ingest(tracker, mode='websocket', url=closed_port_url())
+    assert polled == [tracker]
+
+
+def test_coalescer_drains_and_starts_a_new_batch():
+    coalescer = TradeCoalescer(batch_ms=1000)
+    assert coalescer.time_until_flush() is None
+    coalescer.add({'s': 'AAPL', 'p': 10.0, 't': 1000, 'v': 1})
+    coalescer.add({'s': 'AAPL', 'p': None, 't': 2000, 'v': 1})  # no price: ignored
+    assert 0 < coalescer.time_until_flush() <= 1.0
+    assert [quote['price'] for quote in coalescer.drain()] == [10.0]
+    assert coalescer.drain() == []
+    assert coalescer.time_until_flush() is None
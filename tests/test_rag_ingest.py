@@ -0,0 +1,182 @@
+"""
+RAG ingest worker loop (rag_ingest.ingest) with a fake consumer and database: a failing batch is
+retried while the worker keeps polling with its partitions paused, poison headlines are skipped
+after RAG_MAX_RETRIES, and a database outage is retried (with a reconnect) instead of skipped.
+"""
+import threading
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+
+import rag_ingest
+
+
+def news(*headlines):
+    return [{'symbol': 'AAPL', 'headline': headline} for headline in headlines]
+
+
+class FakeConsumer:
+    """Returns one scripted batch per unpaused poll; stops the worker once the script is used up"""
+
+    def __init__(self, batches, stop, listener):
+        self.batches = list(batches)
+        self.stop = stop
+        self.listener = listener
+        self.partitions = {'stock_news-0'}
+        self.paused_partitions = set()
+        self.paused_polls = 0
+        self.commits = 0
+        self.on_paused_poll = None
+
+    def poll(self, timeout_ms=0, max_records=None):
+        if self.paused_partitions:
+            self.paused_polls += 1
+            if self.on_paused_poll:
+                self.on_paused_poll(self)
+            return {}
+        if not self.batches:
+            self.stop.set()
+            return {}
+        return {'stock_news-0': [SimpleNamespace(value=data) for data in self.batches.pop(0)]}
+
+    def assignment(self):
+        return set(self.partitions)
+
+    def pause(self, *partitions):
+        self.paused_partitions.update(partitions)
+
+    def paused(self):
+        return set(self.paused_partitions)
+
+    def resume(self, *partitions):
+        self.paused_partitions.difference_update(partitions)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeStore:
+    """store_batch stand-in: `fail(messages, conn)` returns an exception to raise, or None to store them"""
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.stored = []
+
+    def __call__(self, cursor, messages, embed):
+        error = self.fail(messages, cursor)
+        if error is not None:
+            raise error
+        self.stored.extend(data['headline'] for data in messages)
+        return {'messages': len(messages), 'new_documents': len(messages), 'duplicates': 0,
+                'chunks': len(messages), 'links': len(messages)}
+
+
+@pytest.fixture
+def run_ingest(monkeypatch):
+    """Run one worker over `batches` with `store_batch`; returns (consumer, connections)"""
+    monkeypatch.setattr(rag_ingest, 'RAG_RETRY_BACKOFF_MAX_SECONDS', 0)
+    monkeypatch.setattr(rag_ingest, 'RAG_MAX_RETRIES', 2)
+    monkeypatch.setattr(rag_ingest, 'report', lambda *args: None)
+
+    def run(batches, store_batch, on_paused_poll=None):
+        stop = threading.Event()
+        connections = []
+        consumers = []
+
+        def connect():
+            connections.append(FakeConnection())
+            return connections[-1]
+
+        def create_consumer(topic, group_id, worker_id, listener=None):
+            consumers.append(FakeConsumer(batches, stop, listener))
+            consumers[-1].on_paused_poll = on_paused_poll
+            return consumers[-1]
+
+        monkeypatch.setattr(rag_ingest, 'connect', connect)
+        monkeypatch.setattr(rag_ingest, 'create_consumer', create_consumer)
+        monkeypatch.setattr(rag_ingest, 'store_batch', store_batch)
+        rag_ingest.ingest(0, stop, embedder=None, cache=None)
+        return consumers[0], connections
+
+    return run
+
+
+def test_poison_headline_is_skipped_after_the_retries(run_ingest):
+    store = FakeStore(lambda messages, conn: ValueError('bad row')
+                      if any(data['headline'] == 'poison' for data in messages) else None)
+    skipped = rag_ingest.SKIPPED.value()
+
+    consumer, _ = run_ingest([news('a', 'poison', 'b'), news('c')], store)
+
+    # Two failed attempts at the whole batch, then one message at a time; the next batch follows
+    assert store.stored == ['a', 'b', 'c']
+    assert consumer.paused_polls == 2
+    assert consumer.paused_partitions == set()
+    assert consumer.commits == 2
+    assert rag_ingest.SKIPPED.value() == skipped + 1
+
+
+def test_database_outage_is_retried_not_skipped(run_ingest):
+    attempts = []
+
+    def fail(messages, conn):
+        attempts.append(len(messages))
+        if len(attempts) <= 4:
+            conn.closed = 2  # psycopg2 marks the connection broken
+            return psycopg2.OperationalError('server closed the connection unexpectedly')
+        return None
+
+    store = FakeStore(fail)
+    consumer, connections = run_ingest([news('a', 'b')], store)
+
+    # More outages than RAG_MAX_RETRIES, yet the batch is stored whole on a fresh connection
+    assert attempts == [2, 2, 2, 2, 2]
+    assert store.stored == ['a', 'b']
+    assert len(connections) == 5
+    assert consumer.paused_polls == 4
+    assert consumer.commits == 1
+
+
+def test_rebalance_while_backing_off_drops_the_failed_batch(run_ingest):
+    store = FakeStore(lambda messages, conn: ValueError('bad row')
+                      if any(data['headline'] == 'lost' for data in messages) else None)
+
+    def revoke(consumer):
+        # The group moves the partition away during the backoff poll; the flush fails again
+        consumer.listener.on_partitions_revoked({'stock_news-0'})
+
+    consumer, _ = run_ingest([news('lost'), news('next')], store, on_paused_poll=revoke)
+
+    # The batch is left uncommitted for the new owner and the worker goes on consuming
+    assert store.stored == ['next']
+    assert consumer.paused_polls == 1
+    assert consumer.commits == 1